@@ -0,0 +1,43 @@
+"""add catalog_disciplines (pre-mapped destination catalog per course)
+
+Revision ID: 20261018_catalog_disciplines
+Revises: 20261018_equivalence_matrices
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_catalog_disciplines'
+down_revision = '20261018_equivalence_matrices'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'catalog_disciplines',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('tenant_id', sa.String(), nullable=False),
+        sa.Column('course_id', sa.String(), nullable=False),
+        sa.Column('disciplina_id', sa.Integer(), nullable=False),
+        sa.Column('nome', sa.String(), nullable=False),
+        sa.Column('carga_horaria', sa.Integer(), nullable=False),
+        sa.Column('ementa', sa.Text(), nullable=False),
+        sa.Column('nivel', sa.String(), nullable=True),
+        sa.Column('text_hash', sa.String(), nullable=False),
+        sa.Column('taxonomy_version', sa.String(), nullable=True),
+        sa.Column('model_version', sa.String(), nullable=True),
+        sa.Column('nodes', sa.LargeBinary(), nullable=True),
+        sa.Column('mapped_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('tenant_id', 'course_id', 'disciplina_id', name='uq_catalog_course_disciplina'),
+    )
+    op.create_index('ix_catalog_disciplines_tenant_id', 'catalog_disciplines', ['tenant_id'])
+    op.create_index('ix_catalog_disciplines_course_id', 'catalog_disciplines', ['course_id'])
+
+
+def downgrade():
+    op.drop_index('ix_catalog_disciplines_course_id', table_name='catalog_disciplines')
+    op.drop_index('ix_catalog_disciplines_tenant_id', table_name='catalog_disciplines')
+    op.drop_table('catalog_disciplines')
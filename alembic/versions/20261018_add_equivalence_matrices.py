@@ -0,0 +1,42 @@
+"""add equivalence_matrices (compact many-to-many results)
+
+Revision ID: 20261018_equivalence_matrices
+Revises: 20261018_mapped_ementas
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_equivalence_matrices'
+down_revision = '20261018_mapped_ementas'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'equivalence_matrices',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('request_id', sa.String(), nullable=False),
+        sa.Column('tenant_id', sa.String(), nullable=False),
+        sa.Column('course_id', sa.String(), nullable=True),
+        sa.Column('n_origens', sa.Integer(), nullable=False),
+        sa.Column('n_destinos', sa.Integer(), nullable=False),
+        sa.Column('scores', sa.LargeBinary(), nullable=False),
+        sa.Column('decisions', sa.LargeBinary(), nullable=False),
+        sa.Column('assignment', sa.JSON(), nullable=True),
+        sa.Column('model_version', sa.String(), nullable=False),
+        sa.Column('policy_version', sa.String(), nullable=False),
+        sa.Column('taxonomy_version', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('tenant_id', 'request_id', name='uq_matrix_tenant_request'),
+    )
+    op.create_index('ix_equivalence_matrices_tenant_id', 'equivalence_matrices', ['tenant_id'])
+    op.create_index('ix_equivalence_matrices_course_id', 'equivalence_matrices', ['course_id'])
+
+
+def downgrade():
+    op.drop_index('ix_equivalence_matrices_course_id', table_name='equivalence_matrices')
+    op.drop_index('ix_equivalence_matrices_tenant_id', table_name='equivalence_matrices')
+    op.drop_table('equivalence_matrices')
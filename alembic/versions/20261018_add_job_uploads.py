@@ -0,0 +1,27 @@
+"""add job_uploads (staging for large batches, instead of RQ job arguments)
+
+Revision ID: 20261018_job_uploads
+Revises: 20261018_jobs_enqueued_items
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_job_uploads'
+down_revision = '20261018_jobs_enqueued_items'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job_uploads',
+        sa.Column('job_id', sa.String(), sa.ForeignKey('jobs.id'), primary_key=True),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table('job_uploads')
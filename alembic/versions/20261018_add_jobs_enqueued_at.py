@@ -0,0 +1,22 @@
+"""add jobs.enqueued_at (idempotent enqueue for background batch ingestion)
+
+Revision ID: 20261018_jobs_enqueued_at
+Revises: 20261018_catalog_disciplines
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_jobs_enqueued_at'
+down_revision = '20261018_catalog_disciplines'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('jobs', sa.Column('enqueued_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('jobs', 'enqueued_at')
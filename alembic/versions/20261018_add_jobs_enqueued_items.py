@@ -0,0 +1,24 @@
+"""replace jobs.enqueued_at with jobs.enqueued_items (resumable enqueue for background batch ingestion)
+
+Revision ID: 20261018_jobs_enqueued_items
+Revises: 20261018_jobs_enqueued_at
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_jobs_enqueued_items'
+down_revision = '20261018_jobs_enqueued_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('jobs', sa.Column('enqueued_items', sa.Integer(), nullable=True, server_default='0'))
+    op.drop_column('jobs', 'enqueued_at')
+
+
+def downgrade():
+    op.add_column('jobs', sa.Column('enqueued_at', sa.DateTime(timezone=True), nullable=True))
+    op.drop_column('jobs', 'enqueued_items')
@@ -0,0 +1,33 @@
+"""add mapped_ementas (persistent content-addressed mapping store)
+
+Revision ID: 20261018_mapped_ementas
+Revises: 20260124_uq_api_keys
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_mapped_ementas'
+down_revision = '20260124_uq_api_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'mapped_ementas',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('tenant_id', sa.String(), nullable=False),
+        sa.Column('taxonomy_version', sa.String(), nullable=False),
+        sa.Column('model_version', sa.String(), nullable=False),
+        sa.Column('text_hash', sa.String(), nullable=False),
+        sa.Column('nodes', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        # a unique também serve de índice para o lookup em lote
+        sa.UniqueConstraint('tenant_id', 'taxonomy_version', 'model_version', 'text_hash', name='uq_mapped_ementas_key'),
+    )
+
+
+def downgrade():
+    op.drop_table('mapped_ementas')
@@ -1,10 +1,13 @@
 import uuid
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.sql import func
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app import models
 from app.queue import queue
 from app.deps import get_tenant_id, require_role
+from app.catalog_repo import publish_catalog_invalidation, upsert_catalog
+from app.auth import publish_auth_invalidation
 
 router = APIRouter(prefix="/admin", dependencies=[Depends(require_role("admin"))])
 
@@ -74,4 +77,83 @@ def bind_course(payload: dict, tenant_id: str = Depends(get_tenant_id), db: Sess
     )
     db.add(b)
     db.commit()
-    return {"binding_id": bid, "tenant_id": b.tenant_id, "course_id": b.course_id}
+
+    # nova taxonomia vinculada: re-mapeia o catálogo de destinos do curso
+    catalog_job = None
+    if db.query(models.CatalogDiscipline.id).filter(
+        models.CatalogDiscipline.tenant_id == tenant_id,
+        models.CatalogDiscipline.course_id == b.course_id
+    ).first():
+        queue.enqueue("app.catalog_builder.map_course_catalog", tenant_id, b.course_id)
+        catalog_job = "queued"
+
+    return {"binding_id": bid, "tenant_id": b.tenant_id, "course_id": b.course_id, "catalog_job": catalog_job}
+
+@router.post("/courses/{course_id}/catalog")
+def upsert_course_catalog(course_id: str, payload: dict, tenant_id: str = Depends(get_tenant_id), db: Session = Depends(get_db)):
+    """
+    payload: { disciplinas:[{disciplina_id,nome,carga_horaria,ementa,nivel}] }
+    Ementas novas/alteradas são mapeadas em lote por um job (app.catalog_builder).
+    """
+    counts = upsert_catalog(db, tenant_id, course_id, payload.get("disciplinas", []))
+
+    map_job = None
+    if counts["created"] or counts["changed"]:
+        # ementa alterada volta a pendente: caches dos processos não servem mais o mapeamento antigo
+        publish_catalog_invalidation(tenant_id, course_id)
+        queue.enqueue("app.catalog_builder.map_course_catalog", tenant_id, course_id)
+        map_job = "queued"
+
+    return {"tenant_id": tenant_id, "course_id": course_id, **counts, "map_job": map_job}
+
+@router.get("/courses/{course_id}/catalog")
+def get_course_catalog(course_id: str, tenant_id: str = Depends(get_tenant_id), db: Session = Depends(get_db)):
+    rows = db.query(
+        models.CatalogDiscipline.disciplina_id, models.CatalogDiscipline.nome,
+        models.CatalogDiscipline.carga_horaria, models.CatalogDiscipline.nivel,
+        models.CatalogDiscipline.taxonomy_version, models.CatalogDiscipline.mapped_at
+    ).filter(
+        models.CatalogDiscipline.tenant_id == tenant_id,
+        models.CatalogDiscipline.course_id == course_id
+    ).order_by(models.CatalogDiscipline.disciplina_id).all()
+
+    return {
+        "course_id": course_id,
+        "total": len(rows),
+        "mapped": sum(1 for r in rows if r.mapped_at is not None),
+        "disciplinas": [
+            {
+                "disciplina_id": r.disciplina_id, "nome": r.nome, "carga_horaria": r.carga_horaria,
+                "nivel": r.nivel, "taxonomy_version": r.taxonomy_version, "mapped": r.mapped_at is not None,
+            }
+            for r in rows
+        ],
+    }
+
+@router.post("/api_keys/{key_id}/revoke")
+def revoke_api_key(key_id: str, tenant_id: str = Depends(get_tenant_id), db: Session = Depends(get_db)):
+    key = db.get(models.ApiKey, key_id)
+    if not key or key.tenant_id != tenant_id:
+        raise HTTPException(status_code=404, detail="API key não encontrada")
+
+    key.status = "revoked"
+    key.revoked_at = func.now()
+    db.commit()
+
+    # derruba a chave do cache de auth de todos os processos (pub/sub)
+    publish_auth_invalidation(key_hash=key.key_hash)
+    return {"key_id": key.id, "status": key.status}
+
+@router.post("/tenant/disable")
+def disable_tenant(tenant_id: str = Depends(get_tenant_id), db: Session = Depends(get_db)):
+    """Desativa o tenant do chamador: todas as chaves dele passam a 401 (reativação via DB/seed)."""
+    tenant = db.get(models.Tenant, tenant_id)
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Tenant não encontrado")
+
+    tenant.status = "disabled"
+    db.commit()
+
+    # chaves do tenant saem do cache de auth de todos os processos (pub/sub)
+    publish_auth_invalidation(tenant_id=tenant_id)
+    return {"tenant_id": tenant.id, "status": tenant.status}
@@ -1,15 +1,27 @@
+import json
 import uuid
-from fastapi import APIRouter, Depends
+import zlib
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from pydantic import TypeAdapter, ValidationError
+from starlette.concurrency import run_in_threadpool
 from app.deps import get_tenant_id
 from sqlalchemy.orm import Session
-from app.db import get_db
+from app.db import SessionLocal, get_db
 from app.queue import queue
 from app import models
 from app.repos import JobRepo
 from app.queue import queue, default_retry
-from app.rq_hooks import on_job_failure, on_job_success
+from app.rq_hooks import on_ingest_failure, on_job_failure, on_job_success
+from app.config import settings
+from app.batch_ingest import LineTooLong, append_items, enqueue_items, iter_ndjson_lines, sanitize_items
+from app.api.schemas import EvaluateRequest
 router = APIRouter()
 
+_ITEM_ADAPTER = TypeAdapter(EvaluateRequest)
+
 
 
 @router.post("/v1/equivalences/batch")
@@ -18,29 +30,79 @@ def create_batch(payload: dict, tenant_id: str = Depends(get_tenant_id), db: Ses
     payload esperado:
       { "items": [ <EvaluateRequest JSON>, <EvaluateRequest JSON>, ... ] }
     """
-    items = payload.get("items", [])
+    items = sanitize_items(payload.get("items", []))
     job_id = str(uuid.uuid4())
 
+    if len(items) > settings.BATCH_INGEST_THRESHOLD:
+        # lote grande: inserts/enfileiramento num job de ingestão, o request responde já com o job_id.
+        # Os itens ficam numa linha de staging (job_uploads), não nos argumentos do job RQ (Redis)
+        db.add(models.Job(id=job_id, tenant_id=tenant_id, status="ingesting", total=len(items), done=0, failed=0))
+        db.flush()
+        db.add(models.JobUpload(job_id=job_id, payload=items))
+        db.commit()
+        queue.enqueue(
+            "app.batch_ingest.ingest_batch", job_id, job_timeout=settings.BATCH_CHUNK_TIMEOUT,
+            retry=default_retry(), on_failure=on_ingest_failure,
+        )
+        return {"job_id": job_id, "status": "INGESTING", "total": len(items)}
+
     job = models.Job(id=job_id, tenant_id=tenant_id, status="queued", total=len(items), done=0, failed=0)
-    job_items = []
-    for it in items:
-         # sanitize payload: never trust tenant_id coming from client
-        if isinstance(it, dict):
-            item_payload = dict(it)
-            item_payload.pop("tenant_id", None)
-        else:
-          item_payload = it
-
-        item_id = str(uuid.uuid4())
-        job_items.append(models.JobItem(id=item_id, job_id=job_id, status="queued", payload=item_payload))
-    JobRepo().create_job(db, job, job_items)
-
-    # enfileira cada item
-    for ji in job_items:
-        queue.enqueue("app.worker.process_job_item", job_id, ji.id)
+    item_ids = JobRepo().create_job(db, job, items)
+
+    # fatias de BATCH_CHUNK_SIZE itens, enfileiradas em pipeline (um round trip por lote de jobs)
+    enqueue_items(job_id, item_ids)
 
     return {"job_id": job_id, "status": "QUEUED", "total": len(items)}
 
+@router.post("/v1/equivalences/batch/ndjson")
+async def create_batch_ndjson(request: Request, tenant_id: str = Depends(get_tenant_id), db: Session = Depends(get_db)):
+    """
+    Upload em streaming: uma EvaluateRequest JSON por linha (Content-Encoding: gzip opcional).
+    Cada linha é validada ao chegar; itens são gravados em fatias de BATCH_STREAM_FLUSH e
+    enfileirados antes do fim do upload. Linhas inválidas são recusadas (rejected/errors).
+    """
+    job_id = str(uuid.uuid4())
+    db.add(models.Job(id=job_id, tenant_id=tenant_id, status="ingesting", total=0, done=0, failed=0))
+    await run_in_threadpool(db.commit)
+
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    pending: list[dict] = []
+    accepted = rejected = line_no = 0
+    errors: list[dict] = []
+    try:
+        async for line in iter_ndjson_lines(request.stream(), gzipped, settings.BATCH_STREAM_MAX_LINE):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                item = _ITEM_ADAPTER.validate_json(line)
+            except ValidationError as e:
+                rejected += 1
+                if len(errors) < 20:
+                    errors.append({"line": line_no, "errors": e.errors(include_url=False, include_input=False)[:3]})
+                continue
+            pending.append(item.model_dump(mode="json", exclude_unset=True))
+            if len(pending) >= settings.BATCH_STREAM_FLUSH:
+                accepted += await run_in_threadpool(append_items, db, job_id, pending)
+                pending = []
+        if pending:
+            accepted += await run_in_threadpool(append_items, db, job_id, pending)
+    except Exception as e:
+        # qualquer falha (linha grande, gzip inválido, cliente desconectou, erro de DB/Redis):
+        # itens já gravados seguem na fila; o job não conclui nem fica "ingesting" (status failed)
+        await run_in_threadpool(_fail_upload, db, job_id)
+        if isinstance(e, (LineTooLong, zlib.error)):
+            status = 413 if isinstance(e, LineTooLong) else 400
+            raise HTTPException(status_code=status, detail={"job_id": job_id, "error": str(e), "accepted": accepted})
+        raise
+
+    await run_in_threadpool(JobRepo().finish_ingestion, db, job_id, accepted)
+    return {"job_id": job_id, "status": "QUEUED", "total": accepted, "rejected": rejected, "errors": errors}
+
+def _fail_upload(db: Session, job_id: str):
+    db.rollback()  # sessão pode ter ficado numa transação quebrada (erro no append_items)
+    JobRepo().update_counts(db, job_id, status="failed")
+
 @router.get("/v1/jobs/{job_id}")
 def get_job(job_id: str, db: Session = Depends(get_db)):
     job = db.get(models.Job, job_id)
@@ -51,40 +113,90 @@ def get_job(job_id: str, db: Session = Depends(get_db)):
         "progress": {"done": job.done, "failed": job.failed, "total": job.total}
     }
 
+_RESULT_COLUMNS = (
+    models.EquivalenceResult.id, models.EquivalenceResult.request_id, models.EquivalenceResult.decision,
+    models.EquivalenceResult.score, models.EquivalenceResult.breakdown, models.EquivalenceResult.missing,
+    models.EquivalenceResult.missing_critical, models.EquivalenceResult.justificativa_curta,
+    models.EquivalenceResult.justificativa_detalhada, models.EquivalenceResult.degraded_mode,
+    models.EquivalenceResult.model_version, models.EquivalenceResult.policy_version,
+    models.EquivalenceResult.taxonomy_version, models.EquivalenceResult.timings_ms,
+    models.EquivalenceResult.created_at,
+)
+
+def _results_query(job_id: str, statuses: list[str], after: str | None):
+    # um único SELECT item ⟕ resultado, ordenado por item id (keyset)
+    q = select(
+        models.JobItem.id.label("item_id"), models.JobItem.status.label("item_status"),
+        models.JobItem.result_id.label("item_result_id"), models.JobItem.error.label("item_error"),
+        *_RESULT_COLUMNS,
+    ).outerjoin(
+        models.EquivalenceResult, models.EquivalenceResult.id == models.JobItem.result_id
+    ).where(models.JobItem.job_id == job_id)
+    if statuses:
+        q = q.where(models.JobItem.status.in_(statuses))
+    if after:
+        q = q.where(models.JobItem.id > after)
+    return q.order_by(models.JobItem.id)
+
+def _result_item(row) -> dict:
+    result_payload = None
+    if row.id is not None:
+        result_payload = {
+            "id": row.id,
+            "request_id": row.request_id,
+            "decision": row.decision,
+            "score": row.score,
+            "breakdown": row.breakdown,
+            "missing": row.missing,
+            "missing_critical": row.missing_critical,
+            "justificativa_curta": row.justificativa_curta,
+            "justificativa_detalhada": row.justificativa_detalhada,
+            "degraded_mode": row.degraded_mode,
+            "model_version": row.model_version,
+            "policy_version": row.policy_version,
+            "taxonomy_version": row.taxonomy_version,
+            "timings_ms": row.timings_ms,
+            "created_at": (row.created_at.isoformat() if row.created_at else None),
+        }
+    return {
+        "item_id": row.item_id,
+        "status": row.item_status,
+        "result_id": row.item_result_id,
+        "error": row.item_error,
+        "result": result_payload,
+    }
+
 @router.get("/v1/jobs/{job_id}/results")
-def get_job_results(job_id: str, db: Session = Depends(get_db)):
-    items = db.query(models.JobItem).filter(models.JobItem.job_id == job_id).all()
-    out = []
-    for it in items:
-        result_payload = None
-        if it.result_id:
-            # tenta recuperar resultado completo salvo em EquivalenceResult
-            r = db.get(models.EquivalenceResult, it.result_id)
-            if r:
-                result_payload = {
-                    "id": r.id,
-                    "request_id": r.request_id,
-                    "decision": r.decision,
-                    "score": r.score,
-                    "breakdown": r.breakdown,
-                    "missing": r.missing,
-                    "missing_critical": r.missing_critical,
-                    "justificativa_curta": r.justificativa_curta,
-                    "justificativa_detalhada": r.justificativa_detalhada,
-                    "degraded_mode": r.degraded_mode,
-                    "model_version": r.model_version,
-                    "policy_version": r.policy_version,
-                    "taxonomy_version": r.taxonomy_version,
-                    "timings_ms": r.timings_ms,
-                    "created_at": (r.created_at.isoformat() if r.created_at else None),
-                }
-
-        out.append({
-            "item_id": it.id,
-            "status": it.status,
-            "result_id": it.result_id,
-            "error": it.error,
-            "result": result_payload,
-        })
-
-    return out
+def get_job_results(
+    job_id: str,
+    status: str | None = Query(default=None, description="filtro, ex.: failed ou done,failed"),
+    after: str | None = Query(default=None, description="cursor: item_id do último item da página anterior"),
+    limit: int = Query(default=500, ge=1, le=5000),
+    format: str = Query(default="json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    Resultados do job em páginas (keyset por item_id; próximo cursor no header X-Next-Cursor).
+    format=ndjson devolve todos os itens (a partir de `after`) em streaming, lidos com cursor no servidor.
+    """
+    statuses = [s.strip() for s in status.split(",") if s.strip()] if status else []
+
+    if format == "ndjson":
+        def stream():
+            # sessão própria: a do Depends fecha antes de a resposta terminar de ser enviada
+            s: Session = SessionLocal()
+            try:
+                rows = s.execute(
+                    _results_query(job_id, statuses, after).execution_options(yield_per=settings.RESULTS_STREAM_BATCH)
+                )
+                for row in rows:
+                    yield json.dumps(_result_item(row), ensure_ascii=False).encode() + b"\n"
+            finally:
+                s.close()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    rows = db.execute(_results_query(job_id, statuses, after).limit(limit + 1)).all()
+    out = [_result_item(row) for row in rows[:limit]]
+    headers = {"X-Next-Cursor": out[-1]["item_id"]} if len(rows) > limit else {}
+    return JSONResponse(jsonable_encoder(out), headers=headers)
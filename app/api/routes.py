@@ -1,12 +1,15 @@
 from __future__ import annotations
 from app.engine.service import EquivalenceEngine
 import uuid
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db import get_db
+from starlette.concurrency import run_in_threadpool
+from app.db import get_async_db, get_db
 from app.deps import get_tenant_id
-from app.repos_idempotency import get_existing_result
-from app.api.schemas import EvaluateRequest
+from app.repos_idempotency import aget_existing_result
+from app.api.schemas import EvaluateManyRequest, EvaluateMatrixRequest, EvaluateRequest
+from app.repos import MatrixRepo
 from app.engine.service import EquivalenceEngine
 router = APIRouter()
 
@@ -23,8 +26,15 @@ def get_engine() -> EquivalenceEngine:
     from app.audit.repository import AuditRepository
 
     # Clients
-    from app.mapper.clients import HttpClientConfig, SimpleHttpEmbeddingClient, SimpleHttpLLMJsonClient
+    from app.mapper.clients import (
+        AsyncHttpEmbeddingClient, AsyncHttpLLMJsonClient,
+        HttpClientConfig, SimpleHttpEmbeddingClient, SimpleHttpLLMJsonClient,
+    )
     from app.mapper.taxonomy_index import build_index
+    from app.mapper.ann_index import IVFConfig
+    from app.mapper.index_artifact import load_index_artifact
+    from app.mapper.embed_batcher import MicroBatchingEmbeddingClient
+    from app.config import settings
     from app.mapper.embedding_llm_mapper import EmbeddingLLMMapper, EmbeddingLLMMapperConfig
     from app.mapper.fallback_mapper import EmptyFallbackMapper
 
@@ -50,44 +60,92 @@ def get_engine() -> EquivalenceEngine:
         ])
 
     # Embeddings endpoint (você implementa ou aponta para seu provedor)
-    # Ex.: EMBED_URL=http://localhost:9001
-    import os
-    embed_cfg = HttpClientConfig(
-        base_url=os.getenv("EMBED_URL", "http://localhost:9001"),
-        api_key=os.getenv("EMBED_API_KEY"),
-        timeout_seconds=int(os.getenv("EMBED_TIMEOUT", "15")),
-    )
-    llm_cfg = HttpClientConfig(
-        base_url=os.getenv("LLM_URL", "http://localhost:9002"),
-        api_key=os.getenv("LLM_API_KEY"),
-        timeout_seconds=int(os.getenv("LLM_TIMEOUT", "20")),
-    )
+    # Ex.: EMBED_URL=http://localhost:9001 (EMBED_MAX_BATCH, EMBED_MAX_IN_FLIGHT, EMBED_MAX_RETRIES...)
+    embed_cfg = HttpClientConfig.from_env("EMBED", "http://localhost:9001")
+    llm_cfg = HttpClientConfig.from_env("LLM", "http://localhost:9002", default_timeout=20)
 
     embed_client = SimpleHttpEmbeddingClient(embed_cfg, path="/embed")
     llm_client = SimpleHttpLLMJsonClient(llm_cfg, path="/llm/json")
 
-    # Build taxonomy embedding index once
+    # Taxonomy embedding index: abre o artefato mmap do index_builder (compartilhado
+    # entre processos via page cache); só re-embedda se não houver artefato válido.
     nodes = store.get_nodes(version)
-    index = build_index(version, nodes, embed_client)
+    index = load_index_artifact(
+        settings.INDEX_ARTIFACT_DIR, settings.INDEX_TENANT_ID, version, nodes,
+        verify_checksum=settings.INDEX_ARTIFACT_VERIFY,
+    )
+    if index is None:
+        index = build_index(
+            version, nodes, embed_client,
+            ann_min_nodes=settings.ANN_MIN_NODES,
+            ann_cfg=IVFConfig(nprobe=settings.ANN_NPROBE),
+        )
+
+    # embeds por request passam pelo micro-batcher (coalesce requests concorrentes)
+    mapper_embedder = embed_client
+    if settings.EMBED_BATCH_WINDOW_MS > 0:
+        mapper_embedder = MicroBatchingEmbeddingClient(
+            embed_client,
+            max_batch=settings.EMBED_BATCH_MAX,
+            max_wait_ms=settings.EMBED_BATCH_WINDOW_MS,
+            max_in_flight=embed_cfg.max_in_flight,
+        )
 
     mapper = EmbeddingLLMMapper(
-        embedder=embed_client,
+        embedder=mapper_embedder,
         index=index,
         cfg=EmbeddingLLMMapperConfig(top_k=30, min_similarity=0.30, use_llm_refine=True),
         llm=llm_client,
+        # caminho asyncio (aevaluate): conexões httpx.AsyncClient no event loop da API
+        async_embedder=AsyncHttpEmbeddingClient(embed_cfg, path="/embed"),
+        async_llm=AsyncHttpLLMJsonClient(llm_cfg, path="/llm/json"),
     )
     fallback = EmptyFallbackMapper()
 
-    cache = SimpleTTLCache(ttl_seconds=30 * 24 * 3600)
+    cache = SimpleTTLCache(
+        ttl_seconds=settings.MAPPER_CACHE_TTL,
+        max_items=settings.MAPPER_CACHE_MAX_ITEMS,
+        max_bytes=settings.MAPPER_CACHE_MAX_BYTES,
+        name="mapping",
+        sweep_interval_seconds=settings.CACHE_SWEEP_INTERVAL,
+    )
+    if settings.MAPPER_CACHE_L2:
+        # L2 no Redis: API e workers RQ compartilham os mapeamentos já pagos
+        from app.cache.codec import decode_mapped_nodes, encode_mapped_nodes
+        from app.cache.tiered import TieredCache
+        from app.redis_client import redis_conn
+
+        cache = TieredCache(
+            cache, redis_conn, encode_mapped_nodes, decode_mapped_nodes,
+            ttl_seconds=settings.MAPPER_CACHE_TTL,
+        )
     audit = AuditRepository()
 
-    _ENGINE_SINGLETON = EquivalenceEngine(store, mapper, fallback, cache, audit)
+    # mapped_ementas: mapeamentos sobrevivem a deploys/restarts dos workers
+    mapping_store = None
+    if settings.MAPPING_STORE_ENABLED:
+        from app.db import SessionLocal
+        from app.mapping_repo import MappingStore
+
+        mapping_store = MappingStore(SessionLocal)
+
+    # catálogo de destinos pré-mapeado (admin /courses/{course_id}/catalog)
+    catalog = None
+    if settings.CATALOG_ENABLED:
+        from app.db import SessionLocal
+        from app.catalog_repo import CatalogStore
+
+        catalog = CatalogStore(SessionLocal, ttl_seconds=settings.CATALOG_CACHE_TTL)
+
+    _ENGINE_SINGLETON = EquivalenceEngine(
+        store, mapper, fallback, cache, audit, mapping_store=mapping_store, catalog=catalog,
+    )
     return _ENGINE_SINGLETON
 
 @router.post("/v1/equivalences/evaluate")
-def evaluate(
+async def evaluate(
     req: EvaluateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     tenant_id: str = Depends(get_tenant_id),
     idempotency_key: str | None = Header(default=None, alias="Idempotency-Key")
 ):
@@ -96,7 +154,7 @@ def evaluate(
     req.request_id = request_id  # garante
 
     # 2) se já existe resultado, retorna sem recalcular
-    existing = get_existing_result(db, tenant_id, request_id)
+    existing = await aget_existing_result(db, tenant_id, request_id)
     if existing:
         return {
             "request_id": existing.request_id,
@@ -115,10 +173,65 @@ def evaluate(
             "cached": True
         }
 
-    # 3) processa
-    engine = get_engine()
-    resp = engine.evaluate(req, tenant_id)
+    # 3) processa (async: embedding/LLM não ocupam o threadpool)
+    engine = _ENGINE_SINGLETON or await run_in_threadpool(get_engine)
+    resp = await engine.aevaluate(req, tenant_id)
 
     # 4) salvar no DB (em teoria seu engine/worker já faz, mas endpoint síncrono precisa salvar)
     # Se você já salva no engine, ótimo. Se não, faça aqui.
     return resp.model_dump() if hasattr(resp, "model_dump") else resp
+
+@router.post("/v1/equivalences/evaluate-many")
+async def evaluate_many(
+    req: EvaluateManyRequest,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Uma origem contra vários destinos, ranqueados por score (top_n opcional)."""
+    engine = _ENGINE_SINGLETON or await run_in_threadpool(get_engine)
+    # scoring/mapeamento em lote são síncronos (GEMM, map_many): fora do event loop
+    resp = await run_in_threadpool(engine.evaluate_against_many, req, tenant_id)
+    return resp.model_dump()
+
+@router.post("/v1/equivalences/matrix")
+def evaluate_matrix(
+    req: EvaluateMatrixRequest,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Origens x destinos (histórico inteiro vs matriz do curso) + melhor emparelhamento opcional."""
+    repo = MatrixRepo()
+    if req.persist:
+        existing = repo.get(db, tenant_id, request_id=req.request_id)
+        if existing:
+            return {**_matrix_payload(existing), "cached": True}
+
+    engine = get_engine()
+    resp = engine.evaluate_matrix(req, tenant_id)
+    if req.persist:
+        resp.matrix_id = repo.save(db, tenant_id, req, resp).id
+    return resp.model_dump()
+
+@router.get("/v1/equivalences/matrix/{matrix_id}")
+def get_matrix(matrix_id: str, db: Session = Depends(get_db), tenant_id: str = Depends(get_tenant_id)):
+    row = MatrixRepo().get(db, tenant_id, matrix_id=matrix_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Matriz não encontrada")
+    return _matrix_payload(row)
+
+def _matrix_payload(row) -> dict:
+    from app.engine.decision import DECISIONS
+
+    scores, codes = MatrixRepo.decode(row)
+    return {
+        "request_id": row.request_id,
+        "matrix_id": row.id,
+        "scores": scores.tolist(),
+        "decisoes": [[DECISIONS[c] for c in r] for r in codes.tolist()],
+        "assignment": [
+            {"origem_index": i, "destino_index": j, "score": int(scores[i, j]), "decisao": DECISIONS[codes[i, j]]}
+            for i, j in row.assignment
+        ] if row.assignment is not None else None,
+        "model_version": row.model_version,
+        "policy_version": row.policy_version,
+        "taxonomy_version": row.taxonomy_version,
+    }
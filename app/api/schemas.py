@@ -69,6 +69,8 @@ class TimingsMs(BaseModel):
     validate_ms: int = 0
     hard_rules: int = 0
     map: int = 0
+    map_origem: int = 0   # mapeamento por lado (rodam em paralelo; map ~= max dos dois)
+    map_destino: int = 0
     score: int = 0
     decide: int = 0
     justify: int = 0
@@ -91,3 +93,60 @@ class EvaluateResponse(BaseModel):
     taxonomy_version: str
     timings_ms: TimingsMs
     meta: Dict[str, Any] = Field(default_factory=dict)
+
+
+class EvaluateManyRequest(BaseModel):
+    """Uma origem contra vários destinos (ex.: todas as disciplinas de uma matriz)."""
+    request_id: str = Field(..., min_length=8, max_length=80)
+    origem: DisciplineInput
+    destinos: List[DisciplineInput] = Field(..., min_length=1, max_length=1000)
+    policy: PolicyInput = PolicyInput()
+    taxonomy_version: str = Field(..., min_length=3, max_length=30)
+    policy_version: str = Field(..., min_length=1, max_length=30)
+    options: EvaluateOptions = EvaluateOptions()
+    course_id: Optional[str] = None
+    top_n: Optional[conint(ge=1, le=1000)] = None  # devolve só os N melhores
+
+class RankedEvaluation(BaseModel):
+    index: int  # posição do destino em `destinos`
+    destino_nome: str
+    disciplina_id: Optional[int] = None
+    result: EvaluateResponse
+
+class EvaluateManyResponse(BaseModel):
+    request_id: str
+    total: int  # destinos avaliados (antes do top_n)
+    results: List[RankedEvaluation]  # ordenados por score (desc), empate pela ordem de entrada
+    timings_ms: TimingsMs
+
+
+class EvaluateMatrixRequest(BaseModel):
+    """Histórico inteiro (origens) contra a matriz do curso (destinos): todos os pares de uma vez."""
+    request_id: str = Field(..., min_length=8, max_length=80)
+    origens: List[DisciplineInput] = Field(..., min_length=1, max_length=200)
+    destinos: List[DisciplineInput] = Field(..., min_length=1, max_length=200)
+    policy: PolicyInput = PolicyInput()
+    taxonomy_version: str = Field(..., min_length=3, max_length=30)
+    policy_version: str = Field(..., min_length=1, max_length=30)
+    options: EvaluateOptions = EvaluateOptions()
+    course_id: Optional[str] = None
+    assign: bool = True    # melhor emparelhamento 1:1 origem -> destino
+    persist: bool = True   # grava a matriz compacta (equivalence_matrices)
+
+class MatrixAssignment(BaseModel):
+    origem_index: int
+    destino_index: int
+    score: int
+    decisao: DecisionType
+
+class EvaluateMatrixResponse(BaseModel):
+    request_id: str
+    matrix_id: Optional[str] = None
+    scores: List[List[int]]             # [origem][destino]
+    decisoes: List[List[DecisionType]]  # [origem][destino]
+    assignment: Optional[List[MatrixAssignment]] = None
+    degraded_pairs: int = 0
+    model_version: str
+    policy_version: str
+    taxonomy_version: str
+    timings_ms: TimingsMs
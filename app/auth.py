@@ -1,11 +1,24 @@
+from __future__ import annotations
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app import models
+from app.cache.cache import SimpleTTLCache
+from app.config import settings
 from app.security import hash_api_key
 
+logger = logging.getLogger("equivalence")
+
 def get_api_key_record(db: Session, api_key: str) -> models.ApiKey | None:
-    key_hash = hash_api_key(api_key)
+    return get_api_key_record_by_hash(db, hash_api_key(api_key))
 
+def get_api_key_record_by_hash(db: Session, key_hash: str) -> models.ApiKey | None:
     rec = db.execute(
         select(models.ApiKey).where(models.ApiKey.key_hash == key_hash)
     ).scalars().first()
@@ -20,3 +33,118 @@ def get_api_key_record(db: Session, api_key: str) -> models.ApiKey | None:
         return None
 
     return rec
+
+
+@dataclass(frozen=True)
+class ResolvedKey:
+    key_id: str
+    tenant_id: str
+    role: str
+
+
+class ApiKeyCache:
+    """
+    key_hash -> ResolvedKey em memória (TTL curto), com cache negativo para chaves inválidas.
+    Revogação de chave / desativação de tenant chega por pub/sub no Redis (publish_auth_invalidation).
+    """
+
+    def __init__(self, ttl_seconds: int = 60, negative_ttl_seconds: int = 10, max_items: int = 10000):
+        self.positive = SimpleTTLCache(ttl_seconds=ttl_seconds, max_items=max_items, name="auth")
+        self.negative = SimpleTTLCache(ttl_seconds=negative_ttl_seconds, max_items=max_items, name="auth_negative")
+
+    def get(self, key_hash: str) -> Tuple[bool, Optional[ResolvedKey]]:
+        """(hit, registro); hit com registro None = chave sabidamente inválida."""
+        rec = self.positive.get(key_hash)
+        if rec is not None:
+            return True, rec
+        if self.negative.get(key_hash) is not None:
+            return True, None
+        return False, None
+
+    def put(self, key_hash: str, rec: Optional[ResolvedKey]) -> None:
+        if rec is None:
+            self.negative.set(key_hash, True)
+        else:
+            self.positive.set(key_hash, rec)
+
+    def invalidate(self, key_hash: Optional[str] = None, tenant_id: Optional[str] = None) -> None:
+        if key_hash:
+            self.positive.delete(key_hash)
+            self.negative.delete(key_hash)
+        if tenant_id:
+            # desativar tenant é raro: descarta o cache positivo inteiro em vez de indexar por tenant
+            self.positive.clear()
+
+    def clear(self) -> None:
+        self.positive.clear()
+        self.negative.clear()
+
+
+AUTH_CACHE = ApiKeyCache(
+    ttl_seconds=settings.AUTH_CACHE_TTL,
+    negative_ttl_seconds=settings.AUTH_NEGATIVE_TTL,
+    max_items=settings.AUTH_CACHE_MAX_ITEMS,
+)
+
+def load_api_key(key_hash: str, session_factory=None) -> Optional[ResolvedKey]:
+    """Caminho frio: resolve no DB e guarda no AUTH_CACHE (inclusive o resultado negativo)."""
+    if session_factory is None:
+        from app.db import SessionLocal as session_factory
+    db = session_factory()
+    try:
+        rec = get_api_key_record_by_hash(db, key_hash)
+        resolved = ResolvedKey(key_id=rec.id, tenant_id=rec.tenant_id, role=rec.role) if rec else None
+    finally:
+        db.close()
+    AUTH_CACHE.put(key_hash, resolved)
+    return resolved
+
+def publish_auth_invalidation(key_hash: Optional[str] = None, tenant_id: Optional[str] = None) -> None:
+    """Invalida neste processo e avisa os demais (API/workers) pelo canal do Redis."""
+    AUTH_CACHE.invalidate(key_hash=key_hash, tenant_id=tenant_id)
+    try:
+        from app.redis_client import redis_conn
+
+        redis_conn.publish(
+            settings.AUTH_INVALIDATION_CHANNEL, json.dumps({"key_hash": key_hash, "tenant_id": tenant_id})
+        )
+    except Exception as e:
+        # sem Redis os outros processos só esquecem a chave ao fim do TTL
+        logger.warning("auth invalidation não publicada: %s", e)
+
+def _apply_invalidation(data) -> None:
+    msg = json.loads(data)
+    if "catalog" in msg:
+        # mesmo canal carrega a invalidação do catálogo de destinos (app.catalog_repo)
+        from app.catalog_repo import invalidate_course
+
+        invalidate_course(msg["catalog"]["tenant_id"], msg["catalog"]["course_id"])
+        return
+    AUTH_CACHE.invalidate(key_hash=msg.get("key_hash"), tenant_id=msg.get("tenant_id"))
+
+_LISTENER: Optional[threading.Thread] = None
+_LISTENER_LOCK = threading.Lock()
+
+def start_invalidation_listener() -> None:
+    """Thread daemon (uma por processo) assinando AUTH_INVALIDATION_CHANNEL."""
+    global _LISTENER
+    with _LISTENER_LOCK:
+        if _LISTENER is None:
+            _LISTENER = threading.Thread(target=_listen, name="auth-invalidation", daemon=True)
+            _LISTENER.start()
+
+def _listen() -> None:
+    from app.redis_client import redis_conn
+
+    while True:
+        try:
+            pubsub = redis_conn.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(settings.AUTH_INVALIDATION_CHANNEL)
+            for msg in pubsub.listen():
+                if msg.get("type") == "message":
+                    _apply_invalidation(msg["data"])
+        except Exception as e:
+            logger.warning("auth invalidation listener: %s", e)
+        # reconexão: invalidações podem ter se perdido enquanto estava fora
+        AUTH_CACHE.clear()
+        time.sleep(1.0)
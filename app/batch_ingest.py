@@ -0,0 +1,133 @@
+import zlib
+from typing import AsyncIterator
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.db import SessionLocal
+from app.queue import PIPELINE_JOBS, enqueue_many
+from app.repos import JobRepo
+from app.rq_hooks import on_job_failure
+
+
+def sanitize_items(items: list) -> list:
+    # never trust tenant_id coming from client
+    out = []
+    for it in items:
+        if isinstance(it, dict):
+            it = dict(it)
+            it.pop("tenant_id", None)
+        out.append(it)
+    return out
+
+
+def enqueue_items(job_id: str, item_ids: list[str]) -> None:
+    """Fatias de BATCH_CHUNK_SIZE itens (1 = um job por item), enfileiradas em pipeline."""
+    chunk = settings.BATCH_CHUNK_SIZE
+    if chunk > 1:
+        enqueue_many(
+            "app.worker.process_job_chunk",
+            [(job_id, item_ids[start:start + chunk]) for start in range(0, len(item_ids), chunk)],
+            job_timeout=settings.BATCH_CHUNK_TIMEOUT,
+            on_failure=on_job_failure,  # timeout/horse morto: itens pendentes da fatia viram failed
+        )
+    else:
+        enqueue_many("app.worker.process_job_item", [(job_id, item_id) for item_id in item_ids], on_failure=on_job_failure)
+
+
+def ingest_batch(job_id: str, items: list | None = None):
+    """
+    Job RQ para lotes grandes (> BATCH_INGEST_THRESHOLD): grava os itens staged pela API
+    (job_uploads) em job_items e enfileira o processamento fora do request; o job sai de
+    "ingesting" para "queued". `items` só vem em jobs enfileirados antes do staging.
+    Retry retoma de onde parou: os itens são gravados numa transação só e, a cada pipeline
+    enfileirado (atômico), jobs.enqueued_items avança (itens em ordem de id). Só uma queda do
+    processo entre o pipeline e o commit do progresso repete aquele pipeline.
+    """
+    db: Session = SessionLocal()
+    try:
+        job = db.get(models.Job, job_id)
+        if job is None or job.status != "ingesting":
+            return {"ok": True, "job_id": job_id, "total": 0, "skipped": True}
+        offset = job.enqueued_items or 0
+
+        if not db.execute(select(models.JobItem.id).where(models.JobItem.job_id == job_id).limit(1)).first():
+            upload = db.get(models.JobUpload, job_id)
+            if upload is not None:
+                items = upload.payload
+            JobRepo().add_items(db, job_id, items or [])
+            if upload is not None:
+                db.delete(upload)  # mesma transação dos itens: staging some quando eles existem
+            db.commit()
+
+        item_ids = db.execute(
+            select(models.JobItem.id).where(models.JobItem.job_id == job_id).order_by(models.JobItem.id).offset(offset)
+        ).scalars().all()
+        # uma chamada = um pipeline do enqueue_many; progresso gravado depois de cada um
+        step = max(settings.BATCH_CHUNK_SIZE, 1) * PIPELINE_JOBS
+        for start in range(0, len(item_ids), step):
+            enqueue_items(job_id, item_ids[start:start + step])
+            offset += len(item_ids[start:start + step])
+            db.execute(update(models.Job).where(models.Job.id == job_id).values(enqueued_items=offset))
+            db.commit()
+
+        JobRepo().finish_ingestion(db, job_id)
+        if not item_ids:
+            # tentativa anterior enfileirou tudo e caiu antes de fechar a ingestão
+            return {"ok": True, "job_id": job_id, "total": 0, "skipped": True}
+        return {"ok": True, "job_id": job_id, "total": len(item_ids)}
+    finally:
+        db.close()
+
+
+def append_items(db: Session, job_id: str, payloads: list) -> int:
+    """Grava uma fatia de itens de um upload em andamento (total cresce junto) e já enfileira."""
+    item_ids = JobRepo().add_items(db, job_id, payloads)
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(total=models.Job.total + len(item_ids)))
+    db.commit()
+    enqueue_items(job_id, item_ids)
+    return len(item_ids)
+
+
+class LineTooLong(ValueError):
+    pass
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes], gzipped: bool = False, max_line_bytes: int = 1 << 20
+) -> AsyncIterator[bytes]:
+    """
+    Linhas de um corpo NDJSON enquanto ele chega (gzip descomprimido em pedaços de até
+    max_line_bytes): memória limitada à linha corrente, independente do tamanho do upload.
+    """
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    buf = b""
+
+    def split(data: bytes):
+        nonlocal buf
+        buf += data
+        *lines, buf = buf.split(b"\n")
+        if len(buf) > max_line_bytes or any(len(line) > max_line_bytes for line in lines):
+            raise LineTooLong(f"linha maior que {max_line_bytes} bytes")
+        return lines
+
+    async for chunk in chunks:
+        if inflater is None:
+            for line in split(chunk):
+                yield line
+            continue
+        data = inflater.decompress(chunk, max_line_bytes)
+        while True:
+            for line in split(data):
+                yield line
+            if not inflater.unconsumed_tail:
+                break
+            data = inflater.decompress(inflater.unconsumed_tail, max_line_bytes)
+
+    if inflater is not None:
+        for line in split(inflater.flush()):
+            yield line
+    if buf.strip():
+        yield buf
@@ -1,28 +1,215 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Protocol
+import dataclasses
+import sys
+import threading
 import time
+import weakref
+
+
+class MappingCache(Protocol):
+    """Contrato usado pelo EquivalenceEngine (SimpleTTLCache, TieredCache)."""
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    def set(self, key: str, value: Any) -> None:
+        ...
+
+    def get_many(self, keys: List[str]) -> Dict[str, Optional[Any]]:
+        ...
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        ...
+
+
+@dataclass
+class CacheStats:
+    name: str
+    hits: int
+    misses: int
+    evictions: int    # removidos por falta de espaço (itens ou bytes)
+    expirations: int  # removidos por TTL (get ou sweeper)
+    items: int
+    bytes: int
+    max_items: int
+    max_bytes: int
+
+
+def approx_sizeof(value: Any, _depth: int = 0) -> int:
+    """Estimativa barata do tamanho em memória (listas de MappedNode, dicts, strings...)."""
+    size = sys.getsizeof(value)
+    if _depth > 4:
+        return size
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        return size + sum(approx_sizeof(k, _depth + 1) + approx_sizeof(v, _depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(approx_sizeof(v, _depth + 1) for v in value)
+    if dataclasses.is_dataclass(value):
+        return size + sum(approx_sizeof(getattr(value, f.name), _depth + 1) for f in dataclasses.fields(value))
+    return size
+
 
 class SimpleTTLCache:
-    def __init__(self, ttl_seconds: int = 7 * 24 * 3600, max_items: int = 10000):
+    """
+    Cache LRU thread-safe com TTL.
+
+    - get/set O(1): OrderedDict em ordem de uso (LRU) + OrderedDict em ordem de expiração
+      (TTL fixo por cache => quem foi gravado primeiro expira primeiro)
+    - limite por nº de itens e, opcionalmente, por bytes (estimados por `sizeof`)
+    - expirados saem no get e também por um sweeper em background
+    - hits/misses/evictions/expirations/tamanho expostos em stats() e no /metrics
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 7 * 24 * 3600,
+        max_items: int = 10000,
+        max_bytes: int = 0,
+        name: str = "default",
+        sweep_interval_seconds: float = 60.0,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
         self.ttl = ttl_seconds
         self.max = max_items
-        self._store: Dict[str, Any] = {}
-        self._exp: Dict[str, float] = {}
+        self.max_bytes = max_bytes  # 0 = sem limite por bytes
+        self.name = name
+        self.sweep_interval = sweep_interval_seconds
+        self._sizeof = sizeof or approx_sizeof
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size); ordem = LRU (início = menos recente)
+        self._store: "OrderedDict[str, tuple]" = OrderedDict()
+        # key -> None; ordem = gravação (início = expira primeiro)
+        self._exp_order: "OrderedDict[str, None]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        _register(self)
 
     def get(self, key: str) -> Optional[Any]:
-        now = time.time()
-        exp = self._exp.get(key)
-        if exp is None or exp < now:
-            self._store.pop(key, None)
-            self._exp.pop(key, None)
-            return None
-        return self._store.get(key)
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry[1] < time.time():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._store.move_to_end(key)
+            self._hits += 1
+            return entry[0]
 
     def set(self, key: str, value: Any) -> None:
-        if len(self._store) >= self.max:
-            # MVP: remove arbitrário. Produção: LRU.
-            k = next(iter(self._store.keys()))
-            self._store.pop(k, None)
-            self._exp.pop(k, None)
-        self._store[key] = value
-        self._exp[key] = time.time() + self.ttl
+        size = self._sizeof(value) if self.max_bytes else 0
+        with self._lock:
+            if key in self._store:
+                self._remove(key)
+            if self.max_bytes and size > self.max_bytes:
+                # maior que o cache inteiro: não admite
+                self._evictions += 1
+                return
+            self._store[key] = (value, time.time() + self.ttl, size)
+            self._exp_order[key] = None
+            self._bytes += size
+            while len(self._store) > self.max or (self.max_bytes and self._bytes > self.max_bytes):
+                lru_key = next(iter(self._store))
+                self._remove(lru_key)
+                self._evictions += 1
+
+    def get_many(self, keys: List[str]) -> Dict[str, Optional[Any]]:
+        return {k: self.get(k) for k in keys}
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        for k, v in items.items():
+            self.set(k, v)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._store:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+            self._exp_order.clear()
+            self._bytes = 0
+
+    def sweep(self, max_items: int = 10000) -> int:
+        """Remove até `max_items` entradas expiradas (as mais antigas primeiro)."""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._exp_order and removed < max_items:
+                key = next(iter(self._exp_order))
+                if self._store[key][1] >= now:
+                    break
+                self._remove(key)
+                self._expirations += 1
+                removed += 1
+        return removed
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                name=self.name,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                items=len(self._store),
+                bytes=self._bytes,
+                max_items=self.max,
+                max_bytes=self.max_bytes,
+            )
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def _remove(self, key: str) -> None:
+        # chamador segura o lock
+        _, _, size = self._store.pop(key)
+        self._exp_order.pop(key, None)
+        self._bytes -= size
+
+
+# Registro de caches vivos: alimenta o /metrics e o sweeper de TTL.
+_CACHES: "weakref.WeakSet[SimpleTTLCache]" = weakref.WeakSet()
+_SWEEPER: Optional[threading.Thread] = None
+_REGISTRY_LOCK = threading.Lock()
+_WAKE = threading.Event()  # acorda o sweeper quando entra um cache com intervalo menor
+
+
+def _register(cache: SimpleTTLCache) -> None:
+    global _SWEEPER
+    with _REGISTRY_LOCK:
+        _CACHES.add(cache)
+        if cache.sweep_interval > 0 and (_SWEEPER is None or not _SWEEPER.is_alive()):
+            _SWEEPER = threading.Thread(target=_sweep_loop, name="cache-sweeper", daemon=True)
+            _SWEEPER.start()
+    _WAKE.set()
+
+
+def registered_caches() -> List[SimpleTTLCache]:
+    with _REGISTRY_LOCK:
+        return list(_CACHES)
+
+
+def _sweep_loop() -> None:
+    last: Dict[int, float] = {}
+    while True:
+        caches = [c for c in registered_caches() if c.sweep_interval > 0]
+        now = time.time()
+        for c in caches:
+            if now - last.get(id(c), 0.0) >= c.sweep_interval:
+                c.sweep()
+                last[id(c)] = now
+        intervals = [c.sweep_interval for c in caches]
+        _WAKE.wait(min(intervals) if intervals else 60.0)
+        _WAKE.clear()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+from typing import List
+import struct
+
+from app.mapper.base import MappedNode
+
+# Codificação binária compacta de List[MappedNode] para o cache L2 (Redis).
+#   header: versão (u8) + nº de nós (u32)
+#   por nó: node_id (i64), weight (f64), confidence (f64), nº de evidências (u16)
+#           + cada evidência como u32 (tamanho) + utf-8
+# f64 preserva os floats bit a bit: o score de um hit no L2 é idêntico ao do mapper.
+_VERSION = 1
+_HEADER = struct.Struct("<BI")
+_NODE = struct.Struct("<qddH")
+_LEN = struct.Struct("<I")
+
+
+def encode_mapped_nodes(nodes: List[MappedNode]) -> bytes:
+    parts = [_HEADER.pack(_VERSION, len(nodes))]
+    for n in nodes:
+        parts.append(_NODE.pack(int(n.node_id), float(n.weight), float(n.confidence), len(n.evidence)))
+        for ev in n.evidence:
+            raw = str(ev).encode("utf-8")
+            parts.append(_LEN.pack(len(raw)))
+            parts.append(raw)
+    return b"".join(parts)
+
+
+def decode_mapped_nodes(data: bytes) -> List[MappedNode]:
+    version, count = _HEADER.unpack_from(data, 0)
+    if version != _VERSION:
+        raise ValueError(f"Versão de codec desconhecida: {version}")
+    off = _HEADER.size
+    out: List[MappedNode] = []
+    for _ in range(count):
+        node_id, weight, confidence, n_ev = _NODE.unpack_from(data, off)
+        off += _NODE.size
+        evidence = []
+        for _ in range(n_ev):
+            (size,) = _LEN.unpack_from(data, off)
+            off += _LEN.size
+            evidence.append(data[off:off + size].decode("utf-8"))
+            off += size
+        out.append(MappedNode(node_id=node_id, weight=weight, confidence=confidence, evidence=evidence))
+    if off != len(data):
+        raise ValueError("Payload de cache com bytes sobrando")
+    return out
@@ -0,0 +1,111 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import threading
+import time
+
+from app.cache.cache import SimpleTTLCache
+
+logger = logging.getLogger("equivalence")
+
+
+class TieredCache:
+    """
+    Cache em dois níveis para o mapeamento do engine:
+      L1 = SimpleTTLCache em processo
+      L2 = Redis compartilhado entre processos da API e workers RQ
+
+    - get: L1 -> L2 (hit no L2 promove para o L1)
+    - set: grava nos dois níveis
+    - get_many/set_many: um MGET / um pipeline por lote
+    - Redis fora do ar não derruba o evaluate: cai para só-L1 por `retry_after_seconds`
+    """
+
+    def __init__(
+        self,
+        l1: SimpleTTLCache,
+        redis: Any,
+        encode: Callable[[Any], bytes],
+        decode: Callable[[bytes], Any],
+        ttl_seconds: int,
+        prefix: str = "map:",
+        retry_after_seconds: float = 5.0,
+    ):
+        self.l1 = l1
+        self.redis = redis
+        self.encode = encode
+        self.decode = decode
+        self.ttl = ttl_seconds
+        self.prefix = prefix
+        self.retry_after = retry_after_seconds
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key])[key]
+
+    def set(self, key: str, value: Any) -> None:
+        self.set_many({key: value})
+
+    def get_many(self, keys: List[str]) -> Dict[str, Optional[Any]]:
+        out: Dict[str, Optional[Any]] = {k: self.l1.get(k) for k in keys}
+        missing = [k for k, v in out.items() if v is None]
+        if not missing or not self._l2_available():
+            return out
+
+        try:
+            raw = self.redis.mget([self.prefix + k for k in missing])
+        except Exception as e:
+            self._l2_failed(e)
+            return out
+
+        hits = 0
+        for k, data in zip(missing, raw):
+            if data is None:
+                continue
+            try:
+                value = self.decode(data)
+            except Exception:
+                # payload corrompido/versão antiga: trata como miss e deixa o set sobrescrever
+                continue
+            out[k] = value
+            self.l1.set(k, value)
+            hits += 1
+        with self._lock:
+            self.l2_hits += hits
+            self.l2_misses += len(missing) - hits
+        return out
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        for k, v in items.items():
+            self.l1.set(k, v)
+        if not items or not self._l2_available():
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for k, v in items.items():
+                pipe.set(self.prefix + k, self.encode(v), ex=self.ttl)
+            pipe.execute()
+        except Exception as e:
+            self._l2_failed(e)
+
+    def delete(self, key: str) -> None:
+        self.l1.delete(key)
+        if not self._l2_available():
+            return
+        try:
+            self.redis.delete(self.prefix + key)
+        except Exception as e:
+            self._l2_failed(e)
+
+    def _l2_available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _l2_failed(self, e: Exception) -> None:
+        with self._lock:
+            self.l2_errors += 1
+            self._down_until = time.monotonic() + self.retry_after
+        logger.warning("mapping cache L2 indisponível, usando só L1 por %.0fs: %s", self.retry_after, e)
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import update
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import Session
+
+from app import models
+from app.cache.codec import encode_mapped_nodes
+from app.catalog_repo import pending_catalog_rows, publish_catalog_invalidation
+from app.config import settings
+from app.db import SessionLocal
+from app.repos import PolicyRepo
+
+
+def map_course_catalog(tenant_id: str, course_id: str):
+    """
+    Job RQ: mapeia em lote as disciplinas do catálogo do curso que ainda não têm
+    mapeamento para a taxonomia vinculada (nova disciplina, ementa alterada ou novo binding).
+    """
+    from app.api.routes import get_engine
+
+    db: Session = SessionLocal()
+    try:
+        try:
+            binding = PolicyRepo().resolve_binding(db, tenant_id, course_id)
+        except NoResultFound:
+            return {"ok": False, "reason": "no_binding"}
+        taxonomy_version = db.get(models.TaxonomyVersion, binding.taxonomy_version_id).version
+
+        engine = get_engine()
+        model_version = engine.mapper.model_version
+        rows = pending_catalog_rows(db, tenant_id, course_id, taxonomy_version, model_version)
+
+        for start in range(0, len(rows), settings.CATALOG_MAP_BATCH):
+            chunk = rows[start:start + settings.CATALOG_MAP_BATCH]
+            # um map_many por lote (cache/mapped_ementas primeiro: ementas repetidas não re-mapeiam)
+            mapped = engine.map_ementas(tenant_id, taxonomy_version, [r.ementa for r in chunk])
+            now = datetime.now(timezone.utc)
+            for r, nodes in zip(chunk, mapped):
+                # text_hash na condição: ementa alterada durante o job continua pendente
+                db.execute(
+                    update(models.CatalogDiscipline)
+                    .where(models.CatalogDiscipline.id == r.id, models.CatalogDiscipline.text_hash == r.text_hash)
+                    .values(
+                        nodes=encode_mapped_nodes(nodes), taxonomy_version=taxonomy_version,
+                        model_version=model_version, mapped_at=now,
+                    )
+                )
+            db.commit()
+        if rows:
+            publish_catalog_invalidation(tenant_id, course_id)
+
+        return {"ok": True, "course_id": course_id, "taxonomy_version": taxonomy_version, "mapped": len(rows)}
+    finally:
+        db.close()
@@ -0,0 +1,143 @@
+from __future__ import annotations
+import json
+import logging
+import uuid
+import weakref
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.cache.cache import SimpleTTLCache
+from app.cache.codec import decode_mapped_nodes
+from app.config import settings
+from app.engine.utils import normalize_ementa, sha256_text
+from app.mapper.base import MappedNode
+
+logger = logging.getLogger("equivalence")
+
+_STORES: "weakref.WeakSet[CatalogStore]" = weakref.WeakSet()
+
+
+class CatalogStore:
+    """
+    Conceitos pré-mapeados do catálogo de destinos (catalog_disciplines), lidos pelo engine.
+    O curso inteiro é carregado de uma vez e fica em memória por ttl_seconds:
+    evaluate com course_id + disciplina_id não toca o DB nem o mapper.
+    upsert_catalog/map_course_catalog descartam o curso (publish_catalog_invalidation).
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], ttl_seconds: int = 300, max_items: int = 1000):
+        self.session_factory = session_factory
+        self.cache = SimpleTTLCache(ttl_seconds=ttl_seconds, max_items=max_items, name="catalog")
+        # geração por curso na chave: invalidar = trocar de chave (as antigas saem por TTL/LRU)
+        self._generation: Dict[Tuple[str, str], int] = {}
+        _STORES.add(self)
+
+    def invalidate(self, tenant_id: str, course_id: str) -> None:
+        key = (tenant_id, course_id)
+        self._generation[key] = self._generation.get(key, 0) + 1
+
+    def course_nodes(
+        self, tenant_id: str, course_id: str, taxonomy_version: str, model_version: str
+    ) -> Dict[int, List[MappedNode]]:
+        """disciplina_id -> mapeamento, só das disciplinas já mapeadas para esta versão/modelo."""
+        generation = str(self._generation.get((tenant_id, course_id), 0))
+        key = "\x1f".join((tenant_id, course_id, taxonomy_version, model_version, generation))
+        by_id = self.cache.get(key)
+        if by_id is None:
+            with self.session_factory() as db:
+                rows = db.execute(
+                    select(models.CatalogDiscipline.disciplina_id, models.CatalogDiscipline.nodes).where(
+                        models.CatalogDiscipline.tenant_id == tenant_id,
+                        models.CatalogDiscipline.course_id == course_id,
+                        models.CatalogDiscipline.taxonomy_version == taxonomy_version,
+                        models.CatalogDiscipline.model_version == model_version,
+                        models.CatalogDiscipline.nodes.is_not(None),
+                    )
+                ).all()
+            by_id = {did: decode_mapped_nodes(bytes(data)) for did, data in rows}
+            # curso ainda sem catálogo mapeado não fica em cache: o primeiro map_course_catalog vale já
+            if by_id:
+                self.cache.set(key, by_id)
+        return by_id
+
+
+def invalidate_course(tenant_id: str, course_id: str) -> None:
+    """Descarta o curso nos CatalogStore deste processo."""
+    for store in list(_STORES):
+        store.invalidate(tenant_id, course_id)
+
+
+def publish_catalog_invalidation(tenant_id: str, course_id: str) -> None:
+    """Invalida neste processo e avisa os demais pelo canal de invalidação (o mesmo do cache de auth)."""
+    invalidate_course(tenant_id, course_id)
+    try:
+        from app.redis_client import redis_conn
+
+        redis_conn.publish(
+            settings.AUTH_INVALIDATION_CHANNEL,
+            json.dumps({"catalog": {"tenant_id": tenant_id, "course_id": course_id}}),
+        )
+    except Exception as e:
+        # sem Redis os outros processos só veem o catálogo novo ao fim do TTL
+        logger.warning("catalog invalidation não publicada: %s", e)
+
+
+def catalog_text_hash(ementa: str) -> str:
+    # mesmo hash do engine (EquivalenceEngine._text_hash)
+    return sha256_text(normalize_ementa(ementa))
+
+
+def upsert_catalog(db: Session, tenant_id: str, course_id: str, disciplinas: List[dict]) -> Dict[str, int]:
+    """
+    Grava as disciplinas do curso. Ementa nova ou alterada volta a ficar pendente
+    (nodes=None) até o próximo map_course_catalog; nome/carga/nível só atualizam.
+    """
+    existing = {
+        r.disciplina_id: r
+        for r in db.execute(
+            select(models.CatalogDiscipline).where(
+                models.CatalogDiscipline.tenant_id == tenant_id,
+                models.CatalogDiscipline.course_id == course_id,
+            )
+        ).scalars()
+    }
+    created = changed = 0
+    for d in disciplinas:
+        text_hash = catalog_text_hash(d["ementa"])
+        row = existing.get(int(d["disciplina_id"]))
+        if row is None:
+            row = existing[int(d["disciplina_id"])] = models.CatalogDiscipline(
+                id=str(uuid.uuid4()), tenant_id=tenant_id, course_id=course_id,
+                disciplina_id=int(d["disciplina_id"]), ementa=d["ementa"], text_hash=text_hash,
+            )
+            db.add(row)
+            created += 1
+        elif row.text_hash != text_hash:
+            row.ementa, row.text_hash = d["ementa"], text_hash
+            row.nodes = row.taxonomy_version = row.model_version = row.mapped_at = None
+            changed += 1
+        row.nome = d["nome"]
+        row.carga_horaria = int(d["carga_horaria"])
+        row.nivel = d.get("nivel")
+    db.commit()
+    return {"created": created, "changed": changed, "unchanged": len(disciplinas) - created - changed}
+
+
+def pending_catalog_rows(db: Session, tenant_id: str, course_id: str, taxonomy_version: str, model_version: str):
+    """(id, ementa, text_hash) das disciplinas sem mapeamento para esta versão/modelo."""
+    return db.execute(
+        select(
+            models.CatalogDiscipline.id, models.CatalogDiscipline.ementa, models.CatalogDiscipline.text_hash
+        ).where(
+            models.CatalogDiscipline.tenant_id == tenant_id,
+            models.CatalogDiscipline.course_id == course_id,
+            or_(
+                models.CatalogDiscipline.nodes.is_(None),
+                models.CatalogDiscipline.taxonomy_version != taxonomy_version,
+                models.CatalogDiscipline.model_version != model_version,
+            ),
+        ).order_by(models.CatalogDiscipline.disciplina_id)
+    ).all()
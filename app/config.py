@@ -10,10 +10,64 @@ class Settings:
 
     # RQ
     RQ_QUEUE_NAME = os.getenv("RQ_QUEUE_NAME", "equivalence")
+    # Batch: itens por job RQ (1 = um job por item, modo antigo) e timeout do job da fatia
+    BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "100"))
+    BATCH_CHUNK_TIMEOUT = int(os.getenv("BATCH_CHUNK_TIMEOUT", "1800"))
+    # itens da fatia sem lock (request_id em processamento em outra fatia/job): nova fatia após o delay,
+    # até BATCH_LOCK_RETRIES vezes (cobre o TTL do lock, 360s); depois viram failed
+    BATCH_LOCK_RETRY_DELAY = int(os.getenv("BATCH_LOCK_RETRY_DELAY", "30"))
+    BATCH_LOCK_RETRIES = int(os.getenv("BATCH_LOCK_RETRIES", "12"))
+    # acima disso o POST /batch só cria o job e delega inserts/enqueue a um job de ingestão
+    BATCH_INGEST_THRESHOLD = int(os.getenv("BATCH_INGEST_THRESHOLD", "2000"))
+    # upload NDJSON em streaming: itens gravados/enfileirados a cada BATCH_STREAM_FLUSH linhas
+    BATCH_STREAM_FLUSH = int(os.getenv("BATCH_STREAM_FLUSH", "500"))
+    BATCH_STREAM_MAX_LINE = int(os.getenv("BATCH_STREAM_MAX_LINE", str(1024 * 1024)))
+    RESULTS_STREAM_BATCH = int(os.getenv("RESULTS_STREAM_BATCH", "1000"))  # linhas por fetch no /results?format=ndjson
 
     # Cache
     EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", "2592000"))  # 30 dias
     MAPPER_CACHE_TTL = int(os.getenv("MAPPER_CACHE_TTL", "2592000"))
+    MAPPER_CACHE_MAX_ITEMS = int(os.getenv("MAPPER_CACHE_MAX_ITEMS", "50000"))
+    MAPPER_CACHE_MAX_BYTES = int(os.getenv("MAPPER_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # 0 = sem limite
+    CACHE_SWEEP_INTERVAL = float(os.getenv("CACHE_SWEEP_INTERVAL", "60"))
+    MAPPER_CACHE_L2 = os.getenv("MAPPER_CACHE_L2", "1") == "1"  # L2 compartilhado no Redis
+    MAPPING_STORE_ENABLED = os.getenv("MAPPING_STORE_ENABLED", "1") == "1"  # tabela mapped_ementas
+
+    # Catálogo de destinos pré-mapeado por curso (catalog_disciplines)
+    CATALOG_ENABLED = os.getenv("CATALOG_ENABLED", "1") == "1"
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))  # segundos em memória por curso
+    CATALOG_MAP_BATCH = int(os.getenv("CATALOG_MAP_BATCH", "256"))  # ementas por map_many no job
+
+    # Cache de autenticação por API key (negativo = chaves inválidas) + invalidação via Redis pub/sub
+    AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+    AUTH_NEGATIVE_TTL = int(os.getenv("AUTH_NEGATIVE_TTL", "10"))
+    AUTH_CACHE_MAX_ITEMS = int(os.getenv("AUTH_CACHE_MAX_ITEMS", "10000"))
+    AUTH_CACHE_PUBSUB = os.getenv("AUTH_CACHE_PUBSUB", "1") == "1"
+    AUTH_INVALIDATION_CHANNEL = os.getenv("AUTH_INVALIDATION_CHANNEL", "auth:invalidate")
+
+    # Rate limit: RATE_LIMIT_LEASE > 0 reserva blocos de tokens no Redis e gasta localmente (0 = um round trip por request)
+    RATE_LIMIT_LEASE = int(os.getenv("RATE_LIMIT_LEASE", "0"))
+    RATE_LIMIT_LEASE_TTL = float(os.getenv("RATE_LIMIT_LEASE_TTL", "1.0"))  # segundos até descartar tokens não usados
+    RATE_LIMIT_TENANT = os.getenv("RATE_LIMIT_TENANT", "1") == "1"  # bucket por tenant além do bucket da rota
+
+    # Métricas multiprocess: cada processo grava arquivos mmap aqui e o /metrics soma todos (vazio = só o processo do scrape)
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+
+    # Índice de embeddings: acima de ANN_MIN_NODES usa IVF (aproximado)
+    ANN_MIN_NODES = int(os.getenv("ANN_MIN_NODES", "100000"))
+    ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+
+    # Artefato mmap do índice (gerado pelo index_builder, lido por API/worker)
+    INDEX_ARTIFACT_DIR = os.getenv("INDEX_ARTIFACT_DIR", "data/index_artifacts")
+    INDEX_ARTIFACT_VERIFY = os.getenv("INDEX_ARTIFACT_VERIFY", "0") == "1"
+    INDEX_TENANT_ID = os.getenv("INDEX_TENANT_ID", "arbe")
+
+    # Micro-batching de embeddings do mapper (0 ms = desligado)
+    EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+    EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "64"))
+
+    # Executor compartilhado para mapear origem/destino em paralelo no evaluate síncrono
+    MAP_EXECUTOR_WORKERS = int(os.getenv("MAP_EXECUTOR_WORKERS", "16"))
 
 settings = Settings()
 DEBUG = True
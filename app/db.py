@@ -1,5 +1,6 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from app.config import settings
 
 engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
@@ -14,3 +15,26 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Sessão async (asyncpg) para rotas async. Criada sob demanda: só processos que
+# usam rotas async precisam do driver.
+_async_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+
+def async_database_url(url: str) -> str:
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    return url
+
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        async_engine = create_async_engine(async_database_url(settings.DATABASE_URL), pool_pre_ping=True)
+        _async_sessionmaker = async_sessionmaker(async_engine, expire_on_commit=False)
+    return _async_sessionmaker
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
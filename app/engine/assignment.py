@@ -0,0 +1,62 @@
+from __future__ import annotations
+from typing import List, Tuple
+
+import numpy as np
+
+
+def best_assignment(score: np.ndarray, allowed: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Emparelhamento 1:1 origem -> destino que maximiza a soma dos scores
+    (algoritmo húngaro, O(n^2 m) com o laço interno em NumPy).
+    Pares fora de `allowed` nunca entram no resultado. Retorna [(origem, destino)] por origem.
+    """
+    score = np.asarray(score, dtype=np.float64)
+    m, n = score.shape
+    if m == 0 or n == 0:
+        return []
+    # par proibido custa 0, o mesmo que deixar a linha sem par (scores >= 0):
+    # o húngaro só o usa para completar o emparelhamento e ele é descartado depois
+    cost = np.where(allowed, -np.maximum(score, 0.0), 0.0)
+    transposed = m > n
+    if transposed:
+        cost = cost.T
+    rows = _hungarian(cost)
+    pairs = [(c, r) if transposed else (r, c) for r, c in rows]
+    return sorted((i, j) for i, j in pairs if allowed[i, j])
+
+
+def _hungarian(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """Custo mínimo para matriz n x m com n <= m (potenciais u/v, e-maxx)."""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j] = linha (1-based) no destino j; 0 = livre
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            j1 = int(np.argmin(np.where(free, minv[1:], np.inf))) + 1
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    return [(int(p[j]) - 1, j - 1) for j in range(1, m + 1) if p[j] != 0]
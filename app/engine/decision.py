@@ -1,5 +1,6 @@
 from __future__ import annotations
 from typing import Tuple
+import numpy as np
 from app.api.schemas import PolicyInput, DecisionType
 
 def decide(policy: PolicyInput, score: int, cov_crit: float, degraded_mode: bool) -> Tuple[DecisionType, str]:
@@ -19,3 +20,24 @@ def decide(policy: PolicyInput, score: int, cov_crit: float, degraded_mode: bool
         return "ANALISE_HUMANA", "Similaridade suficiente, recomenda-se complemento — encaminhado para análise humana."
 
     return "INDEFERIDO", "Score insuficiente para equivalência."
+
+# códigos compactos para o modo matriz (índice = código int8)
+DECISIONS: Tuple[DecisionType, ...] = ("INDEFERIDO", "ANALISE_HUMANA", "DEFERIDO")
+INDEFERIDO, ANALISE_HUMANA, DEFERIDO = 0, 1, 2
+
+def decide_matrix(
+    policy: PolicyInput, score: np.ndarray, cov_crit: np.ndarray, degraded: np.ndarray, borderline: np.ndarray
+) -> np.ndarray:
+    """
+    decide() para todos os pares (códigos de DECISIONS). Aplica da regra menos para a
+    mais prioritária: score, críticos, modo degradado e, por fim, a regra de borderline
+    de carga horária do engine (que vem antes de decide()).
+    """
+    code = np.full(score.shape, INDEFERIDO, dtype=np.int8)
+    code[score >= policy.min_score_complemento] = ANALISE_HUMANA
+    code[score >= policy.min_score_deferir] = DEFERIDO
+    if policy.exigir_criticos:
+        code[cov_crit < 1.0] = INDEFERIDO
+    code[degraded] = ANALISE_HUMANA
+    code[borderline] = ANALISE_HUMANA
+    return code
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import List
 import math
+import numpy as np
 from app.api.schemas import HardRuleResult, PolicyInput, DisciplineInput
 
 def apply_hard_rules(origem: DisciplineInput, destino: DisciplineInput, policy: PolicyInput) -> List[HardRuleResult]:
@@ -56,3 +57,29 @@ def hard_rules_block_decision(hard_rules: List[HardRuleResult]) -> bool:
         if r.rule in essential and not r.ok:
             return True
     return False
+
+def hard_rules_block_matrix(origens: List[DisciplineInput], destinos: List[DisciplineInput], policy: PolicyInput) -> np.ndarray:
+    """
+    hard_rules_block_decision(apply_hard_rules(o, d, policy)) para todos os pares, em [origens x destinos].
+    Regras só da origem (aprovação, validade) viram vetores por linha; carga e entrada cruzam linha x coluna.
+    """
+    from datetime import datetime
+    year = datetime.now().year
+
+    has_o = np.array([bool(o.ementa) for o in origens], dtype=bool)
+    has_d = np.array([bool(d.ementa) for d in destinos], dtype=bool)
+    reprovada = np.array([o.aprovado is False for o in origens], dtype=bool)
+    carga_o = np.array([o.carga_horaria for o in origens], dtype=np.int64)
+    min_required = np.array(
+        [int(math.ceil(d.carga_horaria * policy.tolerancia_carga)) for d in destinos], dtype=np.int64
+    )
+    vencida = np.array([
+        policy.max_anos_validade is not None
+        and o.ano_conclusao is not None
+        and (year - o.ano_conclusao) > policy.max_anos_validade
+        for o in origens
+    ], dtype=bool)
+
+    entrada = ~(has_o[:, None] & has_d[None, :])
+    carga = carga_o[:, None] < min_required[None, :]
+    return entrada | carga | (reprovada | vencida)[:, None]
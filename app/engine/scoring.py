@@ -1,6 +1,8 @@
 from __future__ import annotations
 from typing import Dict, List, Tuple
+import numpy as np
 from app.mapper.base import MappedNode
+from app.taxonomy.arrays import LEVEL_AVANCADO, TaxonomyArrays
 from app.taxonomy.models import TaxonomyNode
 from app.api.schemas import ScoreBreakdown, PolicyInput
 
@@ -55,6 +57,206 @@ def level_penalty(origin_vec: Dict[int, float], dest_vec: Dict[int, float], node
     ratio = covered_adv / len(dest_adv)
     return float(max(0.0, 1.0 - ratio))  # 1.0 se cobre zero, 0.0 se cobre tudo
 
+def vectorized_scores(
+    origin_vec: Dict[int, float], dest_vec: Dict[int, float], arrays: TaxonomyArrays
+) -> Tuple[float, List[int], float, List[int], float]:
+    """
+    coverage + critical_coverage + level_penalty de uma vez, com NumPy sobre os
+    vetores esparsos e os arrays pré-computados da versão (sem lookup em dict por conceito).
+    Resultado bit a bit igual às funções acima:
+      - somas em ordem de inserção com np.cumsum (sequencial como sum() no Python 3.11;
+        np.sum usa soma pairwise e arredondaria diferente)
+      - contagens inteiras, divisões feitas em float do Python
+    Retorna (cov, missing, cov_crit, missing_crit, pen).
+    """
+    n = len(dest_vec)
+    if n == 0:
+        # coverage=0, sem críticos (1.0), sem avançados (0.0)
+        return 0.0, [], 1.0, [], 0.0
+
+    d_ids = np.fromiter(dest_vec.keys(), dtype=np.int64, count=n)
+    d_w = np.fromiter(dest_vec.values(), dtype=np.float64, count=n)
+    o_pos = np.fromiter((nid for nid, w in origin_vec.items() if w > 0), dtype=np.int64)
+    covered = np.isin(d_ids, o_pos)
+
+    # cobertura ponderada pelo destino
+    total = float(np.cumsum(d_w)[-1])
+    if total <= 0:
+        cov, missing = 0.0, d_ids.tolist()
+    else:
+        covered_w = d_w[covered]
+        covered_sum = float(np.cumsum(covered_w)[-1]) if len(covered_w) else 0.0
+        cov, missing = min(1.0, covered_sum / total), d_ids[~covered].tolist()
+
+    pos = arrays.positions(d_ids)
+    known = pos >= 0
+    safe = np.where(known, pos, 0)
+
+    # cobertura crítica
+    crit = known & arrays.critical[safe]
+    n_crit = int(crit.sum())
+    if n_crit == 0:
+        cov_crit, missing_crit = 1.0, []
+    else:
+        missing_crit = d_ids[crit & ~covered].tolist()
+        cov_crit = max(0.0, min(1.0, 1.0 - (len(missing_crit) / n_crit)))
+
+    # penalidade de nível
+    adv = known & (arrays.level[safe] == LEVEL_AVANCADO)
+    n_adv = int(adv.sum())
+    if n_adv == 0:
+        pen = 0.0
+    else:
+        ratio = int((adv & covered).sum()) / n_adv
+        pen = float(max(0.0, 1.0 - ratio))
+
+    return cov, missing, cov_crit, missing_crit, pen
+
+def vectorized_scores_many(
+    origin_vec: Dict[int, float], dest_vecs: List[Dict[int, float]], arrays: TaxonomyArrays
+) -> List[Tuple[float, List[int], float, List[int], float]]:
+    """
+    vectorized_scores de uma origem contra vários destinos numa única passada.
+    Os destinos viram uma matriz [m, maior vetor] com zeros à direita (x + 0.0 == x),
+    então o cumsum por linha reproduz a soma sequencial de cada destino bit a bit.
+    """
+    m = len(dest_vecs)
+    lens = np.fromiter((len(v) for v in dest_vecs), dtype=np.int64, count=m)
+    n = int(lens.sum())
+    if n == 0:
+        return [(0.0, [], 1.0, [], 0.0)] * m
+
+    ids = np.fromiter((nid for v in dest_vecs for nid in v.keys()), dtype=np.int64, count=n)
+    w = np.fromiter((x for v in dest_vecs for x in v.values()), dtype=np.float64, count=n)
+    o_pos = np.fromiter((nid for nid, x in origin_vec.items() if x > 0), dtype=np.int64)
+    covered = np.isin(ids, o_pos)
+
+    starts = np.cumsum(lens) - lens
+    row = np.repeat(np.arange(m), lens)
+    col = np.arange(n) - starts[row]
+    width = int(lens.max())
+    w_all = np.zeros((m, width))
+    w_cov = np.zeros((m, width))
+    w_all[row, col] = w
+    w_cov[row, col] = np.where(covered, w, 0.0)
+    totals = np.cumsum(w_all, axis=1)[:, -1].tolist()
+    covered_sums = np.cumsum(w_cov, axis=1)[:, -1].tolist()
+
+    pos = arrays.positions(ids)
+    known = pos >= 0
+    safe = np.where(known, pos, 0)
+    crit = known & arrays.critical[safe]
+    adv = known & (arrays.level[safe] == LEVEL_AVANCADO)
+    n_crit = np.bincount(row[crit], minlength=m).tolist()
+    n_adv = np.bincount(row[adv], minlength=m).tolist()
+    n_adv_cov = np.bincount(row[adv & covered], minlength=m).tolist()
+
+    ids_l = ids.tolist()
+    uncovered_l = (~covered).tolist()
+    crit_missing_l = (crit & ~covered).tolist()
+
+    out = []
+    for i in range(m):
+        a, b = int(starts[i]), int(starts[i] + lens[i])
+        if a == b:
+            out.append((0.0, [], 1.0, [], 0.0))
+            continue
+        if totals[i] <= 0:
+            cov, missing = 0.0, ids_l[a:b]
+        else:
+            cov = min(1.0, covered_sums[i] / totals[i])
+            missing = [ids_l[j] for j in range(a, b) if uncovered_l[j]]
+        if n_crit[i] == 0:
+            cov_crit, missing_crit = 1.0, []
+        else:
+            missing_crit = [ids_l[j] for j in range(a, b) if crit_missing_l[j]]
+            cov_crit = max(0.0, min(1.0, 1.0 - (len(missing_crit) / n_crit[i])))
+        pen = 0.0 if n_adv[i] == 0 else float(max(0.0, 1.0 - (n_adv_cov[i] / n_adv[i])))
+        out.append((cov, missing, cov_crit, missing_crit, pen))
+    return out
+
+def score_matrix(
+    origin_vecs: List[Dict[int, float]], dest_vecs: List[Dict[int, float]], arrays: TaxonomyArrays
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Matrizes [origens x destinos] de cobertura, cobertura crítica e penalidade de nível.
+    Mesmos valores (bit a bit) de vectorized_scores para cada par:
+      - contagens (críticos/avançados cobertos) por produto de matrizes inteiro
+        origem x conceito @ conceito x destino
+      - cobertura ponderada por cumsum na ordem do destino sobre um tensor
+        [origens, destinos, maior destino] (uma GEMM em float somaria em outra ordem)
+    """
+    m, n = len(origin_vecs), len(dest_vecs)
+    lens = np.fromiter((len(v) for v in dest_vecs), dtype=np.int64, count=n)
+    total_n = int(lens.sum())
+    if m == 0 or n == 0 or total_n == 0:
+        return np.zeros((m, n)), np.ones((m, n)), np.zeros((m, n))
+
+    d_ids = np.fromiter((nid for v in dest_vecs for nid in v.keys()), dtype=np.int64, count=total_n)
+    d_w = np.fromiter((x for v in dest_vecs for x in v.values()), dtype=np.float64, count=total_n)
+    concepts, d_col = np.unique(d_ids, return_inverse=True)  # conceitos presentes em algum destino
+    n_concepts = len(concepts)
+
+    # origem x conceito: 1 se a origem cobre o conceito (peso > 0)
+    o_rows, o_ids = [], []
+    for i, v in enumerate(origin_vecs):
+        for nid, w in v.items():
+            if w > 0:
+                o_rows.append(i)
+                o_ids.append(nid)
+    o_rows = np.asarray(o_rows, dtype=np.int64)
+    o_ids = np.asarray(o_ids, dtype=np.int64)
+    o_col = np.minimum(np.searchsorted(concepts, o_ids), n_concepts - 1)
+    hit = concepts[o_col] == o_ids if len(o_ids) else np.zeros(0, dtype=bool)
+    covers = np.zeros((m, n_concepts + 1), dtype=bool)  # última coluna: padding, nunca coberta
+    covers[o_rows[hit], o_col[hit]] = True
+
+    # destinos em matriz [n, maior destino] com padding à direita
+    starts = np.cumsum(lens) - lens
+    row = np.repeat(np.arange(n), lens)
+    col = np.arange(total_n) - starts[row]
+    width = int(lens.max())
+    pad_col = np.full((n, width), n_concepts, dtype=np.int64)
+    pad_w = np.zeros((n, width))
+    pad_col[row, col] = d_col
+    pad_w[row, col] = d_w
+
+    # cobertura ponderada
+    covered3 = covers[:, pad_col]  # [m, n, width]
+    covered_sum = np.cumsum(np.where(covered3, pad_w[None, :, :], 0.0), axis=2)[:, :, -1]
+    total = np.cumsum(pad_w, axis=1)[:, -1]
+    safe_total = np.where(total > 0, total, 1.0)
+    cov = np.where(total > 0, np.minimum(1.0, covered_sum / safe_total), 0.0)
+
+    # críticos e avançados: conceito x destino
+    pos = arrays.positions(d_ids)
+    known = pos >= 0
+    safe = np.where(known, pos, 0)
+    crit = (known & arrays.critical[safe]).astype(np.int64)
+    adv = (known & (arrays.level[safe] == LEVEL_AVANCADO)).astype(np.int64)
+    crit_cd = np.zeros((n_concepts + 1, n), dtype=np.int64)
+    adv_cd = np.zeros((n_concepts + 1, n), dtype=np.int64)
+    np.add.at(crit_cd, (d_col, row), crit)
+    np.add.at(adv_cd, (d_col, row), adv)
+    covers_i = covers.astype(np.int64)
+
+    n_crit = crit_cd.sum(axis=0)
+    missing_crit = n_crit[None, :] - covers_i @ crit_cd
+    safe_crit = np.where(n_crit > 0, n_crit, 1)
+    cov_crit = np.where(n_crit > 0, np.clip(1.0 - (missing_crit / safe_crit), 0.0, 1.0), 1.0)
+
+    n_adv = adv_cd.sum(axis=0)
+    safe_adv = np.where(n_adv > 0, n_adv, 1)
+    pen = np.where(n_adv > 0, np.maximum(0.0, 1.0 - ((covers_i @ adv_cd) / safe_adv)), 0.0)
+    return cov, cov_crit, pen
+
+def final_score_matrix(policy: PolicyInput, cov: np.ndarray, cov_crit: np.ndarray, pen: np.ndarray) -> np.ndarray:
+    """final_score elemento a elemento (mesma ordem de operações; rint = round do Python, meio-par)."""
+    w = policy.weights
+    raw = (w.cobertura * cov) + (w.critica * cov_crit) - (w.nivel * pen)
+    raw = np.clip(raw, 0.0, 1.0)
+    return np.rint(raw * 100).astype(np.int64)
+
 def final_score(policy: PolicyInput, cov: float, cov_crit: float, pen_level: float) -> Tuple[int, ScoreBreakdown]:
     w = policy.weights
     raw = (w.cobertura * cov) + (w.critica * cov_crit) - (w.nivel * pen_level)
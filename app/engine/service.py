@@ -1,16 +1,46 @@
 from __future__ import annotations
-from typing import Optional
-from app.api.schemas import EvaluateRequest, EvaluateResponse, EvidenceBlock, ConceptEvidence, TimingsMs, ScoreBreakdown
-from app.engine.hard_rules import apply_hard_rules, hard_rules_block_decision
-from app.engine.scoring import build_vector, coverage, critical_coverage, level_penalty, final_score
+import asyncio
+import logging
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from app.api.schemas import (
+    EvaluateRequest, EvaluateResponse, EvidenceBlock, ConceptEvidence, TimingsMs, ScoreBreakdown,
+    EvaluateManyRequest, EvaluateManyResponse, RankedEvaluation,
+    EvaluateMatrixRequest, EvaluateMatrixResponse, MatrixAssignment,
+)
+from app.engine.hard_rules import apply_hard_rules, hard_rules_block_decision, hard_rules_block_matrix
+from app.engine.scoring import (
+    build_vector, vectorized_scores, vectorized_scores_many, final_score, score_matrix, final_score_matrix,
+)
 import math
-from app.engine.decision import decide
+import numpy as np
+from app.engine.assignment import best_assignment
+from app.engine.decision import DECISIONS, INDEFERIDO, decide, decide_matrix
 from app.engine.justification import build_justification
-from app.engine.utils import sha256_text, timer_ms
+from app.engine.utils import normalize_ementa, sha256_text, timer_ms
 from app.taxonomy.store import TaxonomyStore
-from app.mapper.base import TaxonomyMapper
-from app.cache.cache import SimpleTTLCache
+from app.mapper.base import MappedNode, TaxonomyMapper
+from app.cache.cache import MappingCache
+from app.mapping_repo import MappingStore
+from app.catalog_repo import CatalogStore
 from app.audit.repository import AuditRepository
+from app.config import settings
+
+logger = logging.getLogger("equivalence")
+
+_MAP_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_MAP_EXECUTOR_LOCK = threading.Lock()
+
+def shared_map_executor() -> ThreadPoolExecutor:
+    """Pool único (limitado) por processo para os mapeamentos concorrentes do evaluate."""
+    global _MAP_EXECUTOR
+    with _MAP_EXECUTOR_LOCK:
+        if _MAP_EXECUTOR is None:
+            _MAP_EXECUTOR = ThreadPoolExecutor(
+                max_workers=settings.MAP_EXECUTOR_WORKERS, thread_name_prefix="engine-map"
+            )
+        return _MAP_EXECUTOR
 
 class EquivalenceEngine:
     def __init__(
@@ -18,178 +48,601 @@ class EquivalenceEngine:
         taxonomy_store: TaxonomyStore,
         mapper: TaxonomyMapper,
         fallback_mapper: Optional[TaxonomyMapper],
-        cache: SimpleTTLCache,
+        cache: MappingCache,
         audit_repo: AuditRepository,
+        executor: Optional[Executor] = None,
+        mapping_store: Optional[MappingStore] = None,
+        catalog: Optional[CatalogStore] = None,
     ):
         self.taxonomy_store = taxonomy_store
         self.mapper = mapper
         self.fallback_mapper = fallback_mapper
         self.cache = cache
         self.audit = audit_repo
+        self.executor = executor
+        # store durável (mapped_ementas): lookup cache -> store -> mapper
+        self.mapping_store = mapping_store
+        # catálogo de destinos pré-mapeado por curso (course_id + destino.disciplina_id)
+        self.catalog = catalog
+
+    @staticmethod
+    def _text_hash(ementa: str) -> str:
+        return sha256_text(normalize_ementa(ementa))
+
+    def _cache_key(self, tenant_id: str, taxonomy_version: str, text_hash: str) -> str:
+        # sem "side": a mesma ementa em origem e destino é mapeada uma vez só
+        return sha256_text(tenant_id, "\x1f", taxonomy_version, "\x1f", self.mapper.model_version, "\x1f", text_hash)
+
+    def _lookup(self, tenant_id: str, taxonomy_version: str, hashes: List[str]) -> Dict[str, List[MappedNode]]:
+        """Mapeamentos já conhecidos por hash de ementa: cache (L1/L2) e depois o store durável."""
+        keys = {h: self._cache_key(tenant_id, taxonomy_version, h) for h in hashes}
+        cached = self.cache.get_many(list(keys.values()))
+        found = {h: cached[k] for h, k in keys.items() if cached.get(k) is not None}
+
+        missing = [h for h in hashes if h not in found]
+        if missing and self.mapping_store is not None:
+            try:
+                stored = self.mapping_store.get_many(tenant_id, taxonomy_version, self.mapper.model_version, missing)
+            except Exception as e:
+                # store fora do ar: segue como miss, o mapper resolve
+                logger.warning("mapping store indisponível (get): %s", e)
+                stored = {}
+            if stored:
+                self.cache.set_many({keys[h]: m for h, m in stored.items()})
+                found.update(stored)
+        return found
+
+    def _remember(self, tenant_id: str, taxonomy_version: str, mapped: Dict[str, List[MappedNode]]) -> None:
+        """
+        Grava mapeamentos novos no cache e no store durável. Nunca os do fallback, nem os que o
+        mapper devolveu sem refinamento (UnrefinedNodes, ex.: LLM fora do ar): esses ficam só no cache.
+        """
+        self.cache.set_many({self._cache_key(tenant_id, taxonomy_version, h): m for h, m in mapped.items()})
+        durable = {h: m for h, m in mapped.items() if not getattr(m, "unrefined", False)}
+        if self.mapping_store is not None and durable:
+            try:
+                self.mapping_store.put_many(tenant_id, taxonomy_version, self.mapper.model_version, durable)
+            except Exception as e:
+                logger.warning("mapping store indisponível (put): %s", e)
+
+    def prefetch_mappings(self, tenant_id: str, taxonomy_version: str, items: List[Tuple[str, str]]) -> int:
+        """
+        Pré-aquece o cache de mapeamento para vários (side, ementa) com um único
+        mapper.map_many (um /embed + uma GEMM para o lote inteiro).
+        Usado por batch/worker antes de chamar evaluate() item a item.
+        O side não entra na chave: ementas iguais (normalizadas) são mapeadas uma vez.
+        Retorna quantas ementas distintas precisaram ser mapeadas.
+        """
+        _, n_mapped = self._map_bulk(tenant_id, taxonomy_version, [ementa for _side, ementa in items])
+        return n_mapped
+
+    def map_ementas(self, tenant_id: str, taxonomy_version: str, ementas: List[str]) -> List[List[MappedNode]]:
+        """Mapeamento em lote (cache/store, um map_many para o resto); usado pelo job do catálogo."""
+        mapped, _ = self._map_bulk(tenant_id, taxonomy_version, ementas)
+        return mapped
+
+    def _catalog_lookup(self, tenant_id: str, course_id: Optional[str], taxonomy_version: str, destinos) -> Dict[int, List[MappedNode]]:
+        """Destinos já mapeados no catálogo do curso, por posição em `destinos` (sem hash nem mapper)."""
+        if self.catalog is None or not course_id or all(d.disciplina_id is None for d in destinos):
+            return {}
+        try:
+            by_id = self.catalog.course_nodes(tenant_id, course_id, taxonomy_version, self.mapper.model_version)
+        except Exception as e:
+            # catálogo fora do ar: destinos seguem pelo mapeamento normal
+            logger.warning("catálogo indisponível: %s", e)
+            return {}
+        return {k: by_id[d.disciplina_id] for k, d in enumerate(destinos) if d.disciplina_id in by_id}
+
+    def _map_bulk(self, tenant_id: str, taxonomy_version: str, ementas: List[str]) -> Tuple[List[List[MappedNode]], int]:
+        """Mapeia várias ementas: cache/store em lote, um map_many para as que faltam. Retorna (mapeamentos, nº mapeadas)."""
+        hashes = [self._text_hash(e) for e in ementas]
+        wanted: Dict[str, str] = {}  # text hash -> ementa (dedup)
+        for h, ementa in zip(hashes, ementas):
+            wanted.setdefault(h, ementa)
+        found = self._lookup(tenant_id, taxonomy_version, list(wanted.keys()))
+        missing = {h: e for h, e in wanted.items() if h not in found}
+        if missing:
+            mapped: List[List[MappedNode]] = self.mapper.map_many(tenant_id, taxonomy_version, list(missing.values()))
+            new = dict(zip(missing.keys(), mapped))
+            self._remember(tenant_id, taxonomy_version, new)
+            found.update(new)
+        return [found[h] for h in hashes], len(missing)
 
     def evaluate(self, req: EvaluateRequest, tenant_id: str) -> EvaluateResponse:
         timings = TimingsMs()
 
         with timer_ms() as t_total:
-            # 1) validação básica (Pydantic já fez, mas aqui você poderia impor regras extra)
-            with timer_ms() as t:
-                nodes = self.taxonomy_store.get_nodes(req.taxonomy_version)
-            timings.validate_ms = t()
-
-            # 2) hard rules
-            with timer_ms() as t:
-                hard = apply_hard_rules(req.origem, req.destino, req.policy)
-                blocked = hard_rules_block_decision(hard)
-            timings.hard_rules = t()
-
+            nodes, hard, blocked = self._validate_and_hard_rules(req, timings)
             if blocked:
-                # indeferimento determinístico, sem IA
-                score = 0
-                breakdown = ScoreBreakdown(cobertura=0.0, cobertura_critica=0.0, penalidade_nivel=0.0)
-                decisao = "INDEFERIDO"
-                motivo = "Falha em regra  (aprovação/carga/validade/entrada)."
-                curta, detalhada = build_justification(
-                    decisao, motivo, score,
-                    breakdown=breakdown,
-                    faltantes=[], criticos_faltantes=[],
-                    carga_origem=req.origem.carga_horaria,
-                    carga_destino=req.destino.carga_horaria
-                )
-                timings.total = t_total()
-                return EvaluateResponse(
-                    request_id=req.request_id,
-                    decisao=decisao,
-                    score=score,
-                    breakdown=breakdown,  # Pydantic aceita dict compatível
-                    hard_rules=hard,
-                    faltantes=[],
-                    criticos_faltantes=[],
-                    justificativa_curta=curta,
-                    justificativa_detalhada=detalhada,
-                    evidence=None,
-                    degraded_mode=False,
-                    model_version=self.mapper.model_version,
-                    policy_version=req.policy_version,
-                    taxonomy_version=req.taxonomy_version,
-                    timings_ms=timings,
-                    meta={"blocked_by_hard_rules": True},
-                )
+                return self._blocked_response(req, hard, timings, t_total)
 
-            # 3) mapeamento (cacheado)
+            # 3) mapeamento (cacheado): origem no executor compartilhado, destino nesta thread
             degraded = False
             with timer_ms() as t:
-                key_o = sha256_text(tenant_id, req.taxonomy_version, "origem", req.origem.ementa)
-                key_d = sha256_text(tenant_id, req.taxonomy_version, "destino", req.destino.ementa)
+                executor = self.executor or shared_map_executor()
+                catalog_d = self._catalog_lookup(tenant_id, req.course_id, req.taxonomy_version, [req.destino]).get(0)
+                if catalog_d is not None:
+                    # destino pré-mapeado no catálogo do curso: só a origem passa pelo mapper
+                    mapped_o, ms_o = self._map_side(tenant_id, req.taxonomy_version, req.origem.ementa)
+                    mapped_d, ms_d = catalog_d, 0
+                elif self._text_hash(req.origem.ementa) == self._text_hash(req.destino.ementa):
+                    mapped_o, ms_o = self._map_side(tenant_id, req.taxonomy_version, req.origem.ementa)
+                    mapped_d, ms_d = mapped_o, 0
+                else:
+                    fut_o = executor.submit(self._map_side, tenant_id, req.taxonomy_version, req.origem.ementa)
+                    mapped_d, ms_d = self._map_side(tenant_id, req.taxonomy_version, req.destino.ementa)
+                    mapped_o, ms_o = fut_o.result()
+
+                # se mapper não retornou nada útil, tenta fallback (se permitido)
+                if req.options.allow_degraded_fallback and (not mapped_o or not mapped_d):
+                    degraded = True
+                    if self.fallback_mapper is not None:
+                        fut_o = executor.submit(
+                            self._fallback_side, tenant_id, req.taxonomy_version, req.origem.ementa
+                        )
+                        mapped_d, fb_d = self._fallback_side(tenant_id, req.taxonomy_version, req.destino.ementa)
+                        mapped_o, fb_o = fut_o.result()
+                        ms_o += fb_o
+                        ms_d += fb_d
+            timings.map = t()
+            timings.map_origem = ms_o
+            timings.map_destino = ms_d
 
-                mapped_o = self.cache.get(key_o)
-                mapped_d = self.cache.get(key_d)
+            return self._score_and_respond(req, tenant_id, nodes, hard, mapped_o, mapped_d, degraded, timings, t_total)
 
-                if mapped_o is None:
-                    mapped_o = self.mapper.map(tenant_id, req.taxonomy_version, req.origem.ementa)
-                    self.cache.set(key_o, mapped_o)
+    async def aevaluate(self, req: EvaluateRequest, tenant_id: str) -> EvaluateResponse:
+        """
+        Variante asyncio de evaluate(): origem e destino são mapeados em paralelo
+        (asyncio.gather) com os clientes HTTP async do mapper. Mesma resposta de evaluate().
+        """
+        timings = TimingsMs()
 
-                if mapped_d is None:
-                    mapped_d = self.mapper.map(tenant_id, req.taxonomy_version, req.destino.ementa)
-                    self.cache.set(key_d, mapped_d)
+        with timer_ms() as t_total:
+            nodes, hard, blocked = self._validate_and_hard_rules(req, timings)
+            if blocked:
+                return self._blocked_response(req, hard, timings, t_total)
+
+            # 3) mapeamento (cacheado), origem || destino
+            degraded = False
+            with timer_ms() as t:
+                catalog_d = None
+                if self.catalog is not None:
+                    # catálogo: memória na maior parte das vezes, DB (síncrono) no primeiro acesso do curso
+                    catalog_d = (await asyncio.to_thread(
+                        self._catalog_lookup, tenant_id, req.course_id, req.taxonomy_version, [req.destino]
+                    )).get(0)
+                if catalog_d is not None:
+                    mapped_o, ms_o = await self._amap_side(tenant_id, req.taxonomy_version, req.origem.ementa)
+                    mapped_d, ms_d = catalog_d, 0
+                elif self._text_hash(req.origem.ementa) == self._text_hash(req.destino.ementa):
+                    mapped_o, ms_o = await self._amap_side(tenant_id, req.taxonomy_version, req.origem.ementa)
+                    mapped_d, ms_d = mapped_o, 0
+                else:
+                    (mapped_o, ms_o), (mapped_d, ms_d) = await asyncio.gather(
+                        self._amap_side(tenant_id, req.taxonomy_version, req.origem.ementa),
+                        self._amap_side(tenant_id, req.taxonomy_version, req.destino.ementa),
+                    )
 
-                # se mapper não retornou nada útil, tenta fallback (se permitido)
                 if req.options.allow_degraded_fallback and (not mapped_o or not mapped_d):
                     degraded = True
                     if self.fallback_mapper is not None:
-                        mapped_o = self.fallback_mapper.map(tenant_id, req.taxonomy_version, req.origem.ementa)
-                        mapped_d = self.fallback_mapper.map(tenant_id, req.taxonomy_version, req.destino.ementa)
+                        (mapped_o, fb_o), (mapped_d, fb_d) = await asyncio.gather(
+                            self._afallback_side(tenant_id, req.taxonomy_version, req.origem.ementa),
+                            self._afallback_side(tenant_id, req.taxonomy_version, req.destino.ementa),
+                        )
+                        ms_o += fb_o
+                        ms_d += fb_d
             timings.map = t()
+            timings.map_origem = ms_o
+            timings.map_destino = ms_d
+
+            return self._score_and_respond(req, tenant_id, nodes, hard, mapped_o, mapped_d, degraded, timings, t_total)
+
+    def evaluate_against_many(self, req: EvaluateManyRequest, tenant_id: str) -> EvaluateManyResponse:
+        """
+        Uma origem contra N destinos: origem mapeada uma vez, destinos em lote
+        (cache/store/map_many) e scoring de todos numa passada vetorizada.
+        Cada resultado é igual ao de evaluate() para o par; saída ordenada por score (top_n opcional).
+        """
+        timings = TimingsMs()
 
-            # 4) scoring
+        with timer_ms() as t_total:
+            pairs = [_pair_request(req, d) for d in req.destinos]
             with timer_ms() as t:
-                vec_o = build_vector(mapped_o, req.policy.confidence_cutoff)
-                vec_d = build_vector(mapped_d, req.policy.confidence_cutoff)
+                self.taxonomy_store.get_nodes(req.taxonomy_version)
+            timings.validate_ms = t()
 
-                cov, missing = coverage(vec_o, vec_d)
-                cov_crit, missing_crit = critical_coverage(vec_o, vec_d, nodes)
-                pen = level_penalty(vec_o, vec_d, nodes)
+            with timer_ms() as t:
+                hards = [apply_hard_rules(p.origem, p.destino, p.policy) for p in pairs]
+                open_idx = [i for i, h in enumerate(hards) if not hard_rules_block_decision(h)]
+            timings.hard_rules = t()
 
-                score, breakdown = final_score(req.policy, cov, cov_crit, pen)
-            timings.score = t()
+            # 3) mapeamento: origem uma vez, destinos em lote
+            mapped_o: List[MappedNode] = []
+            mapped_d: Dict[int, List[MappedNode]] = {}
+            degraded: Dict[int, bool] = {}
+            fallback_o: List[MappedNode] = []
+            with timer_ms() as t:
+                if open_idx:
+                    mapped_o, timings.map_origem = self._map_side(tenant_id, req.taxonomy_version, req.origem.ementa)
+                    with timer_ms() as t_d:
+                        # destinos do catálogo do curso já vêm mapeados; o resto vai em lote
+                        catalog = self._catalog_lookup(tenant_id, req.course_id, req.taxonomy_version, req.destinos)
+                        mapped_d = {i: catalog[i] for i in open_idx if i in catalog}
+                        to_map = [i for i in open_idx if i not in catalog]
+                        if to_map:
+                            ds, _ = self._map_bulk(tenant_id, req.taxonomy_version, [req.destinos[i].ementa for i in to_map])
+                            mapped_d.update(zip(to_map, ds))
+                        degraded = {
+                            i: bool(req.options.allow_degraded_fallback and (not mapped_o or not mapped_d[i]))
+                            for i in open_idx
+                        }
+                        # mesma regra do evaluate: par degradado usa o fallback nos dois lados
+                        if self.fallback_mapper is not None and any(degraded.values()):
+                            fallback_o, _ = self._fallback_side(tenant_id, req.taxonomy_version, req.origem.ementa)
+                            for i in open_idx:
+                                if degraded[i]:
+                                    mapped_d[i], _ = self._fallback_side(tenant_id, req.taxonomy_version, req.destinos[i].ementa)
+                    timings.map_destino = t_d()
+            timings.map = t()
 
-            # 5) decisão
-            # Caso borderline: origem tem carga menor que destino, mas ainda dentro
-            # da tolerância (ex: destino=75, tolerancia=0.8 -> mínimo=60, origem=60).
-            # Em cenários assim podemos optar por encaminhar para análise humana
-            # em vez de decidir automaticamente.
+            # 4) scoring vetorizado (uma passada por origem: primária e, se houver, fallback)
             with timer_ms() as t:
-                min_required = int(math.ceil(req.destino.carga_horaria * req.policy.tolerancia_carga))
-                if (
-                    req.origem.carga_horaria is not None
-                    and req.destino.carga_horaria is not None
-                    and req.origem.carga_horaria < req.destino.carga_horaria
-                    and req.origem.carga_horaria >= min_required
+                cutoff = req.policy.confidence_cutoff
+                arrays = self.taxonomy_store.arrays(req.taxonomy_version)
+                use_fb = {i: degraded[i] and self.fallback_mapper is not None for i in open_idx}
+                vec_o = build_vector(mapped_o, cutoff)
+                vec_o_fb = build_vector(fallback_o, cutoff) if any(use_fb.values()) else {}
+                vec_d = {i: build_vector(mapped_d[i], cutoff) for i in open_idx}
+                scores: Dict[int, tuple] = {}
+                for origin_vec, group in (
+                    (vec_o, [i for i in open_idx if not use_fb[i]]),
+                    (vec_o_fb, [i for i in open_idx if use_fb[i]]),
                 ):
-                    decisao = "ANALISE_HUMANA"
-                    motivo = "Diferença de carga horária dentro da tolerância — requer análise humana."
+                    if group:
+                        scores.update(zip(group, vectorized_scores_many(origin_vec, [vec_d[i] for i in group], arrays)))
+            timings.score = t()
+
+            results: List[RankedEvaluation] = []
+            for i, (pair, hard) in enumerate(zip(pairs, hards)):
+                item_timings = timings.model_copy()
+                if i not in scores:
+                    resp = self._blocked_response(pair, hard, item_timings, t_total)
                 else:
-                    decisao, motivo = decide(req.policy, score, cov_crit, degraded_mode=degraded)
-            timings.decide = t()
+                    cov, missing, cov_crit, missing_crit, pen = scores[i]
+                    score, breakdown = final_score(req.policy, cov, cov_crit, pen)
+                    resp = self._respond(
+                        pair, tenant_id, hard, fallback_o if use_fb[i] else mapped_o,
+                        vec_o_fb if use_fb[i] else vec_o, vec_d[i], degraded[i],
+                        score, breakdown, missing, cov_crit, missing_crit, item_timings, t_total,
+                    )
+                results.append(RankedEvaluation(
+                    index=i, destino_nome=pair.destino.nome, disciplina_id=pair.destino.disciplina_id, result=resp,
+                ))
+
+            results.sort(key=lambda r: -r.result.score)  # sort estável: empate mantém a ordem de entrada
+            if req.top_n is not None:
+                results = results[: req.top_n]
+            timings.total = t_total()
+
+        return EvaluateManyResponse(request_id=req.request_id, total=len(pairs), results=results, timings_ms=timings)
+
+    def evaluate_matrix(self, req: EvaluateMatrixRequest, tenant_id: str) -> EvaluateMatrixResponse:
+        """
+        Modo muitos-para-muitos: todas as origens x todos os destinos.
+        Mapeamento em lote (um _map_bulk para os dois lados), hard rules, scoring e decisão
+        como operações de matriz; score/decisão de cada par iguais aos de evaluate().
+        Opcionalmente calcula o melhor emparelhamento 1:1 (húngaro) entre pares não indeferidos.
+        """
+        timings = TimingsMs()
+        m, n = len(req.origens), len(req.destinos)
+
+        with timer_ms() as t_total:
+            with timer_ms() as t:
+                self.taxonomy_store.get_nodes(req.taxonomy_version)
+            timings.validate_ms = t()
 
-            # 6) justificativa
             with timer_ms() as t:
-                curta, detalhada = build_justification(
-                    decisao, motivo, score, breakdown, missing, missing_crit,
-                    carga_origem=req.origem.carga_horaria,
-                    carga_destino=req.destino.carga_horaria
+                blocked = hard_rules_block_matrix(req.origens, req.destinos, req.policy)
+            timings.hard_rules = t()
+
+            # 3) mapeamento: ementas dos dois lados num único lote (iguais são mapeadas uma vez)
+            with timer_ms() as t:
+                catalog = self._catalog_lookup(tenant_id, req.course_id, req.taxonomy_version, req.destinos)
+                to_map = [j for j in range(n) if j not in catalog]
+                mapped, _ = self._map_bulk(
+                    tenant_id, req.taxonomy_version, [d.ementa for d in req.origens] + [req.destinos[j].ementa for j in to_map]
                 )
-            timings.justify = t()
-
-            # 7) evidências (opcional)
-            evidence = None
-            if req.options.return_evidence:
-                covered = [
-                    ConceptEvidence(node_id=m.node_id, weight=float(m.weight), confidence=float(m.confidence), evidence=m.evidence)
-                    for m in mapped_o
-                    if m.node_id in vec_d and m.confidence >= req.policy.confidence_cutoff
-                ]
-                evidence = EvidenceBlock(
-                    covered_concepts=covered[:50],
-                    missing_concepts=missing[:200],
-                    missing_critical_concepts=missing_crit[:200],
+                mapped_o = mapped[:m]
+                mapped_d = [catalog.get(j) for j in range(n)]
+                for j, nodes in zip(to_map, mapped[m:]):
+                    mapped_d[j] = nodes
+                empty_o = np.array([not x for x in mapped_o], dtype=bool)
+                empty_d = np.array([not x for x in mapped_d], dtype=bool)
+                degraded = ~blocked & (empty_o[:, None] | empty_d[None, :])
+                if not req.options.allow_degraded_fallback:
+                    degraded[:] = False
+                # par degradado usa o fallback nos dois lados (como no evaluate)
+                use_fb = degraded.any() and self.fallback_mapper is not None
+                if use_fb:
+                    rows, cols = degraded.any(axis=1), degraded.any(axis=0)
+                    fb_o = [self._fallback_side(tenant_id, req.taxonomy_version, d.ementa)[0] if rows[i] else []
+                            for i, d in enumerate(req.origens)]
+                    fb_d = [self._fallback_side(tenant_id, req.taxonomy_version, d.ementa)[0] if cols[j] else []
+                            for j, d in enumerate(req.destinos)]
+            timings.map = t()
+
+            # 4) scoring + decisão em matriz
+            with timer_ms() as t:
+                cutoff = req.policy.confidence_cutoff
+                arrays = self.taxonomy_store.arrays(req.taxonomy_version)
+                cov, cov_crit, pen = score_matrix(
+                    [build_vector(x, cutoff) for x in mapped_o], [build_vector(x, cutoff) for x in mapped_d], arrays
                 )
+                if use_fb:
+                    fb = score_matrix(
+                        [build_vector(x, cutoff) for x in fb_o], [build_vector(x, cutoff) for x in fb_d], arrays
+                    )
+                    cov, cov_crit, pen = (np.where(degraded, f, p) for f, p in zip(fb, (cov, cov_crit, pen)))
+                scores = final_score_matrix(req.policy, cov, cov_crit, pen)
+                scores[blocked] = 0
+            timings.score = t()
+
+            with timer_ms() as t:
+                carga_o = np.array([d.carga_horaria for d in req.origens], dtype=np.int64)[:, None]
+                carga_d = np.array([d.carga_horaria for d in req.destinos], dtype=np.int64)[None, :]
+                min_required = np.array(
+                    [int(math.ceil(d.carga_horaria * req.policy.tolerancia_carga)) for d in req.destinos], dtype=np.int64
+                )[None, :]
+                borderline = (carga_o < carga_d) & (carga_o >= min_required)
+                codes = decide_matrix(req.policy, scores, cov_crit, degraded, borderline)
+                codes[blocked] = INDEFERIDO
 
+                assignment = None
+                if req.assign:
+                    assignment = [
+                        MatrixAssignment(
+                            origem_index=i, destino_index=j, score=int(scores[i, j]), decisao=DECISIONS[codes[i, j]]
+                        )
+                        for i, j in best_assignment(scores, codes != INDEFERIDO)
+                    ]
+            timings.decide = t()
             timings.total = t_total()
 
-            # 8) audit (MVP: no-op)
-            self.audit.save({
-                "request_id": req.request_id,
-                "tenant_id": tenant_id,
-                "policy_version": req.policy_version,
-                "taxonomy_version": req.taxonomy_version,
-                "model_version": (self.fallback_mapper.model_version if degraded and self.fallback_mapper else self.mapper.model_version),
-                "degraded_mode": degraded,
-                "score": score,
-                "decision": decisao,
-                "timings_ms": timings.model_dump(),
-                "hash_origem": sha256_text(req.origem.ementa),
-                "hash_destino": sha256_text(req.destino.ementa),
-            })
-
-            return EvaluateResponse(
-                request_id=req.request_id,
-                decisao=decisao,
-                score=score,
-                breakdown=breakdown,
-                hard_rules=hard,
-                faltantes=missing,
-                criticos_faltantes=missing_crit,
-                justificativa_curta=curta,
-                justificativa_detalhada=detalhada,
-                evidence=evidence,
-                degraded_mode=degraded,
-                model_version=(self.fallback_mapper.model_version if degraded and self.fallback_mapper else self.mapper.model_version),
-                policy_version=req.policy_version,
-                taxonomy_version=req.taxonomy_version,
-                timings_ms=timings,
-                meta={
-                    "origin_vec_size": len(vec_o),
-                    "dest_vec_size": len(vec_d),
-                    "mapper_used": "fallback" if degraded else "primary"
-                }
+        return EvaluateMatrixResponse(
+            request_id=req.request_id,
+            scores=scores.tolist(),
+            decisoes=[[DECISIONS[c] for c in row] for row in codes.tolist()],
+            assignment=assignment,
+            degraded_pairs=int(degraded.sum()),
+            model_version=self.mapper.model_version,
+            policy_version=req.policy_version,
+            taxonomy_version=req.taxonomy_version,
+            timings_ms=timings,
+        )
+
+    def _map_side(self, tenant_id: str, taxonomy_version: str, ementa: str) -> Tuple[List[MappedNode], int]:
+        with timer_ms() as t:
+            h = self._text_hash(ementa)
+            mapped = self._lookup(tenant_id, taxonomy_version, [h]).get(h)
+            if mapped is None:
+                mapped = self.mapper.map(tenant_id, taxonomy_version, ementa)
+                self._remember(tenant_id, taxonomy_version, {h: mapped})
+        return mapped, t()
+
+    def _fallback_side(self, tenant_id: str, taxonomy_version: str, ementa: str) -> Tuple[List[MappedNode], int]:
+        with timer_ms() as t:
+            mapped = self.fallback_mapper.map(tenant_id, taxonomy_version, ementa)
+        return mapped, t()
+
+    async def _amap_side(self, tenant_id: str, taxonomy_version: str, ementa: str) -> Tuple[List[MappedNode], int]:
+        with timer_ms() as t:
+            h = self._text_hash(ementa)
+            if self._lookup_blocks():
+                # store (DB) e L2 (Redis MGET/pipeline) são síncronos: fora do event loop
+                mapped = (await asyncio.to_thread(self._lookup, tenant_id, taxonomy_version, [h])).get(h)
+            else:
+                mapped = self._lookup(tenant_id, taxonomy_version, [h]).get(h)
+            if mapped is None:
+                mapped = await self.mapper.amap(tenant_id, taxonomy_version, ementa)
+                if self._lookup_blocks():
+                    await asyncio.to_thread(self._remember, tenant_id, taxonomy_version, {h: mapped})
+                else:
+                    self._remember(tenant_id, taxonomy_version, {h: mapped})
+        return mapped, t()
+
+    def _lookup_blocks(self) -> bool:
+        # só cache em memória (SimpleTTLCache) dispensa a thread; TieredCache tem L2 no Redis
+        return self.mapping_store is not None or getattr(self.cache, "redis", None) is not None
+
+    async def _afallback_side(self, tenant_id: str, taxonomy_version: str, ementa: str) -> Tuple[List[MappedNode], int]:
+        with timer_ms() as t:
+            mapped = await self.fallback_mapper.amap(tenant_id, taxonomy_version, ementa)
+        return mapped, t()
+
+    def _validate_and_hard_rules(self, req: EvaluateRequest, timings: TimingsMs):
+        # 1) validação básica (Pydantic já fez, mas aqui você poderia impor regras extra)
+        with timer_ms() as t:
+            nodes = self.taxonomy_store.get_nodes(req.taxonomy_version)
+        timings.validate_ms = t()
+
+        # 2) hard rules
+        with timer_ms() as t:
+            hard = apply_hard_rules(req.origem, req.destino, req.policy)
+            blocked = hard_rules_block_decision(hard)
+        timings.hard_rules = t()
+        return nodes, hard, blocked
+
+    def _blocked_response(self, req: EvaluateRequest, hard, timings: TimingsMs, t_total) -> EvaluateResponse:
+        # indeferimento determinístico, sem IA
+        score = 0
+        breakdown = ScoreBreakdown(cobertura=0.0, cobertura_critica=0.0, penalidade_nivel=0.0)
+        decisao = "INDEFERIDO"
+        motivo = "Falha em regra  (aprovação/carga/validade/entrada)."
+        curta, detalhada = build_justification(
+            decisao, motivo, score,
+            breakdown=breakdown,
+            faltantes=[], criticos_faltantes=[],
+            carga_origem=req.origem.carga_horaria,
+            carga_destino=req.destino.carga_horaria
+        )
+        timings.total = t_total()
+        return EvaluateResponse(
+            request_id=req.request_id,
+            decisao=decisao,
+            score=score,
+            breakdown=breakdown,  # Pydantic aceita dict compatível
+            hard_rules=hard,
+            faltantes=[],
+            criticos_faltantes=[],
+            justificativa_curta=curta,
+            justificativa_detalhada=detalhada,
+            evidence=None,
+            degraded_mode=False,
+            model_version=self.mapper.model_version,
+            policy_version=req.policy_version,
+            taxonomy_version=req.taxonomy_version,
+            timings_ms=timings,
+            meta={"blocked_by_hard_rules": True},
+        )
+
+    def _score_and_respond(
+        self,
+        req: EvaluateRequest,
+        tenant_id: str,
+        nodes,
+        hard,
+        mapped_o: List[MappedNode],
+        mapped_d: List[MappedNode],
+        degraded: bool,
+        timings: TimingsMs,
+        t_total,
+    ) -> EvaluateResponse:
+        # 4) scoring
+        with timer_ms() as t:
+            vec_o = build_vector(mapped_o, req.policy.confidence_cutoff)
+            vec_d = build_vector(mapped_d, req.policy.confidence_cutoff)
+
+            arrays = self.taxonomy_store.arrays(req.taxonomy_version)
+            cov, missing, cov_crit, missing_crit, pen = vectorized_scores(vec_o, vec_d, arrays)
+
+            score, breakdown = final_score(req.policy, cov, cov_crit, pen)
+        timings.score = t()
+
+        return self._respond(
+            req, tenant_id, hard, mapped_o, vec_o, vec_d, degraded,
+            score, breakdown, missing, cov_crit, missing_crit, timings, t_total,
+        )
+
+    def _respond(
+        self,
+        req: EvaluateRequest,
+        tenant_id: str,
+        hard,
+        mapped_o: List[MappedNode],
+        vec_o: Dict[int, float],
+        vec_d: Dict[int, float],
+        degraded: bool,
+        score: int,
+        breakdown: ScoreBreakdown,
+        missing: List[int],
+        cov_crit: float,
+        missing_crit: List[int],
+        timings: TimingsMs,
+        t_total,
+    ) -> EvaluateResponse:
+        # 5) decisão
+        # Caso borderline: origem tem carga menor que destino, mas ainda dentro
+        # da tolerância (ex: destino=75, tolerancia=0.8 -> mínimo=60, origem=60).
+        # Em cenários assim podemos optar por encaminhar para análise humana
+        # em vez de decidir automaticamente.
+        with timer_ms() as t:
+            min_required = int(math.ceil(req.destino.carga_horaria * req.policy.tolerancia_carga))
+            if (
+                req.origem.carga_horaria is not None
+                and req.destino.carga_horaria is not None
+                and req.origem.carga_horaria < req.destino.carga_horaria
+                and req.origem.carga_horaria >= min_required
+            ):
+                decisao = "ANALISE_HUMANA"
+                motivo = "Diferença de carga horária dentro da tolerância — requer análise humana."
+            else:
+                decisao, motivo = decide(req.policy, score, cov_crit, degraded_mode=degraded)
+        timings.decide = t()
+
+        # 6) justificativa
+        with timer_ms() as t:
+            curta, detalhada = build_justification(
+                decisao, motivo, score, breakdown, missing, missing_crit,
+                carga_origem=req.origem.carga_horaria,
+                carga_destino=req.destino.carga_horaria
+            )
+        timings.justify = t()
+
+        # 7) evidências (opcional)
+        evidence = None
+        if req.options.return_evidence:
+            covered = [
+                ConceptEvidence(node_id=m.node_id, weight=float(m.weight), confidence=float(m.confidence), evidence=m.evidence)
+                for m in mapped_o
+                if m.node_id in vec_d and m.confidence >= req.policy.confidence_cutoff
+            ]
+            evidence = EvidenceBlock(
+                covered_concepts=covered[:50],
+                missing_concepts=missing[:200],
+                missing_critical_concepts=missing_crit[:200],
             )
+
+        timings.total = t_total()
+
+        # 8) audit (MVP: no-op)
+        self.audit.save({
+            "request_id": req.request_id,
+            "tenant_id": tenant_id,
+            "policy_version": req.policy_version,
+            "taxonomy_version": req.taxonomy_version,
+            "model_version": (self.fallback_mapper.model_version if degraded and self.fallback_mapper else self.mapper.model_version),
+            "degraded_mode": degraded,
+            "score": score,
+            "decision": decisao,
+            "timings_ms": timings.model_dump(),
+            "hash_origem": sha256_text(req.origem.ementa),
+            "hash_destino": sha256_text(req.destino.ementa),
+        })
+
+        return EvaluateResponse(
+            request_id=req.request_id,
+            decisao=decisao,
+            score=score,
+            breakdown=breakdown,
+            hard_rules=hard,
+            faltantes=missing,
+            criticos_faltantes=missing_crit,
+            justificativa_curta=curta,
+            justificativa_detalhada=detalhada,
+            evidence=evidence,
+            degraded_mode=degraded,
+            model_version=(self.fallback_mapper.model_version if degraded and self.fallback_mapper else self.mapper.model_version),
+            policy_version=req.policy_version,
+            taxonomy_version=req.taxonomy_version,
+            timings_ms=timings,
+            meta={
+                "origin_vec_size": len(vec_o),
+                "dest_vec_size": len(vec_d),
+                "mapper_used": "fallback" if degraded else "primary"
+            }
+        )
+
+
+def _pair_request(req: EvaluateManyRequest, destino) -> EvaluateRequest:
+    # campos já validados pelo EvaluateManyRequest: sem revalidar N vezes
+    return EvaluateRequest.model_construct(
+        request_id=req.request_id,
+        origem=req.origem,
+        destino=destino,
+        policy=req.policy,
+        taxonomy_version=req.taxonomy_version,
+        policy_version=req.policy_version,
+        options=req.options,
+        course_id=req.course_id,
+    )
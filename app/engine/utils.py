@@ -1,6 +1,8 @@
 from __future__ import annotations
 import hashlib
+import re
 import time
+import unicodedata
 from contextlib import contextmanager
 
 def sha256_text(*parts: str) -> str:
@@ -9,6 +11,12 @@ def sha256_text(*parts: str) -> str:
         h.update(p.encode("utf-8", errors="ignore"))
     return h.hexdigest()
 
+_WS = re.compile(r"\s+")
+
+def normalize_ementa(text: str) -> str:
+    """NFC + espaços colapsados + casefold: variações triviais da mesma ementa viram o mesmo texto."""
+    return _WS.sub(" ", unicodedata.normalize("NFC", text)).strip().casefold()
+
 @contextmanager
 def timer_ms():
     start = time.time()
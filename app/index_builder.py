@@ -1,10 +1,12 @@
 from sqlalchemy.orm import Session
 from app.db import SessionLocal
 from app import models
-from app.mapper.taxonomy_index import build_taxonomy_text
+from app.mapper.taxonomy_index import TaxonomyEmbeddingIndex, build_taxonomy_text
+from app.mapper.ann_index import IVFConfig
+from app.mapper.index_artifact import save_index_artifact
+from app.config import settings
 
 from app.mapper.clients import HttpClientConfig, SimpleHttpEmbeddingClient
-import os
 
 def build_taxonomy_index(tenant_id: str, taxonomy_version: str):
     db: Session = SessionLocal()
@@ -26,9 +28,13 @@ def build_taxonomy_index(tenant_id: str, taxonomy_version: str):
             })()
             texts.append(build_taxonomy_text(tmp))
 
-        embed_cfg = HttpClientConfig(base_url=os.getenv("EMBED_URL", "http://localhost:9001"))
+        # lotes de EMBED_MAX_BATCH textos, EMBED_MAX_IN_FLIGHT em paralelo, conexões keep-alive
+        embed_cfg = HttpClientConfig.from_env("EMBED", "http://localhost:9001")
         embedder = SimpleHttpEmbeddingClient(embed_cfg, path="/embed")
-        vectors = embedder.embed(texts)
+        try:
+            vectors = embedder.embed(texts)
+        finally:
+            embedder.close()
 
         db.query(models.TaxonomyEmbedding).filter(models.TaxonomyEmbedding.taxonomy_version_id == tv.id).delete()
         db.commit()
@@ -37,6 +43,20 @@ def build_taxonomy_index(tenant_id: str, taxonomy_version: str):
             db.add(models.TaxonomyEmbedding(taxonomy_version_id=tv.id, node_id=node.id, vector=vec))
         db.commit()
 
-        return {"ok": True, "taxonomy_version": taxonomy_version, "count": len(nodes)}
+        # artefato mmap: API/worker abrem este arquivo em vez de re-embeddar a taxonomia
+        index = TaxonomyEmbeddingIndex.from_vectors(
+            taxonomy_version, {node.id: vec for node, vec in zip(nodes, vectors)}, nodes={}
+        )
+        if len(index) >= settings.ANN_MIN_NODES:
+            index.enable_ann(IVFConfig(nprobe=settings.ANN_NPROBE))
+        artifact = save_index_artifact(settings.INDEX_ARTIFACT_DIR, tenant_id, index)
+
+        return {
+            "ok": True,
+            "taxonomy_version": taxonomy_version,
+            "count": len(nodes),
+            "artifact": artifact["path"],
+            "checksum": artifact["checksum"],
+        }
     finally:
         db.close()
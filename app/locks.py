@@ -14,3 +14,20 @@ def release_lock(key: str):
 
 def lock_key(tenant_id: str, request_id: str) -> str:
     return f"lock:equiv:{tenant_id}:{request_id}"
+
+def acquire_locks(keys: list[str], ttl_seconds: int = 120) -> list[bool]:
+    # vários SET NX EX num único round trip (modo em lote do worker)
+    if not keys:
+        return []
+    pipe = redis_conn.pipeline(transaction=False)
+    for key in keys:
+        pipe.set(key, b"1", nx=True, ex=ttl_seconds)
+    return [bool(ok) for ok in pipe.execute()]
+
+def release_locks(keys: list[str]):
+    if not keys:
+        return
+    try:
+        redis_conn.delete(*keys)
+    except Exception:
+        pass
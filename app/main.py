@@ -29,7 +29,8 @@ def _startup():
     setup_logging()
 
 
-# Ordem: RateLimit primeiro, Auth depois (Auth roda primeiro)
+# Middlewares ASGI puros, registrados uma vez (o último adicionado roda primeiro):
+# Auth -> RateLimit -> Observability -> rotas
 app.add_middleware(ObservabilityMiddleware)
 app.add_middleware(RateLimitMiddleware)
 app.add_middleware(ApiKeyAuthMiddleware)
@@ -42,9 +43,6 @@ app.include_router(admin_router)
 app.include_router(dlq_router)
 app.include_router(metrics_router)
 app.include_router(ui_router)
-app.add_middleware(ObservabilityMiddleware)
-app.add_middleware(RateLimitMiddleware)
-app.add_middleware(ApiKeyAuthMiddleware)
 app.include_router(readiness_router)
 
 @app.get("/health")
@@ -0,0 +1,136 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import math
+
+import numpy as np
+
+
+@dataclass
+class IVFConfig:
+    nlist: int = 0              # nº de listas (0 = auto: ~sqrt(N))
+    nprobe: int = 8             # listas visitadas por query: knob recall x latência
+    kmeans_iters: int = 12
+    kmeans_sample: int = 50_000  # treino do k-means numa amostra (build rápido)
+    seed: int = 0
+
+
+class IVFIndex:
+    """
+    Índice ANN do tipo IVF (inverted file) em NumPy puro, sem deps nativas.
+
+    Build: k-means esférico sobre as linhas (já normalizadas) da matriz; cada linha
+    vai para a lista do centróide mais próximo. As linhas são reordenadas por lista
+    para que cada lista seja uma fatia contígua (`order[offsets[c]:offsets[c+1]]`).
+
+    Busca: escolhe os `nprobe` centróides mais próximos da query e faz busca exata
+    só nas linhas dessas listas. nprobe == nlist equivale à busca exata.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, nprobe: int = 8):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, cfg: Optional[IVFConfig] = None) -> "IVFIndex":
+        cfg = cfg or IVFConfig()
+        n = matrix.shape[0]
+        if n == 0:
+            raise ValueError("Não é possível construir IVF sobre índice vazio.")
+
+        nlist = cfg.nlist or max(1, int(round(math.sqrt(n))))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(cfg.seed)
+
+        sample = matrix
+        if n > cfg.kmeans_sample:
+            sample = matrix[rng.choice(n, size=cfg.kmeans_sample, replace=False)]
+
+        centroids = _spherical_kmeans(sample, nlist, cfg.kmeans_iters, rng)
+        assign = _assign(matrix, centroids)
+
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(centroids=centroids, order=order, offsets=offsets, nprobe=cfg.nprobe)
+
+    def candidates(self, q: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Linhas candidatas (índices na matriz) para uma query normalizada."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cscores = self.centroids @ q
+        if nprobe < self.nlist:
+            probe = np.argpartition(cscores, self.nlist - nprobe)[self.nlist - nprobe:]
+        else:
+            probe = np.arange(self.nlist)
+        parts = [self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def search(
+        self,
+        matrix: np.ndarray,
+        q: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k aproximado para uma query já normalizada.
+        Retorna (linhas, scores) ordenados por score desc.
+        """
+        rows = self.candidates(q, nprobe)
+        if rows.size == 0:
+            return rows, np.zeros(0, dtype=np.float32)
+        scores = matrix[rows] @ q
+        m = rows.shape[0]
+        k = min(k, m)
+        if k < m:
+            top = np.argpartition(scores, m - k)[m - k:]
+        else:
+            top = np.arange(m)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    # em blocos para não materializar (N x nlist) de uma vez
+    out = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], chunk):
+        block = matrix[start:start + chunk]
+        out[start:start + chunk] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _spherical_kmeans(x: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = x[rng.choice(x.shape[0], size=k, replace=False)].astype(np.float32, copy=True)
+    for _ in range(iters):
+        assign = _assign(x, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] <= 0
+        # lista vazia: re-semeia com um ponto aleatório
+        if empty.any():
+            sums[empty] = x[rng.choice(x.shape[0], size=int(empty.sum()), replace=False)]
+            norms[empty] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+def recall_at_k(exact: List[List[int]], approx: List[List[int]], k: int) -> float:
+    """Fração média dos k vizinhos exatos recuperados pela busca aproximada."""
+    if not exact:
+        return 1.0
+    total = 0.0
+    for e, a in zip(exact, approx):
+        e_k = set(e[:k])
+        if not e_k:
+            total += 1.0
+            continue
+        total += len(e_k.intersection(a[:k])) / len(e_k)
+    return total / len(exact)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass
+import asyncio
 from typing import List, Protocol
 
 @dataclass
@@ -9,7 +10,25 @@ class MappedNode:
     confidence: float    # 0..1
     evidence: List[str]
 
+class UnrefinedNodes(list):
+    """Mapeamento base devolvido quando o refinamento (LLM) falhou: serve a request, não vai para o store durável."""
+    unrefined = True
+
 class TaxonomyMapper(Protocol):
     model_version: str
     def map(self, tenant_id: str, taxonomy_version: str, text: str) -> List[MappedNode]:
         ...
+
+    def map_many(self, tenant_id: str, taxonomy_version: str, texts: List[str]) -> List[List[MappedNode]]:
+        """
+        Mapeia várias ementas de uma vez; resultado alinhado com `texts`.
+        Default: um map() por texto. Mappers com backend em lote sobrescrevem.
+        """
+        return [self.map(tenant_id, taxonomy_version, t) for t in texts]
+
+    async def amap(self, tenant_id: str, taxonomy_version: str, text: str) -> List[MappedNode]:
+        """
+        Versão asyncio de map(). Default: roda map() numa thread para não bloquear o loop.
+        Mappers com clientes HTTP async sobrescrevem.
+        """
+        return await asyncio.to_thread(self.map, tenant_id, taxonomy_version, text)
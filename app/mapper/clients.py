@@ -1,11 +1,17 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 from typing import Any, Dict, List, Protocol, Optional
 import json
+import os
+import threading
 import time
 import urllib.request
 import urllib.error
 
+import httpx
+
 
 class EmbeddingClient(Protocol):
     def embed(self, texts: List[str]) -> List[List[float]]:
@@ -17,38 +23,137 @@ class LLMJsonClient(Protocol):
         ...
 
 
+class AsyncEmbeddingClient(Protocol):
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        ...
+
+
+class AsyncLLMJsonClient(Protocol):
+    async def complete_json(self, system: str, user: str, json_schema: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+
 @dataclass
 class HttpClientConfig:
     base_url: str
     api_key: Optional[str] = None
     timeout_seconds: int = 15
+    # embeddings: lotes de no máximo max_batch_size textos, até max_in_flight em paralelo
+    max_batch_size: int = 256
+    max_in_flight: int = 4
+    # retry com backoff exponencial (erros de rede, 429 e 5xx)
+    max_retries: int = 3
+    backoff_seconds: float = 0.5
+    # pool de conexões keep-alive
+    max_connections: int = 16
+
+    @classmethod
+    def from_env(cls, prefix: str, default_url: str, default_timeout: int = 15) -> "HttpClientConfig":
+        """Lê {PREFIX}_URL, {PREFIX}_API_KEY, {PREFIX}_TIMEOUT, {PREFIX}_MAX_BATCH, ..."""
+        def env(name: str, default: Any) -> Any:
+            return os.getenv(f"{prefix}_{name}", default)
+
+        return cls(
+            base_url=env("URL", default_url),
+            api_key=env("API_KEY", None),
+            timeout_seconds=int(env("TIMEOUT", default_timeout)),
+            max_batch_size=int(env("MAX_BATCH", cls.max_batch_size)),
+            max_in_flight=int(env("MAX_IN_FLIGHT", cls.max_in_flight)),
+            max_retries=int(env("MAX_RETRIES", cls.max_retries)),
+            backoff_seconds=float(env("BACKOFF", cls.backoff_seconds)),
+            max_connections=int(env("MAX_CONNECTIONS", cls.max_connections)),
+        )
+
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _default_headers(cfg: HttpClientConfig) -> Dict[str, str]:
+    headers = {"Content-Type": "application/json"}
+    if cfg.api_key:
+        headers["Authorization"] = f"Bearer {cfg.api_key}"
+    return headers
+
+
+def _limits(cfg: HttpClientConfig) -> httpx.Limits:
+    return httpx.Limits(max_connections=cfg.max_connections, max_keepalive_connections=cfg.max_connections)
 
 
 class SimpleHttpEmbeddingClient:
     """
     Cliente genérico: chama um endpoint HTTP que recebe {texts:[...]} e devolve {vectors:[[...], ...]}.
     Você implementa esse endpoint onde quiser (OpenAI/Azure/local).
+
+    - conexões keep-alive reaproveitadas (httpx.Client com pool, thread-safe)
+    - textos quebrados em lotes de cfg.max_batch_size, até cfg.max_in_flight em paralelo
+    - retry com backoff exponencial para erros transitórios
     """
-    def __init__(self, cfg: HttpClientConfig, path: str = "/embed"):
+    def __init__(self, cfg: HttpClientConfig, path: str = "/embed", client: Optional[httpx.Client] = None):
         self.cfg = cfg
         self.path = path
+        self._client = client or httpx.Client(
+            base_url=cfg.base_url.rstrip("/"),
+            headers=_default_headers(cfg),
+            timeout=cfg.timeout_seconds,
+            limits=_limits(cfg),
+        )
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
 
     def embed(self, texts: List[str]) -> List[List[float]]:
-        url = self.cfg.base_url.rstrip("/") + self.path
-        payload = json.dumps({"texts": texts}).encode("utf-8")
-        req = urllib.request.Request(url, data=payload, method="POST")
-        req.add_header("Content-Type", "application/json")
-        if self.cfg.api_key:
-            req.add_header("Authorization", f"Bearer {self.cfg.api_key}")
+        if not texts:
+            return []
+        size = max(1, self.cfg.max_batch_size)
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        if len(chunks) == 1 or self.cfg.max_in_flight <= 1:
+            out: List[List[float]] = []
+            for chunk in chunks:
+                out.extend(self._embed_chunk(chunk))
+            return out
 
-        try:
-            with urllib.request.urlopen(req, timeout=self.cfg.timeout_seconds) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
-                return data["vectors"]
-        except urllib.error.HTTPError as e:
-            raise RuntimeError(f"Embedding HTTPError: {e.code} {e.reason}") from e
-        except Exception as e:
-            raise RuntimeError(f"Embedding error: {e}") from e
+        # map preserva a ordem dos lotes
+        results = self._executor().map(self._embed_chunk, chunks)
+        return [vec for chunk_vecs in results for vec in chunk_vecs]
+
+    def close(self) -> None:
+        self._client.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.cfg.max_in_flight, thread_name_prefix="embed-http"
+                )
+            return self._pool
+
+    def _embed_chunk(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                resp = self._client.post(self.path, json={"texts": texts})
+                if resp.status_code in _RETRY_STATUS and attempt < self.cfg.max_retries:
+                    raise _Retryable(f"HTTP {resp.status_code}")
+                if resp.status_code >= 400:
+                    raise RuntimeError(f"Embedding HTTPError: {resp.status_code} {resp.reason_phrase}")
+                vectors = resp.json()["vectors"]
+                if len(vectors) != len(texts):
+                    raise RuntimeError(f"Embedding error: {len(vectors)} vetores para {len(texts)} textos")
+                return vectors
+            except (_Retryable, httpx.TransportError) as e:
+                if attempt >= self.cfg.max_retries:
+                    raise RuntimeError(f"Embedding error: {e}") from e
+                time.sleep(self.cfg.backoff_seconds * (2 ** attempt))
+                attempt += 1
+            except RuntimeError:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Embedding error: {e}") from e
+
+
+class _Retryable(Exception):
+    pass
 
 
 class SimpleHttpLLMJsonClient:
@@ -82,3 +187,91 @@ class SimpleHttpLLMJsonClient:
             raise RuntimeError(f"LLM HTTPError: {e.code} {e.reason}") from e
         except Exception as e:
             raise RuntimeError(f"LLM error: {e}") from e
+
+
+class AsyncHttpEmbeddingClient:
+    """
+    Versão asyncio do SimpleHttpEmbeddingClient (httpx.AsyncClient).
+    Mesmo contrato: lotes de cfg.max_batch_size, até cfg.max_in_flight em paralelo, retry com backoff.
+    """
+    def __init__(self, cfg: HttpClientConfig, path: str = "/embed", client: Optional[httpx.AsyncClient] = None):
+        self.cfg = cfg
+        self.path = path
+        self._client = client or httpx.AsyncClient(
+            base_url=cfg.base_url.rstrip("/"),
+            headers=_default_headers(cfg),
+            timeout=cfg.timeout_seconds,
+            limits=_limits(cfg),
+        )
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        size = max(1, self.cfg.max_batch_size)
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        sem = asyncio.Semaphore(max(1, self.cfg.max_in_flight))
+
+        async def run(chunk: List[str]) -> List[List[float]]:
+            async with sem:
+                return await self._embed_chunk(chunk)
+
+        results = await asyncio.gather(*(run(c) for c in chunks))
+        return [vec for chunk_vecs in results for vec in chunk_vecs]
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _embed_chunk(self, texts: List[str]) -> List[List[float]]:
+        data = await _apost_json(self._client, self.path, {"texts": texts}, self.cfg, "Embedding")
+        vectors = data["vectors"]
+        if len(vectors) != len(texts):
+            raise RuntimeError(f"Embedding error: {len(vectors)} vetores para {len(texts)} textos")
+        return vectors
+
+
+class AsyncHttpLLMJsonClient:
+    """Versão asyncio do SimpleHttpLLMJsonClient: centenas de chamadas em voo num único worker."""
+    def __init__(self, cfg: HttpClientConfig, path: str = "/llm/json", client: Optional[httpx.AsyncClient] = None):
+        self.cfg = cfg
+        self.path = path
+        self._client = client or httpx.AsyncClient(
+            base_url=cfg.base_url.rstrip("/"),
+            headers=_default_headers(cfg),
+            timeout=cfg.timeout_seconds,
+            limits=_limits(cfg),
+        )
+
+    async def complete_json(self, system: str, user: str, json_schema: Dict[str, Any]) -> Dict[str, Any]:
+        payload = {"system": system, "user": user, "json_schema": json_schema}
+        data = await _apost_json(self._client, self.path, payload, self.cfg, "LLM")
+        return data["json"]
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+async def _apost_json(
+    client: httpx.AsyncClient,
+    path: str,
+    payload: Dict[str, Any],
+    cfg: HttpClientConfig,
+    what: str,
+) -> Dict[str, Any]:
+    attempt = 0
+    while True:
+        try:
+            resp = await client.post(path, json=payload)
+            if resp.status_code in _RETRY_STATUS and attempt < cfg.max_retries:
+                raise _Retryable(f"HTTP {resp.status_code}")
+            if resp.status_code >= 400:
+                raise RuntimeError(f"{what} HTTPError: {resp.status_code} {resp.reason_phrase}")
+            return resp.json()
+        except (_Retryable, httpx.TransportError) as e:
+            if attempt >= cfg.max_retries:
+                raise RuntimeError(f"{what} error: {e}") from e
+            await asyncio.sleep(cfg.backoff_seconds * (2 ** attempt))
+            attempt += 1
+        except RuntimeError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"{what} error: {e}") from e
@@ -0,0 +1,86 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+import threading
+import time
+
+from app.mapper.clients import EmbeddingClient
+
+
+class MicroBatchingEmbeddingClient:
+    """
+    Coalesce embed() de requests/threads concorrentes num único /embed.
+
+    - textos que chegam dentro de `max_wait_ms` (ou até `max_batch` textos) vão juntos
+    - texto idêntico já pendente/em voo não é reenviado: todos esperam o mesmo Future
+    - até `max_in_flight` lotes em paralelo no cliente interno
+
+    Implementa o mesmo protocolo de EmbeddingClient, então é plugável no mapper.
+    """
+
+    def __init__(
+        self,
+        inner: EmbeddingClient,
+        max_batch: int = 64,
+        max_wait_ms: float = 5.0,
+        max_in_flight: int = 4,
+    ):
+        self.inner = inner
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._cond = threading.Condition()
+        self._queue: List[str] = []
+        self._inflight: Dict[str, Future] = {}
+        self._dispatcher: Optional[threading.Thread] = None
+        self._senders = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="embed-batch")
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        futures = [self._submit(t) for t in texts]
+        return [f.result() for f in futures]
+
+    def _submit(self, text: str) -> Future:
+        with self._cond:
+            fut = self._inflight.get(text)
+            if fut is not None:
+                return fut
+            fut = Future()
+            self._inflight[text] = fut
+            self._queue.append(text)
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+            return fut
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # janela: espera mais textos até max_wait ou lote cheio
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queue[: self.max_batch]
+                del self._queue[: self.max_batch]
+            self._senders.submit(self._send, batch)
+
+    def _send(self, batch: List[str]) -> None:
+        try:
+            vectors = self.inner.embed(batch)
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"Embedding error: {len(vectors)} vetores para {len(batch)} textos")
+        except BaseException as e:
+            with self._cond:
+                futures = [self._inflight.pop(t) for t in batch]
+            for fut in futures:
+                fut.set_exception(e)
+            return
+
+        with self._cond:
+            futures = [self._inflight.pop(t) for t in batch]
+        for fut, vec in zip(futures, vectors):
+            fut.set_result(vec)
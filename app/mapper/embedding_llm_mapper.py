@@ -1,10 +1,11 @@
 from __future__ import annotations
-from typing import Dict, List, Optional, Any
+import asyncio
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 
-from app.mapper.base import MappedNode, TaxonomyMapper
-from app.mapper.clients import EmbeddingClient, LLMJsonClient
-from app.mapper.taxonomy_index import TaxonomyEmbeddingIndex, top_k_concepts, build_taxonomy_text
+from app.mapper.base import MappedNode, TaxonomyMapper, UnrefinedNodes
+from app.mapper.clients import AsyncEmbeddingClient, AsyncLLMJsonClient, EmbeddingClient, LLMJsonClient
+from app.mapper.taxonomy_index import TaxonomyEmbeddingIndex, top_k_concepts, top_k_concepts_many, build_taxonomy_text
 from app.taxonomy.models import TaxonomyNode
 
 
@@ -32,45 +33,105 @@ class EmbeddingLLMMapper(TaxonomyMapper):
         index: TaxonomyEmbeddingIndex,
         cfg: EmbeddingLLMMapperConfig,
         llm: Optional[LLMJsonClient] = None,
+        async_embedder: Optional[AsyncEmbeddingClient] = None,
+        async_llm: Optional[AsyncLLMJsonClient] = None,
     ):
         self.embedder = embedder
         self.index = index
         self.cfg = cfg
         self.llm = llm
+        # clientes asyncio (opcionais) usados por amap(); sem eles amap roda map() numa thread
+        self.async_embedder = async_embedder
+        self.async_llm = async_llm
 
     def map(self, tenant_id: str, taxonomy_version: str, text: str) -> List[MappedNode]:
-        if taxonomy_version != self.index.taxonomy_version:
-            raise ValueError("Index não corresponde à taxonomy_version solicitada.")
+        self._check_version(taxonomy_version)
 
         # 1) embedding da ementa
         qvec = self.embedder.embed([text])[0]
 
         # 2) top-k candidatos
         candidates = top_k_concepts(self.index, qvec, k=self.cfg.top_k)
-        candidates = [(nid, sim) for nid, sim in candidates if sim >= self.cfg.min_similarity]
-        if not candidates:
+        return self._finish(text, candidates)
+
+    async def amap(self, tenant_id: str, taxonomy_version: str, text: str) -> List[MappedNode]:
+        if self.async_embedder is None:
+            return await super().amap(tenant_id, taxonomy_version, text)
+        self._check_version(taxonomy_version)
+
+        qvec = (await self.async_embedder.embed([text]))[0]
+        # GEMV sobre a matriz (ou IVF num mmap, com page faults): fora do event loop
+        candidates = await asyncio.to_thread(top_k_concepts, self.index, qvec, k=self.cfg.top_k)
+        base = self._base_nodes(candidates)
+        if not base:
+            return []
+
+        if self.cfg.use_llm_refine and self.async_llm is not None:
+            try:
+                system, user, json_schema = self._llm_prompt(text, base)
+                out = await self.async_llm.complete_json(system=system, user=user, json_schema=json_schema)
+                return self._parse_llm(out, base)
+            except Exception:
+                return UnrefinedNodes(base)
+        if self.cfg.use_llm_refine and self.llm is not None:
+            # sem cliente async de LLM: refinamento síncrono fora do event loop
+            try:
+                return await asyncio.to_thread(self._refine_with_llm, text, base)
+            except Exception:
+                return UnrefinedNodes(base)
+        return base
+
+    def map_many(self, tenant_id: str, taxonomy_version: str, texts: List[str]) -> List[List[MappedNode]]:
+        """
+        Mesmo resultado de map() para cada texto, mas com um único /embed
+        e uma única GEMM para todas as ementas.
+        """
+        self._check_version(taxonomy_version)
+        if not texts:
             return []
 
+        qvecs = self.embedder.embed(list(texts))
+        all_candidates = top_k_concepts_many(self.index, qvecs, k=self.cfg.top_k)
+        return [self._finish(text, cands) for text, cands in zip(texts, all_candidates)]
+
+    def _check_version(self, taxonomy_version: str) -> None:
+        if taxonomy_version != self.index.taxonomy_version:
+            raise ValueError("Index não corresponde à taxonomy_version solicitada.")
+
+    def _base_nodes(self, candidates: List[Tuple[int, float]]) -> List[MappedNode]:
         # 3) score base -> weight/confidence
         base = []
         for nid, sim in candidates:
+            if sim < self.cfg.min_similarity:
+                continue
             # mapeamento simples: sim em [min_similarity..1] -> peso/conf
             # (não precisa ser perfeito, precisa ser estável)
             w = min(1.0, max(0.1, (sim - self.cfg.min_similarity) / (1.0 - self.cfg.min_similarity)))
             conf = min(1.0, max(0.4, sim))
             base.append(MappedNode(node_id=nid, weight=float(w), confidence=float(conf), evidence=[]))
+        return base
+
+    def _finish(self, text: str, candidates: List[Tuple[int, float]]) -> List[MappedNode]:
+        base = self._base_nodes(candidates)
+        if not base:
+            return []
 
         # 4) opcional: refinamento por LLM para evidência e ajuste fino
         if self.cfg.use_llm_refine and self.llm is not None:
             try:
                 return self._refine_with_llm(text, base)
             except Exception:
-                # Se LLM falhar, devolve base. O engine continua, sem drama.
-                return base
+                # Se LLM falhar, devolve base (marcada: não vai para o store). O engine continua, sem drama.
+                return UnrefinedNodes(base)
 
         return base
 
     def _refine_with_llm(self, ementa: str, base: List[MappedNode]) -> List[MappedNode]:
+        system, user, json_schema = self._llm_prompt(ementa, base)
+        out = self.llm.complete_json(system=system, user=user, json_schema=json_schema)
+        return self._parse_llm(out, base)
+
+    def _llm_prompt(self, ementa: str, base: List[MappedNode]) -> Tuple[str, str, Dict[str, Any]]:
         # Monta contexto compacto: só candidatos + descrições.
         nodes: Dict[int, TaxonomyNode] = self.index.nodes
         concepts_compact = []
@@ -128,8 +189,9 @@ class EmbeddingLLMMapper(TaxonomyMapper):
             "- evidence: no máximo 3 trechos curtos.\n"
         )
 
-        out = self.llm.complete_json(system=system, user=user, json_schema=json_schema)
+        return system, user, json_schema
 
+    def _parse_llm(self, out: Dict[str, Any], base: List[MappedNode]) -> List[MappedNode]:
         mapped_out: List[MappedNode] = []
         allowed = {m.node_id for m in base}
         for item in out.get("mapped", []):
@@ -0,0 +1,149 @@
+"""
+Artefato binário do índice de embeddings, aberto via mmap.
+
+Layout em disco (uma "geração" por build, ponteiro CURRENT trocado atomicamente):
+
+  {base}/{tenant}/{taxonomy_version}/CURRENT          -> nome da geração ativa
+  {base}/{tenant}/{taxonomy_version}/{geração}/matrix.npy    (N, d) float32 normalizada
+  {base}/{tenant}/{taxonomy_version}/{geração}/node_ids.npy  (N,) int64
+  {base}/{tenant}/{taxonomy_version}/{geração}/meta.json     format/contagem/checksum
+  {base}/{tenant}/{taxonomy_version}/{geração}/ivf_*.npy     (opcional) listas do IVF
+
+Processos leitores (API/RQ) abrem com np.load(mmap_mode="r"): todos os workers
+compartilham as mesmas páginas do page cache e sobem sem re-embeddar a taxonomia.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+from app.mapper.ann_index import IVFIndex
+from app.mapper.taxonomy_index import TaxonomyEmbeddingIndex
+from app.taxonomy.models import TaxonomyNode
+
+ARTIFACT_FORMAT = 1
+_CURRENT = "CURRENT"
+
+
+def artifact_dir(base_dir: str, tenant_id: str, taxonomy_version: str) -> Path:
+    return Path(base_dir) / tenant_id / taxonomy_version
+
+
+def _checksum(matrix: np.ndarray, node_ids: np.ndarray) -> str:
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(node_ids, dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+def save_index_artifact(base_dir: str, tenant_id: str, index: TaxonomyEmbeddingIndex) -> Dict[str, Any]:
+    root = artifact_dir(base_dir, tenant_id, index.taxonomy_version)
+    root.mkdir(parents=True, exist_ok=True)
+
+    # linhas já normalizadas por TaxonomyEmbeddingIndex.from_vectors
+    matrix = np.ascontiguousarray(index.matrix, dtype=np.float32)
+    node_ids = np.ascontiguousarray(index.node_ids, dtype=np.int64)
+    checksum = _checksum(matrix, node_ids)
+
+    generation = f"{int(time.time())}-{checksum[:12]}-{uuid.uuid4().hex[:6]}"
+    tmp = root / f".tmp-{uuid.uuid4().hex}"
+    tmp.mkdir()
+    np.save(tmp / "matrix.npy", matrix)
+    np.save(tmp / "node_ids.npy", node_ids)
+    if index.ann is not None:
+        np.save(tmp / "ivf_centroids.npy", index.ann.centroids)
+        np.save(tmp / "ivf_order.npy", index.ann.order)
+        np.save(tmp / "ivf_offsets.npy", index.ann.offsets)
+
+    meta = {
+        "format": ARTIFACT_FORMAT,
+        "tenant_id": tenant_id,
+        "taxonomy_version": index.taxonomy_version,
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "checksum": checksum,
+        "ivf_nprobe": index.ann.nprobe if index.ann is not None else None,
+        "created_at": time.time(),
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, root / generation)
+
+    try:
+        previous = (root / _CURRENT).read_text(encoding="utf-8").strip()
+    except OSError:
+        previous = None
+
+    # troca atômica do ponteiro; leitores antigos seguem com o mmap da geração anterior
+    pointer_tmp = root / f".{_CURRENT}.{uuid.uuid4().hex}"
+    pointer_tmp.write_text(generation, encoding="utf-8")
+    os.replace(pointer_tmp, root / _CURRENT)
+
+    # a geração anterior fica em disco até o próximo build: quem leu o CURRENT antigo
+    # logo antes da troca ainda consegue abrir os arquivos dela
+    for old in root.iterdir():
+        if old.is_dir() and old.name not in (generation, previous) and not old.name.startswith("."):
+            shutil.rmtree(old, ignore_errors=True)
+
+    return {**meta, "path": str(root / generation)}
+
+
+def load_index_artifact(
+    base_dir: str,
+    tenant_id: str,
+    taxonomy_version: str,
+    nodes: Dict[int, TaxonomyNode],
+    verify_checksum: bool = False,
+) -> Optional[TaxonomyEmbeddingIndex]:
+    """
+    Abre o artefato via mmap. Retorna None se não existir, estiver em formato
+    desconhecido ou não corresponder aos nós carregados (quem chama faz build_index).
+    """
+    root = artifact_dir(base_dir, tenant_id, taxonomy_version)
+    try:
+        generation = (root / _CURRENT).read_text(encoding="utf-8").strip()
+        gen_dir = root / generation
+        meta = json.loads((gen_dir / "meta.json").read_text(encoding="utf-8"))
+
+        if meta.get("format") != ARTIFACT_FORMAT or meta.get("taxonomy_version") != taxonomy_version:
+            return None
+
+        # geração removida por um build concorrente entre a leitura do CURRENT e o np.load: cai no
+        # except e quem chama reconstrói
+        matrix = np.load(gen_dir / "matrix.npy", mmap_mode="r")
+        node_ids = np.load(gen_dir / "node_ids.npy", mmap_mode="r")
+        if matrix.shape[0] != meta["count"] or node_ids.shape[0] != meta["count"]:
+            return None
+
+        # artefato de outra "foto" da taxonomia: melhor reconstruir do que mapear para nós inexistentes
+        if set(node_ids.tolist()) != set(nodes.keys()):
+            return None
+
+        if verify_checksum and _checksum(matrix, node_ids) != meta["checksum"]:
+            return None
+
+        ann = None
+        if (gen_dir / "ivf_centroids.npy").exists():
+            ann = IVFIndex(
+                centroids=np.load(gen_dir / "ivf_centroids.npy"),
+                order=np.load(gen_dir / "ivf_order.npy", mmap_mode="r"),
+                offsets=np.load(gen_dir / "ivf_offsets.npy"),
+                nprobe=meta.get("ivf_nprobe") or 8,
+            )
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return TaxonomyEmbeddingIndex(
+        taxonomy_version=taxonomy_version,
+        node_ids=node_ids,
+        matrix=matrix,
+        nodes=nodes,
+        ann=ann,
+    )
@@ -1,10 +1,16 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 import math
 
+import numpy as np
+
 from app.taxonomy.models import TaxonomyNode
 from app.mapper.clients import EmbeddingClient
+from app.mapper.ann_index import IVFConfig, IVFIndex
+
+# A partir deste tamanho build_index liga o IVF; abaixo, busca exata (força bruta).
+ANN_MIN_NODES = 100_000
 
 
 def cosine(a: List[float], b: List[float]) -> float:
@@ -20,13 +26,52 @@ def cosine(a: List[float], b: List[float]) -> float:
     return dot / (math.sqrt(na) * math.sqrt(nb))
 
 
+def normalize_rows(m: np.ndarray) -> np.ndarray:
+    """Normaliza cada linha para norma 1 (linhas nulas continuam nulas)."""
+    m = np.ascontiguousarray(m, dtype=np.float32)
+    if m.ndim == 1:
+        m = m.reshape(1, -1)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms <= 0] = 1.0
+    return m / norms
+
+
 @dataclass
 class TaxonomyEmbeddingIndex:
     taxonomy_version: str
-    # node_id -> vector
-    vectors: Dict[int, List[float]]
+    # linha i da matriz -> node_ids[i]
+    node_ids: np.ndarray
+    # (N, d) float32 contígua, linhas já normalizadas (cosine = produto escalar)
+    matrix: np.ndarray
     # node_id -> node
     nodes: Dict[int, TaxonomyNode]
+    # opcional: índice aproximado para taxonomias muito grandes
+    ann: Optional[IVFIndex] = None
+
+    @classmethod
+    def from_vectors(
+        cls,
+        taxonomy_version: str,
+        vectors: Dict[int, Sequence[float]],
+        nodes: Dict[int, TaxonomyNode],
+    ) -> "TaxonomyEmbeddingIndex":
+        ids = list(vectors.keys())
+        if ids:
+            matrix = normalize_rows(np.asarray([vectors[i] for i in ids], dtype=np.float32))
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        return cls(
+            taxonomy_version=taxonomy_version,
+            node_ids=np.asarray(ids, dtype=np.int64),
+            matrix=matrix,
+            nodes=nodes,
+        )
+
+    def __len__(self) -> int:
+        return int(self.node_ids.shape[0])
+
+    def enable_ann(self, cfg: Optional[IVFConfig] = None) -> None:
+        self.ann = IVFIndex.build(self.matrix, cfg) if len(self) else None
 
 
 def build_taxonomy_text(node: TaxonomyNode) -> str:
@@ -38,6 +83,8 @@ def build_index(
     taxonomy_version: str,
     nodes: Dict[int, TaxonomyNode],
     embedder: EmbeddingClient,
+    ann_min_nodes: int = ANN_MIN_NODES,
+    ann_cfg: Optional[IVFConfig] = None,
 ) -> TaxonomyEmbeddingIndex:
     # cria textos por nó
     items: List[Tuple[int, str]] = [(nid, build_taxonomy_text(n)) for nid, n in nodes.items()]
@@ -45,7 +92,10 @@ def build_index(
     vecs = embedder.embed(texts)
 
     vectors = {items[i][0]: vecs[i] for i in range(len(items))}
-    return TaxonomyEmbeddingIndex(taxonomy_version=taxonomy_version, vectors=vectors, nodes=nodes)
+    index = TaxonomyEmbeddingIndex.from_vectors(taxonomy_version, vectors, nodes)
+    if len(index) >= ann_min_nodes:
+        index.enable_ann(ann_cfg)
+    return index
 
 
 def top_k_concepts(
@@ -53,9 +103,76 @@ def top_k_concepts(
     query_vec: List[float],
     k: int = 30,
 ) -> List[Tuple[int, float]]:
-    scored = []
-    for nid, v in index.vectors.items():
-        s = cosine(query_vec, v)
-        scored.append((nid, s))
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored[:k]
+    n = len(index)
+    if n == 0 or k <= 0:
+        return []
+
+    q = np.asarray(query_vec, dtype=np.float32)
+    qn = float(np.linalg.norm(q))
+    if qn <= 0:
+        return []
+
+    q = q / qn
+    if index.ann is not None:
+        rows, sims = index.ann.search(index.matrix, q, k)
+        return [(int(index.node_ids[r]), float(s)) for r, s in zip(rows, sims)]
+
+    # um único GEMV: matriz já normalizada, só falta normalizar a query
+    scores = index.matrix @ q
+
+    k = min(k, n)
+    if k < n:
+        top = np.argpartition(scores, n - k)[n - k:]
+    else:
+        top = np.arange(n)
+    # ordena só os k selecionados (desc)
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(int(index.node_ids[i]), float(scores[i])) for i in top]
+
+
+def top_k_concepts_many(
+    index: TaxonomyEmbeddingIndex,
+    query_matrix: Sequence[Sequence[float]],
+    k: int = 30,
+) -> List[List[Tuple[int, float]]]:
+    """
+    Versão em lote de top_k_concepts: uma única GEMM (Q x N) para todas as queries.
+    Retorna uma lista de candidatos por linha de query_matrix, na mesma ordem.
+    """
+    q = np.asarray(query_matrix, dtype=np.float32)
+    if q.ndim == 1:
+        q = q.reshape(1, -1)
+    nq = q.shape[0]
+    n = len(index)
+    if nq == 0:
+        return []
+    if n == 0 or k <= 0:
+        return [[] for _ in range(nq)]
+
+    if index.ann is not None:
+        # IVF: cada query visita listas diferentes, então não há GEMM única
+        return [top_k_concepts(index, row, k) for row in q]
+
+    qnorms = np.linalg.norm(q, axis=1)
+    zero = qnorms <= 0
+    qnorms[zero] = 1.0
+    scores = (q / qnorms[:, None]) @ index.matrix.T  # (Q, N)
+
+    k = min(k, n)
+    if k < n:
+        top = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    else:
+        top = np.broadcast_to(np.arange(n), (nq, n))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    out: List[List[Tuple[int, float]]] = []
+    for row in range(nq):
+        if zero[row]:
+            out.append([])
+            continue
+        ids = index.node_ids[top[row]]
+        out.append([(int(nid), float(s)) for nid, s in zip(ids, top_scores[row])])
+    return out
@@ -0,0 +1,66 @@
+from __future__ import annotations
+from typing import Callable, Dict, List
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.cache.codec import decode_mapped_nodes, encode_mapped_nodes
+from app.mapper.base import MappedNode
+
+
+class MappingStore:
+    """
+    Store durável dos mapeamentos (tabela mapped_ementas), lido/gravado em lote.
+    Chave: (tenant, taxonomy_version, model_version do mapper, hash da ementa normalizada).
+    Abre uma sessão curta por operação: o engine não tem sessão de request.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+
+    def get_many(
+        self, tenant_id: str, taxonomy_version: str, model_version: str, text_hashes: List[str]
+    ) -> Dict[str, List[MappedNode]]:
+        if not text_hashes:
+            return {}
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(models.MappedEmenta.text_hash, models.MappedEmenta.nodes).where(
+                    models.MappedEmenta.tenant_id == tenant_id,
+                    models.MappedEmenta.taxonomy_version == taxonomy_version,
+                    models.MappedEmenta.model_version == model_version,
+                    models.MappedEmenta.text_hash.in_(list(set(text_hashes))),
+                )
+            ).all()
+        return {h: decode_mapped_nodes(bytes(data)) for h, data in rows}
+
+    def put_many(
+        self, tenant_id: str, taxonomy_version: str, model_version: str, items: Dict[str, List[MappedNode]]
+    ) -> None:
+        """INSERT ... ON CONFLICT DO NOTHING: corrida entre processos mantém o primeiro."""
+        if not items:
+            return
+        rows = [
+            {
+                "tenant_id": tenant_id,
+                "taxonomy_version": taxonomy_version,
+                "model_version": model_version,
+                "text_hash": h,
+                "nodes": encode_mapped_nodes(nodes),
+            }
+            for h, nodes in items.items()
+        ]
+        with self.session_factory() as db:
+            stmt = _insert_for(db)(models.MappedEmenta).values(rows).on_conflict_do_nothing(
+                index_elements=["tenant_id", "taxonomy_version", "model_version", "text_hash"]
+            )
+            db.execute(stmt)
+            db.commit()
+
+
+def _insert_for(db: Session):
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
@@ -1,79 +1,337 @@
-import time
-import threading
-from collections import defaultdict
-from fastapi import APIRouter
-from fastapi.responses import PlainTextResponse
-
-# router definido aqui para expor a rota /metrics
-router = APIRouter()
-
-_lock = threading.Lock()
-
-# counters
-REQUESTS = defaultdict(int)      # (path, method, status)
-DECISIONS = defaultdict(int)     # (tenant, decision)
-DEGRADED = defaultdict(int)      # (tenant, degraded_bool)
-ERRORS = defaultdict(int)        # (where, type)
-
-# hist: latência simples em buckets
-LAT_BUCKETS_MS = [50, 100, 200, 500, 1000, 2000, 5000, 10000]
-LAT_HIST = defaultdict(lambda: [0] * (len(LAT_BUCKETS_MS) + 1))  # (path, method) -> counts per bucket+inf
-
-def observe_request(path: str, method: str, status: int, latency_ms: int):
-    with _lock:
-        REQUESTS[(path, method, status)] += 1
-        # bucketize
-        idx = len(LAT_BUCKETS_MS)  # +Inf
-        for i, b in enumerate(LAT_BUCKETS_MS):
-            if latency_ms <= b:
-                idx = i
-                break
-        LAT_HIST[(path, method)][idx] += 1
-
-def observe_decision(tenant: str, decision: str, degraded: bool):
-    with _lock:
-        DECISIONS[(tenant, decision)] += 1
-        DEGRADED[(tenant, str(degraded).lower())] += 1
-
-def observe_error(where: str, err_type: str):
-    with _lock:
-        ERRORS[(where, err_type)] += 1
-
-def render_prometheus() -> str:
-    lines = []
-    lines.append("# HELP http_requests_total Total HTTP requests")
-    lines.append("# TYPE http_requests_total counter")
-    with _lock:
-        for (path, method, status), v in REQUESTS.items():
-            lines.append(f'http_requests_total{{path="{path}",method="{method}",status="{status}"}} {v}')
-
-        lines.append("# HELP http_request_latency_ms_bucket Request latency histogram buckets")
-        lines.append("# TYPE http_request_latency_ms_bucket counter")
-        for (path, method), buckets in LAT_HIST.items():
-            cumulative = 0
-            for i, b in enumerate(LAT_BUCKETS_MS):
-                cumulative += buckets[i]
-                lines.append(f'http_request_latency_ms_bucket{{path="{path}",method="{method}",le="{b}"}} {cumulative}')
-            cumulative += buckets[-1]
-            lines.append(f'http_request_latency_ms_bucket{{path="{path}",method="{method}",le="+Inf"}} {cumulative}')
-
-        lines.append("# HELP equivalence_decisions_total Decisions by tenant")
-        lines.append("# TYPE equivalence_decisions_total counter")
-        for (tenant, decision), v in DECISIONS.items():
-            lines.append(f'equivalence_decisions_total{{tenant="{tenant}",decision="{decision}"}} {v}')
-
-        lines.append("# HELP equivalence_degraded_total Degraded mode occurrences")
-        lines.append("# TYPE equivalence_degraded_total counter")
-        for (tenant, degraded), v in DEGRADED.items():
-            lines.append(f'equivalence_degraded_total{{tenant="{tenant}",degraded="{degraded}"}} {v}')
-
-        lines.append("# HELP equivalence_errors_total Error counts")
-        lines.append("# TYPE equivalence_errors_total counter")
-        for (where, err_type), v in ERRORS.items():
-            lines.append(f'equivalence_errors_total{{where="{where}",type="{err_type}"}} {v}')
-
-    return "\n".join(lines) + "\n"
-
-@router.get("/metrics", response_class=PlainTextResponse)
-def metrics():
-    return render_prometheus()
\ No newline at end of file
+import glob
+import json
+import mmap
+import os
+import socket
+import struct
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+
+# router definido aqui para expor a rota /metrics
+router = APIRouter()
+
+# séries (nome da métrica; labels vão na chave)
+REQUESTS = "http_requests_total"                # (path, method, status)
+LAT_HIST = "http_request_latency_ms_bucket"     # (path, method, bucket idx)
+DECISIONS = "equivalence_decisions_total"       # (tenant, decision)
+DEGRADED = "equivalence_degraded_total"         # (tenant, degraded_bool)
+ERRORS = "equivalence_errors_total"             # (where, type)
+WORKER_ITEMS = "worker_items_total"             # (status)
+WORKER_SECONDS = "worker_busy_seconds_total"    # ()
+
+# hist: latência simples em buckets
+LAT_BUCKETS_MS = [50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+# --- backend -----------------------------------------------------------------------------------
+#
+# Um shard por thread: cada thread só escreve no seu, então o hot path não pega lock.
+# Sem METRICS_MULTIPROC_DIR os shards são dicts em memória (só o processo do scrape aparece).
+# Com ele, cada (host, pid, thread) grava num arquivo mmap e o /metrics de qualquer processo
+# soma todos os arquivos do diretório (workers gunicorn + workers RQ num volume compartilhado).
+
+class _MemShard:
+    def __init__(self):
+        self.values = defaultdict(float)
+
+    def inc(self, key: str, amount: float):
+        self.values[key] += amount
+
+    def items(self):
+        return dict(self.values).items()  # cópia atômica sob o GIL
+
+
+class _MmapShard:
+    """
+    Arquivo: [used:u32][pad:u32] + entradas [len:u32][chave utf-8, alinhada a 8][valor:f64].
+    A entrada é escrita antes de avançar `used`, então um leitor concorrente nunca vê meia entrada.
+    """
+
+    _INITIAL = 64 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "a+b")
+        if os.fstat(self._f.fileno()).st_size == 0:
+            self._f.truncate(self._INITIAL)
+        self._m = mmap.mmap(self._f.fileno(), 0)
+        self._index = {}
+        used = self._used()
+        if used == 0:
+            used = 8
+            struct.pack_into("I", self._m, 0, used)
+        # arquivo já existente (ident de thread reaproveitado): continua de onde parou
+        for key, _value, pos in _iter_entries(self._m, used):
+            self._index[key] = pos
+
+    def _used(self) -> int:
+        return struct.unpack_from("I", self._m, 0)[0]
+
+    def _append(self, key: str) -> int:
+        raw = key.encode("utf-8")
+        padded = raw + b" " * (8 - (len(raw) + 4) % 8)
+        used = self._used()
+        end = used + 4 + len(padded) + 8
+        if end > len(self._m):
+            size = len(self._m)
+            while size < end:
+                size *= 2
+            self._m.close()
+            self._f.truncate(size)
+            self._m = mmap.mmap(self._f.fileno(), 0)
+        struct.pack_into(f"I{len(padded)}sd", self._m, used, len(raw), padded, 0.0)
+        struct.pack_into("I", self._m, 0, end)
+        pos = end - 8
+        self._index[key] = pos
+        return pos
+
+    def inc(self, key: str, amount: float):
+        pos = self._index.get(key)
+        if pos is None:
+            pos = self._append(key)
+        struct.pack_into("d", self._m, pos, struct.unpack_from("d", self._m, pos)[0] + amount)
+
+    def items(self):
+        return ((key, value) for key, value, _pos in _iter_entries(self._m, self._used()))
+
+    def close(self):
+        self._m.close()
+        self._f.close()
+
+
+def _iter_entries(buf, used: int):
+    pos = 8
+    while pos < used:
+        n = struct.unpack_from("I", buf, pos)[0]
+        pos += 4
+        key = bytes(buf[pos:pos + n]).decode("utf-8")
+        pos += n + (8 - (n + 4) % 8)
+        yield key, struct.unpack_from("d", buf, pos)[0], pos
+        pos += 8
+
+
+_local = threading.local()
+_shards: list = []
+_shards_lock = threading.Lock()  # só na criação do shard (uma vez por thread)
+_HOST = socket.gethostname()
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        if settings.METRICS_MULTIPROC_DIR:
+            os.makedirs(settings.METRICS_MULTIPROC_DIR, exist_ok=True)
+            with _dir_lock(settings.METRICS_MULTIPROC_DIR):
+                _compact(settings.METRICS_MULTIPROC_DIR)
+            path = os.path.join(settings.METRICS_MULTIPROC_DIR, f"{_HOST}_{os.getpid()}_{threading.get_ident()}.db")
+            shard = _MmapShard(path)
+        else:
+            shard = _MemShard()
+        with _shards_lock:
+            _shards.append(shard)
+        _local.shard = shard
+    return shard
+
+
+def _after_fork():
+    # filho (horse do RQ, worker do gunicorn) não herda os shards do pai: contaria em dobro
+    global _local, _shards
+    _local = threading.local()
+    _shards = []
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _dir_lock(directory: str):
+    # compactação e leitura do diretório sob o mesmo flock: um scrape nunca vê o arquivo de um
+    # processo morto já somado no archive e ainda não removido (contaria em dobro)
+    import fcntl
+
+    with open(os.path.join(directory, ".lock"), "a+b") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _compact(directory: str):
+    """
+    Arquivos de processos mortos deste host (cada job RQ roda num fork novo) são somados em
+    {host}_archive.db e removidos, para o diretório não crescer um arquivo por job.
+    Arquivos de outros hosts (containers no mesmo volume) ficam com quem os criou.
+    Chamar com _dir_lock(directory) já adquirido.
+    """
+    dead = []
+    for path in glob.glob(os.path.join(directory, f"{glob.escape(_HOST)}_*_*.db")):
+        pid = os.path.basename(path)[len(_HOST) + 1:].split("_")[0]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            dead.append(path)
+    if not dead:
+        return
+    archive = _MmapShard(os.path.join(directory, f"{_HOST}_archive.db"))
+    try:
+        for path in dead:
+            for key, value in _read_file(path):
+                archive.inc(key, value)
+    finally:
+        archive.close()
+    for path in dead:
+        os.unlink(path)
+
+
+def _read_file(path: str) -> list:
+    with open(path, "rb") as f:
+        buf = f.read()
+    if len(buf) < 8:
+        return []
+    used = min(struct.unpack_from("I", buf, 0)[0], len(buf))
+    return [(key, value) for key, value, _pos in _iter_entries(buf, used)]
+
+
+def _collect() -> dict:
+    """Soma de todos os shards: do diretório multiprocess ou, sem ele, das threads deste processo."""
+    totals = defaultdict(float)
+    if settings.METRICS_MULTIPROC_DIR:
+        directory = settings.METRICS_MULTIPROC_DIR
+        if os.path.isdir(directory):
+            with _dir_lock(directory):
+                _compact(directory)
+                for path in glob.glob(os.path.join(directory, "*.db")):
+                    for key, value in _read_file(path):
+                        totals[key] += value
+    else:
+        for shard in list(_shards):
+            for key, value in shard.items():
+                totals[key] += value
+    series = defaultdict(dict)
+    for key, value in totals.items():
+        name, labels = json.loads(key)
+        series[name][tuple(labels)] = value
+    return series
+
+
+def _inc(name: str, labels: tuple, amount: float = 1):
+    _shard().inc(json.dumps([name, labels]), amount)
+
+
+# --- API de instrumentação -----------------------------------------------------------------------
+
+def observe_request(path: str, method: str, status: int, latency_ms: int):
+    _inc(REQUESTS, (path, method, str(status)))
+    # bucketize
+    idx = len(LAT_BUCKETS_MS)  # +Inf
+    for i, b in enumerate(LAT_BUCKETS_MS):
+        if latency_ms <= b:
+            idx = i
+            break
+    _inc(LAT_HIST, (path, method, idx))
+
+def observe_decision(tenant: str, decision: str, degraded: bool):
+    _inc(DECISIONS, (tenant, decision))
+    _inc(DEGRADED, (tenant, str(degraded).lower()))
+
+def observe_error(where: str, err_type: str):
+    _inc(ERRORS, (where, err_type))
+
+def observe_worker_items(done: int, failed: int, seconds: float):
+    # vazão dos workers: rate(worker_items_total) = itens/s
+    if done:
+        _inc(WORKER_ITEMS, ("done",), done)
+    if failed:
+        _inc(WORKER_ITEMS, ("failed",), failed)
+    _inc(WORKER_SECONDS, (), seconds)
+
+def _fmt(v: float):
+    return int(v) if float(v).is_integer() else v
+
+def render_prometheus() -> str:
+    series = _collect()
+    lines = []
+    lines.append("# HELP http_requests_total Total HTTP requests")
+    lines.append("# TYPE http_requests_total counter")
+    for (path, method, status), v in series[REQUESTS].items():
+        lines.append(f'http_requests_total{{path="{path}",method="{method}",status="{status}"}} {_fmt(v)}')
+
+    lines.append("# HELP http_request_latency_ms_bucket Request latency histogram buckets")
+    lines.append("# TYPE http_request_latency_ms_bucket counter")
+    hist = defaultdict(lambda: [0] * (len(LAT_BUCKETS_MS) + 1))  # (path, method) -> counts per bucket+inf
+    for (path, method, idx), v in series[LAT_HIST].items():
+        hist[(path, method)][idx] += int(v)
+    for (path, method), buckets in hist.items():
+        cumulative = 0
+        for i, b in enumerate(LAT_BUCKETS_MS):
+            cumulative += buckets[i]
+            lines.append(f'http_request_latency_ms_bucket{{path="{path}",method="{method}",le="{b}"}} {cumulative}')
+        cumulative += buckets[-1]
+        lines.append(f'http_request_latency_ms_bucket{{path="{path}",method="{method}",le="+Inf"}} {cumulative}')
+
+    lines.append("# HELP equivalence_decisions_total Decisions by tenant")
+    lines.append("# TYPE equivalence_decisions_total counter")
+    for (tenant, decision), v in series[DECISIONS].items():
+        lines.append(f'equivalence_decisions_total{{tenant="{tenant}",decision="{decision}"}} {_fmt(v)}')
+
+    lines.append("# HELP equivalence_degraded_total Degraded mode occurrences")
+    lines.append("# TYPE equivalence_degraded_total counter")
+    for (tenant, degraded), v in series[DEGRADED].items():
+        lines.append(f'equivalence_degraded_total{{tenant="{tenant}",degraded="{degraded}"}} {_fmt(v)}')
+
+    lines.append("# HELP equivalence_errors_total Error counts")
+    lines.append("# TYPE equivalence_errors_total counter")
+    for (where, err_type), v in series[ERRORS].items():
+        lines.append(f'equivalence_errors_total{{where="{where}",type="{err_type}"}} {_fmt(v)}')
+
+    lines.append("# HELP worker_items_total Batch items processed by RQ workers")
+    lines.append("# TYPE worker_items_total counter")
+    for (status,), v in series[WORKER_ITEMS].items():
+        lines.append(f'worker_items_total{{status="{status}"}} {_fmt(v)}')
+
+    lines.append("# HELP worker_busy_seconds_total Seconds spent processing batch chunks")
+    lines.append("# TYPE worker_busy_seconds_total counter")
+    for _labels, v in series[WORKER_SECONDS].items():
+        lines.append(f"worker_busy_seconds_total {round(v, 3)}")
+
+    lines.extend(_render_caches())
+
+    return "\n".join(lines) + "\n"
+
+def _render_caches() -> list:
+    # caches em memória (SimpleTTLCache): lidos no scrape, cada um com seu próprio lock
+    from app.cache.cache import registered_caches
+
+    stats = sorted((c.stats() for c in registered_caches()), key=lambda s: s.name)
+    metrics = [
+        ("equivalence_cache_hits_total", "counter", "Cache hits", "hits"),
+        ("equivalence_cache_misses_total", "counter", "Cache misses", "misses"),
+        ("equivalence_cache_evictions_total", "counter", "Entries evicted by size bounds", "evictions"),
+        ("equivalence_cache_expirations_total", "counter", "Entries expired by TTL", "expirations"),
+        ("equivalence_cache_items", "gauge", "Entries currently cached", "items"),
+        ("equivalence_cache_bytes", "gauge", "Approximate bytes currently cached", "bytes"),
+        ("equivalence_cache_max_items", "gauge", "Configured item bound", "max_items"),
+        ("equivalence_cache_max_bytes", "gauge", "Configured byte bound (0 = unbounded)", "max_bytes"),
+    ]
+    lines = []
+    for metric, kind, help_text, attr in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for st in stats:
+            lines.append(f'{metric}{{cache="{st.name}"}} {getattr(st, attr)}')
+    return lines
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return render_prometheus()
@@ -1,10 +1,13 @@
 import os
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from app.db import SessionLocal
-from app.auth import get_api_key_record
+from starlette.concurrency import run_in_threadpool
+
+from app.auth import AUTH_CACHE, load_api_key, start_invalidation_listener
+from app.config import settings
+from app.security import hash_api_key
 
 PUBLIC_PATHS = {
     "/health",
@@ -30,13 +33,17 @@ def _is_public(path: str) -> bool:
 
     return False
 
-class ApiKeyAuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
+class ApiKeyAuthMiddleware:
+    """ASGI puro: resolve a API key e grava tenant/role em scope["state"] (request.state)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        if _is_public(path):
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or _is_public(scope["path"]):
+            return await self.app(scope, receive, send)
 
+        request = Request(scope)
         api_key = request.headers.get("X-API-Key")
         if not api_key:
             # allow api_key via query param in development when explicitly enabled
@@ -44,18 +51,21 @@ class ApiKeyAuthMiddleware(BaseHTTPMiddleware):
                 api_key = request.query_params.get("api_key")
 
         if not api_key:
-            return JSONResponse({"detail": "Missing X-API-Key"}, status_code=401)
+            return await JSONResponse({"detail": "Missing X-API-Key"}, status_code=401)(scope, receive, send)
+
+        if settings.AUTH_CACHE_PUBSUB:
+            start_invalidation_listener()
 
-        db = SessionLocal()
-        try:
-            rec = get_api_key_record(db, api_key)
-            if not rec:
-                return JSONResponse({"detail": "Invalid API key"}, status_code=401)
+        # caminho quente: HMAC + lookup em memória; DB só no miss (fora do event loop)
+        key_hash = hash_api_key(api_key)
+        hit, rec = AUTH_CACHE.get(key_hash)
+        if not hit:
+            rec = await run_in_threadpool(load_api_key, key_hash)
+        if not rec:
+            return await JSONResponse({"detail": "Invalid API key"}, status_code=401)(scope, receive, send)
 
-            request.state.tenant_id = rec.tenant_id
-            request.state.api_key_id = rec.id
-            request.state.role = rec.role
+        request.state.tenant_id = rec.tenant_id
+        request.state.api_key_id = rec.key_id
+        request.state.role = rec.role
 
-            return await call_next(request)
-        finally:
-            db.close()
+        return await self.app(scope, receive, send)
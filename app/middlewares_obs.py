@@ -1,53 +1,62 @@
 import time
-from urllib import request
 import uuid
 import logging
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.metrics import observe_request
 
 logger = logging.getLogger("equivalence")
 
-class ObservabilityMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class ObservabilityMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
         start = time.time()
+        req_headers = Headers(scope=scope)
+        state = scope.setdefault("state", {})
 
         # correlation id: usa Idempotency-Key se tiver, senão gera
-        rid = request.headers.get("Idempotency-Key") or str(uuid.uuid4())
-        request.state.request_id = rid
+        rid = req_headers.get("Idempotency-Key") or str(uuid.uuid4())
+        state["request_id"] = rid
 
         # trace id: accept incoming or generate a new one
-        trace_id = request.headers.get("X-Trace-Id") or str(uuid.uuid4())
-        request.state.trace_id = trace_id
+        trace_id = req_headers.get("X-Trace-Id") or str(uuid.uuid4())
+        state["trace_id"] = trace_id
 
-        response = None
         status = 500
+
+        async def send_with_headers(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-Id"] = rid
+                headers["X-Trace-Id"] = trace_id
+                headers["X-Response-Time-ms"] = str(int((time.time() - start) * 1000))
+            await send(message)
+
         try:
-            response = await call_next(request)
-            status = response.status_code
-            return response
+            await self.app(scope, receive, send_with_headers)
         finally:
+            # latência até o fim do corpo (inclui respostas em streaming)
             latency_ms = int((time.time() - start) * 1000)
 
-            tenant_id = getattr(request.state, "tenant_id", None)
-            role = getattr(request.state, "role", None)
-
             logger.info(
                 "access",
                 extra={
                     "event": "access",
                     "request_id": rid,
                     "trace_id": trace_id,
-                    "tenant_id": tenant_id,
-                    "role": role,
-                    "path": request.url.path,
-                    "method": request.method,
+                    "tenant_id": state.get("tenant_id"),
+                    "role": state.get("role"),
+                    "path": scope["path"],
+                    "method": scope["method"],
                     "status_code": status,
                     "latency_ms": latency_ms,
                 },
             )
-            observe_request(request.url.path, request.method, status, latency_ms)
-            if response is not None:
-                response.headers["X-Request-Id"] = rid
-                response.headers["X-Trace-Id"] = trace_id
-                response.headers["X-Response-Time-ms"] = str(latency_ms)
+            observe_request(scope["path"], scope["method"], status, latency_ms)
@@ -1,9 +1,13 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.datastructures import MutableHeaders
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from app.rate_limit_config import ROLE_LIMITS, PATH_LIMITS, PUBLIC_PATHS, Limit
-from app.rate_limiter import check_rate_limit
+from app.config import settings
+from app.rate_limit_config import ROLE_LIMITS, PATH_LIMITS, PUBLIC_PATHS, TENANT_LIMIT, Limit
+from app.rate_limiter import LeasedRateLimiter, check_rate_limits
+
+# por processo: só existe com RATE_LIMIT_LEASE > 0
+_leased = LeasedRateLimiter(settings.RATE_LIMIT_LEASE, settings.RATE_LIMIT_LEASE_TTL) if settings.RATE_LIMIT_LEASE > 0 else None
 
 def _is_public(path: str) -> bool:
     return path in PUBLIC_PATHS
@@ -27,25 +31,39 @@ def _bucket_key(tenant_id: str, role: str, path: str) -> str:
 
     return f"rl:{tenant_id}:{role}:{group}"
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
+def _buckets(tenant_id: str, role: str, path: str, lim: Limit) -> list:
+    # bucket da rota + teto do tenant, checados na mesma invocação do script
+    buckets = [(_bucket_key(tenant_id, role, path), lim.capacity, lim.refill_per_sec)]
+    if settings.RATE_LIMIT_TENANT:
+        buckets.append((f"rl:{tenant_id}:*", TENANT_LIMIT.capacity, TENANT_LIMIT.refill_per_sec))
+    return buckets
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
 
         if _is_public(path):
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
         # precisa do tenant/role (definidos no auth middleware)
-        tenant_id = getattr(request.state, "tenant_id", None)
-        role = getattr(request.state, "role", None)
+        state = scope.get("state") or {}
+        tenant_id = state.get("tenant_id")
+        role = state.get("role")
 
         # se ainda não tiver, deixa passar e o auth vai bloquear
         if not tenant_id or not role:
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
         lim = _match_limit(path, role)
-        key = _bucket_key(tenant_id, role, path)
+        buckets = _buckets(tenant_id, role, path, lim)
 
-        result = check_rate_limit(key=key, capacity=lim.capacity, refill_per_sec=lim.refill_per_sec, requested=1)
+        result = _leased.check(buckets) if _leased else check_rate_limits(buckets)
 
         if not result.allowed:
             headers = {
@@ -53,13 +71,18 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 "X-RateLimit-Limit": str(lim.capacity),
                 "X-RateLimit-Remaining": "0",
             }
-            return JSONResponse(
+            response = JSONResponse(
                 {"detail": "Rate limit exceeded", "retry_after_seconds": result.retry_after},
                 status_code=429,
                 headers=headers
             )
+            return await response(scope, receive, send)
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(lim.capacity)
+                headers["X-RateLimit-Remaining"] = str(result.tokens_left)
+            await send(message)
 
-        response = await call_next(request)
-        response.headers["X-RateLimit-Limit"] = str(lim.capacity)
-        response.headers["X-RateLimit-Remaining"] = str(result.tokens_left)
-        return response
+        await self.app(scope, receive, send_with_headers)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, ForeignKey, JSON, BigInteger
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, ForeignKey, JSON, BigInteger, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db import Base
@@ -87,6 +87,7 @@ class Job(Base):
     failed = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     finished_at = Column(DateTime(timezone=True), nullable=True)
+    enqueued_items = Column(Integer, default=0)  # ingestão em job: itens (em ordem de id) já enfileirados
 
 class JobItem(Base):
     __tablename__ = "job_items"
@@ -98,6 +99,13 @@ class JobItem(Base):
     error = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class JobUpload(Base):
+    # lote grande recebido pela API, até o ingest_batch gravá-lo em job_items (fora do Redis)
+    __tablename__ = "job_uploads"
+    job_id = Column(String, ForeignKey("jobs.id"), primary_key=True)
+    payload = Column(JSON, nullable=False)  # lista de itens já sanitizados
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class TaxonomyEmbedding(Base):
     __tablename__ = "taxonomy_embeddings"
     id = Column(BigInteger, primary_key=True, autoincrement=True)
@@ -115,6 +123,63 @@ class TextEmbedding(Base):
     vector = Column(JSON, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class EquivalenceMatrix(Base):
+    # Resultado do modo matriz (origens x destinos) em formato compacto
+    __tablename__ = "equivalence_matrices"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "request_id", name="uq_matrix_tenant_request"),
+    )
+    id = Column(String, primary_key=True)  # uuid
+    request_id = Column(String, nullable=False)
+    tenant_id = Column(String, index=True, nullable=False)
+    course_id = Column(String, index=True, nullable=True)
+    n_origens = Column(Integer, nullable=False)
+    n_destinos = Column(Integer, nullable=False)
+    scores = Column(LargeBinary, nullable=False)     # uint8 [n_origens x n_destinos], row-major
+    decisions = Column(LargeBinary, nullable=False)  # int8, códigos de app.engine.decision.DECISIONS
+    assignment = Column(JSON, nullable=True)         # [[origem, destino], ...]
+    model_version = Column(String, nullable=False)
+    policy_version = Column(String, nullable=False)
+    taxonomy_version = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class CatalogDiscipline(Base):
+    # Catálogo de destinos do curso com os conceitos pré-mapeados: evaluate com
+    # course_id + destino.disciplina_id não re-mapeia a ementa do destino.
+    __tablename__ = "catalog_disciplines"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "course_id", "disciplina_id", name="uq_catalog_course_disciplina"),
+    )
+    id = Column(String, primary_key=True)  # uuid
+    tenant_id = Column(String, index=True, nullable=False)
+    course_id = Column(String, index=True, nullable=False)
+    disciplina_id = Column(Integer, nullable=False)
+    nome = Column(String, nullable=False)
+    carga_horaria = Column(Integer, nullable=False)
+    ementa = Column(Text, nullable=False)
+    nivel = Column(String, nullable=True)
+    text_hash = Column(String, nullable=False)          # sha256 da ementa normalizada
+    taxonomy_version = Column(String, nullable=True)    # versão do último mapeamento
+    model_version = Column(String, nullable=True)       # mapper.model_version do último mapeamento
+    nodes = Column(LargeBinary, nullable=True)          # List[MappedNode] (app.cache.codec); None = pendente
+    mapped_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class MappedEmenta(Base):
+    # Mapeamento ementa -> conceitos, endereçado pelo conteúdo: sobrevive a deploys
+    # e é compartilhado por origem/destino, API e workers.
+    __tablename__ = "mapped_ementas"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "taxonomy_version", "model_version", "text_hash", name="uq_mapped_ementas_key"),
+    )
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    tenant_id = Column(String, nullable=False)
+    taxonomy_version = Column(String, nullable=False)
+    model_version = Column(String, nullable=False)  # mapper.model_version
+    text_hash = Column(String, nullable=False)      # sha256 da ementa normalizada
+    nodes = Column(LargeBinary, nullable=False)     # List[MappedNode] (app.cache.codec)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Label(Base):
     __tablename__ = "equivalence_labels"
     id = Column(String, primary_key=True)  # uuid
@@ -21,3 +21,20 @@ dead_queue = Queue(name=f"{settings.RQ_QUEUE_NAME}-dead", connection=redis_conn)
 def default_retry():
     # backoff “bonito e funcional”: 10s, 30s, 2m, 5m, 15m
     return Retry(max=5, interval=[10, 30, 120, 300, 900])
+
+PIPELINE_JOBS = 1000
+
+def enqueue_many(func: str, args_list: list, job_timeout=None, pipeline_size: int = PIPELINE_JOBS, on_failure=None):
+    """Vários jobs da mesma função, pipeline_size por round trip (Queue.enqueue_many num pipeline)."""
+    if not hasattr(queue, "enqueue_many"):
+        # rq antigo: um enqueue por job
+        for args in args_list:
+            queue.enqueue(func, *args, job_timeout=job_timeout, on_failure=on_failure)
+        return
+    for start in range(0, len(args_list), pipeline_size):
+        with queue.connection.pipeline() as pipe:
+            queue.enqueue_many(
+                [Queue.prepare_data(func, args=args, timeout=job_timeout, on_failure=on_failure) for args in args_list[start:start + pipeline_size]],
+                pipeline=pipe,
+            )
+            pipe.execute()
@@ -22,6 +22,9 @@ PATH_LIMITS = [
     ("/admin",                    Limit(capacity=10, refill_per_sec=10/60)),  # 10/min
 ]
 
+# Teto por tenant (somado entre todas as roles/rotas), checado junto com o bucket da rota
+TENANT_LIMIT = Limit(capacity=600, refill_per_sec=600/60)  # 600/min
+
 PUBLIC_PATHS = {
     "/health",
     "/docs",
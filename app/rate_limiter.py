@@ -1,8 +1,14 @@
 import time
 import math
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from typing import Callable, Sequence
 from app.redis_client import redis_conn
 
+log = logging.getLogger("equivalence")
+
 LUA_TOKEN_BUCKET = r"""
 local key = KEYS[1]
 local capacity = tonumber(ARGV[1])
@@ -44,7 +50,59 @@ redis.call("EXPIRE", key, math.ceil((capacity / refill_per_sec) * 2))
 return {allowed, tokens, retry_after}
 """
 
+# Vários buckets (ex.: tenant + rota) numa invocação só, tudo-ou-nada.
+# ARGV: now, want, min, depois (capacity, refill_per_sec) por KEY.
+# Concede até `want` tokens (>= `min`) limitado pelo bucket mais vazio e debita o mesmo de todos.
+# Retorna {granted, tokens_left (menor bucket), retry_after}.
+LUA_MULTI_BUCKET = r"""
+local now = tonumber(ARGV[1])
+local want = tonumber(ARGV[2])
+local min_tokens = tonumber(ARGV[3])
+
+local tokens = {}
+local available = want
+local retry_after = 0
+
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[2 + i * 2])
+  local refill_per_sec = tonumber(ARGV[3 + i * 2])
+  local data = redis.call("HMGET", key, "tokens", "ts")
+  local t = tonumber(data[1])
+  local ts = tonumber(data[2])
+  if t == nil then
+    t = capacity
+    ts = now
+  end
+  t = math.min(capacity, t + math.max(0, now - ts) * refill_per_sec)
+  tokens[i] = t
+  available = math.min(available, math.floor(t))
+  if t < min_tokens then
+    retry_after = math.max(retry_after, math.ceil((min_tokens - t) / refill_per_sec))
+  end
+end
+
+local granted = 0
+if available >= min_tokens then
+  granted = available
+end
+
+local left = nil
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[2 + i * 2])
+  local refill_per_sec = tonumber(ARGV[3 + i * 2])
+  local t = tokens[i] - granted
+  redis.call("HSET", key, "tokens", t, "ts", now)
+  redis.call("EXPIRE", key, math.ceil((capacity / refill_per_sec) * 2))
+  if left == nil or t < left then
+    left = t
+  end
+end
+
+return {granted, tostring(left), retry_after}
+"""
+
 _bucket_script = redis_conn.register_script(LUA_TOKEN_BUCKET)
+_multi_script = redis_conn.register_script(LUA_MULTI_BUCKET)
 
 @dataclass
 class RateLimitResult:
@@ -67,3 +125,100 @@ def check_rate_limit(key: str, capacity: int, refill_per_sec: float, requested:
     retry_after = int(res[2])
 
     return RateLimitResult(allowed=allowed, tokens_left=tokens_left, retry_after=retry_after)
+
+def take_tokens(buckets: Sequence[tuple], want: int = 1, minimum: int = 1) -> tuple:
+    """
+    buckets: [(key, capacity, refill_per_sec), ...] checados e debitados juntos (um round trip).
+    Retorna (granted, tokens_left, retry_after); granted == 0 => negado.
+    """
+    args = [_now(), want, minimum]
+    for _key, capacity, refill_per_sec in buckets:
+        args += [capacity, refill_per_sec]
+    res = _multi_script(keys=[b[0] for b in buckets], args=args)
+    return int(res[0]), int(float(res[1])), int(res[2])
+
+def check_rate_limits(buckets: Sequence[tuple], requested: int = 1) -> RateLimitResult:
+    granted, left, retry_after = take_tokens(buckets, want=requested, minimum=requested)
+    return RateLimitResult(allowed=granted > 0, tokens_left=left, retry_after=retry_after)
+
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at", "remote_left", "refilling", "denied_until", "retry_after")
+
+    def __init__(self):
+        self.tokens = 0
+        self.expires_at = 0.0
+        self.remote_left = 0
+        self.refilling = False
+        self.denied_until = 0.0
+        self.retry_after = 0
+
+
+class LeasedRateLimiter:
+    """
+    Reserva blocos de tokens no Redis e gasta localmente (um round trip a cada `lease` requests).
+    Quando o lease cai abaixo da metade, renova em background; só bloqueia se esgotar.
+    Uma negação do Redis também fica em cache local por min(retry_after, ttl).
+
+    Precisão: cada processo segura ~`lease` tokens por conjunto de buckets (até 2x com a renovação em voo),
+    válidos por `ttl` segundos (depois são descartados). Então o erro é limitado a processos * 2 * lease tokens,
+    sempre para menos (tokens reservados e não usados), nunca acima do limite.
+    O lease é limitado a capacity // 10 do menor bucket: buckets pequenos continuam exatos.
+    """
+
+    def __init__(self, lease: int, ttl: float = 1.0, take: Callable = take_tokens, clock: Callable = time.monotonic):
+        self.lease = lease
+        self.ttl = ttl
+        self._take = take
+        self._clock = clock
+        self._leases: dict = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rl-lease")
+
+    def _lease_size(self, buckets) -> int:
+        return max(1, min(self.lease, min(b[1] for b in buckets) // 10))
+
+    def _fetch(self, keys, buckets, minimum: int) -> tuple:
+        size = self._lease_size(buckets)
+        granted, left, retry_after = self._take(buckets, want=size, minimum=minimum)
+        with self._lock:
+            st = self._leases.setdefault(keys, _Lease())
+            if st.expires_at <= self._clock():
+                st.tokens = 0
+            st.tokens += granted
+            st.expires_at = self._clock() + self.ttl
+            st.remote_left = left
+        return granted, retry_after
+
+    def _refill(self, keys, buckets):
+        try:
+            self._fetch(keys, buckets, minimum=1)
+        except Exception as e:
+            log.warning("rate limit lease refill failed: %s", e)
+        finally:
+            with self._lock:
+                self._leases[keys].refilling = False
+
+    def check(self, buckets: Sequence[tuple]) -> RateLimitResult:
+        keys = tuple(b[0] for b in buckets)
+        with self._lock:
+            st = self._leases.get(keys)
+            if st and st.tokens <= 0 and st.denied_until > self._clock():
+                return RateLimitResult(allowed=False, tokens_left=0, retry_after=st.retry_after)
+            if st and st.tokens > 0 and st.expires_at > self._clock():
+                st.tokens -= 1
+                if st.tokens * 2 < self._lease_size(buckets) and not st.refilling:
+                    st.refilling = True
+                    self._executor.submit(self._refill, keys, buckets)
+                return RateLimitResult(allowed=True, tokens_left=st.remote_left + st.tokens, retry_after=0)
+
+        # sem lease válido: renova no caminho da request (1 token é o mínimo para liberar)
+        granted, retry_after = self._fetch(keys, buckets, minimum=1)
+        with self._lock:
+            st = self._leases[keys]
+            if not granted:
+                st.denied_until = self._clock() + min(retry_after, self.ttl)
+                st.retry_after = retry_after
+                return RateLimitResult(allowed=False, tokens_left=0, retry_after=retry_after)
+            st.tokens = max(0, st.tokens - 1)
+            return RateLimitResult(allowed=True, tokens_left=st.remote_left + st.tokens, retry_after=0)
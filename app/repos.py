@@ -1,7 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select, update
+import logging
+from sqlalchemy import func, insert, select, update
+import uuid
+import numpy as np
 from app import models
 
+logger = logging.getLogger("equivalence")
+
 class TaxonomyRepo:
     def get_nodes(self, db: Session, tenant_id: str, version: str):
         tv = db.execute(
@@ -29,8 +34,8 @@ class PolicyRepo:
             select(models.CourseBinding).where(
                 models.CourseBinding.tenant_id == tenant_id,
                 models.CourseBinding.course_id == course_id
-            ).order_by(models.CourseBinding.active_from.desc())
-        ).scalar_one()
+            ).order_by(models.CourseBinding.active_from.desc()).limit(1)
+        ).scalar_one()  # binding mais recente (re-bind mantém o histórico)
         return b
 
 class ResultRepo:
@@ -40,19 +45,63 @@ class ResultRepo:
         return r
 
 class JobRepo:
-    def create_job(self, db: Session, job: models.Job, items: list[models.JobItem]):
+    def create_job(self, db: Session, job: models.Job, payloads: list) -> list[str]:
         db.add(job)
-        for it in items:
-            db.add(it)
+        db.flush()
+        item_ids = self.add_items(db, job.id, payloads)
         db.commit()
+        return item_ids
 
-    def update_counts(self, db: Session, job_id: str, done_inc=0, failed_inc=0, status=None):
-        job = db.get(models.Job, job_id)
-        job.done += done_inc
-        job.failed += failed_inc
+    def add_items(self, db: Session, job_id: str, payloads: list, chunk_size: int = 1000) -> list[str]:
+        """JobItems em INSERTs multi-linha (executemany), sem um objeto ORM por item; não faz commit."""
+        item_ids = [str(uuid.uuid4()) for _ in payloads]
+        for start in range(0, len(payloads), chunk_size):
+            db.execute(insert(models.JobItem), [
+                {"id": item_id, "job_id": job_id, "status": "queued", "payload": payload}
+                for item_id, payload in zip(item_ids[start:start + chunk_size], payloads[start:start + chunk_size])
+            ])
+        return item_ids
+
+    def update_counts(self, db: Session, job_id: str, done_inc=0, failed_inc=0, status=None) -> bool:
+        """
+        Incremento atômico no banco (SET done = done + :n), sem read-modify-write:
+        workers concorrentes não perdem incrementos. Retorna True só para a chamada
+        que levou done + failed a total (conclusão disparada exatamente uma vez).
+        """
+        values = {"done": models.Job.done + done_inc, "failed": models.Job.failed + failed_inc}
         if status:
-            job.status = status
+            values["status"] = status
+        db.execute(update(models.Job).where(models.Job.id == job_id).values(**values))
+        finished = self._finish_if_complete(db, job_id)
         db.commit()
+        if finished:
+            logger.info("job %s concluído", job_id)
+        return finished
+
+    def finish_ingestion(self, db: Session, job_id: str, total: int | None = None) -> bool:
+        """Fim da ingestão: ingesting -> queued (total final, se informado) e conclui se os workers já terminaram."""
+        values = {"status": "queued"}
+        if total is not None:
+            values["total"] = total
+        db.execute(update(models.Job).where(models.Job.id == job_id, models.Job.status == "ingesting").values(**values))
+        finished = self._finish_if_complete(db, job_id)
+        db.commit()
+        return finished
+
+    def _finish_if_complete(self, db: Session, job_id: str) -> bool:
+        # UPDATE condicional: entre workers concorrentes só um vê a linha retornada.
+        # Durante a ingestão o total ainda pode crescer: conclusão só depois de finish_ingestion
+        # (upload abortado fica failed).
+        return db.execute(
+            update(models.Job)
+            .where(
+                models.Job.id == job_id,
+                models.Job.status.not_in(("done", "ingesting", "failed")),
+                models.Job.done + models.Job.failed >= func.coalesce(models.Job.total, 0),
+            )
+            .values(status="done", finished_at=func.now())
+            .returning(models.Job.id)
+        ).first() is not None
 
     def mark_item(self, db: Session, item_id: str, status: str, result_id: str | None = None, error: str | None = None):
         item = db.get(models.JobItem, item_id)
@@ -60,3 +109,44 @@ class JobRepo:
         item.result_id = result_id
         item.error = error
         db.commit()
+
+class MatrixRepo:
+    """Matriz origens x destinos em bytes: scores uint8 e decisões int8 (1 byte por par cada)."""
+
+    def save(self, db: Session, tenant_id: str, req, resp) -> models.EquivalenceMatrix:
+        from app.engine.decision import DECISIONS
+
+        codes = {d: i for i, d in enumerate(DECISIONS)}
+        row = models.EquivalenceMatrix(
+            id=str(uuid.uuid4()),
+            request_id=req.request_id,
+            tenant_id=tenant_id,
+            course_id=req.course_id,
+            n_origens=len(resp.scores),
+            n_destinos=len(resp.scores[0]) if resp.scores else 0,
+            scores=np.asarray(resp.scores, dtype=np.uint8).tobytes(),
+            decisions=np.asarray([[codes[d] for d in r] for r in resp.decisoes], dtype=np.int8).tobytes(),
+            assignment=[[a.origem_index, a.destino_index] for a in resp.assignment] if resp.assignment is not None else None,
+            model_version=resp.model_version,
+            policy_version=resp.policy_version,
+            taxonomy_version=resp.taxonomy_version,
+        )
+        db.add(row)
+        db.commit()
+        return row
+
+    def get(self, db: Session, tenant_id: str, matrix_id: str | None = None, request_id: str | None = None):
+        q = select(models.EquivalenceMatrix).where(models.EquivalenceMatrix.tenant_id == tenant_id)
+        if matrix_id is not None:
+            q = q.where(models.EquivalenceMatrix.id == matrix_id)
+        if request_id is not None:
+            q = q.where(models.EquivalenceMatrix.request_id == request_id)
+        return db.execute(q).scalar_one_or_none()
+
+    @staticmethod
+    def decode(row: models.EquivalenceMatrix):
+        """(scores [m x n] uint8, códigos de decisão [m x n] int8)."""
+        shape = (row.n_origens, row.n_destinos)
+        scores = np.frombuffer(row.scores, dtype=np.uint8).reshape(shape)
+        codes = np.frombuffer(row.decisions, dtype=np.int8).reshape(shape)
+        return scores, codes
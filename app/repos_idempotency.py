@@ -1,4 +1,5 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app import models
 
@@ -9,3 +10,12 @@ def get_existing_result(db: Session, tenant_id: str, request_id: str):
             models.EquivalenceResult.request_id == request_id
         )
     ).scalar_one_or_none()
+
+async def aget_existing_result(db: AsyncSession, tenant_id: str, request_id: str):
+    res = await db.execute(
+        select(models.EquivalenceResult).where(
+            models.EquivalenceResult.tenant_id == tenant_id,
+            models.EquivalenceResult.request_id == request_id
+        )
+    )
+    return res.scalar_one_or_none()
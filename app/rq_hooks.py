@@ -1,11 +1,12 @@
 from sqlalchemy.orm import Session
 from app.db import SessionLocal
+from app import models
 from app.repos import JobRepo
 from app.queue import dead_queue
 
 def on_job_failure(job, connection, type, value, traceback):
     """
-    job.args deve conter: (job_id, item_id)
+    job.args deve conter: (job_id, item_id) ou (job_id, [item_id, ...]) no modo em lote
     """
     job_id = None
     item_id = None
@@ -17,22 +18,60 @@ def on_job_failure(job, connection, type, value, traceback):
 
     db: Session = SessionLocal()
     try:
-        if item_id:
+        if isinstance(item_id, (list, tuple)):
+            # fatia inteira falhou (timeout, horse morto): só itens ainda pendentes contam como failed
+            from app.worker import fail_pending_items
+
+            failed = fail_pending_items(db, job_id, list(item_id), str(value)) if job_id else []
+            for iid in failed:
+                dead_queue.enqueue(
+                    "app.worker.reprocess_dead_item", job_id, iid, str(value), job.id,
+                    job.retries_left if hasattr(job, "retries_left") else None,
+                )
+            return
+        else:
+            item_ids = [item_id] if item_id else []
+            failed_inc = 1
+
+        for iid in item_ids:
             # Marca item como failed
-            JobRepo().mark_item(db, item_id, "failed", error=str(value))
+            JobRepo().mark_item(db, iid, "failed", error=str(value))
 
-        if job_id:
-            JobRepo().update_counts(db, job_id, failed_inc=1)
+        if job_id and failed_inc:
+            JobRepo().update_counts(db, job_id, failed_inc=failed_inc)
 
         # Empurra para DLQ com contexto mínimo
-        dead_queue.enqueue(
-            "app.worker.reprocess_dead_item",
-            job_id,
-            item_id,
-            str(value),
-            job.id,
-            job.retries_left if hasattr(job, "retries_left") else None,
+        for iid in item_ids or [None]:
+            dead_queue.enqueue(
+                "app.worker.reprocess_dead_item",
+                job_id,
+                iid,
+                str(value),
+                job.id,
+                job.retries_left if hasattr(job, "retries_left") else None,
+            )
+    finally:
+        db.close()
+
+
+def on_ingest_failure(job, connection, type, value, traceback):
+    """
+    Falha do app.batch_ingest.ingest_batch. O RQ chama o callback antes de cada retry:
+    só marca o job failed quando não há mais tentativas (senão fica "ingesting" para sempre).
+    """
+    if getattr(job, "retries_left", None):
+        return
+    job_id = job.args[0] if job.args else None
+    if not job_id:
+        return
+
+    db: Session = SessionLocal()
+    try:
+        db.query(models.Job).filter(models.Job.id == job_id, models.Job.status == "ingesting").update(
+            {"status": "failed"}, synchronize_session=False
         )
+        db.query(models.JobUpload).filter(models.JobUpload.job_id == job_id).delete(synchronize_session=False)
+        db.commit()
     finally:
         db.close()
 
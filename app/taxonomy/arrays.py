@@ -0,0 +1,54 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Iterable, List
+
+import numpy as np
+
+from .models import TaxonomyNode
+
+LEVEL_CODES = {"basico": 0, "intermediario": 1, "avancado": 2}
+LEVEL_AVANCADO = LEVEL_CODES["avancado"]
+LEVEL_UNKNOWN = -1
+
+
+@dataclass(frozen=True)
+class TaxonomyArrays:
+    """
+    Atributos dos nós de uma versão em arrays densos (posição = ordem de carga).
+    Montado uma vez em TaxonomyStore.load_version; usado pelos kernels de scoring.
+    """
+    node_ids: np.ndarray      # int64 [n]
+    critical: np.ndarray      # bool  [n]
+    level: np.ndarray         # int8  [n] (LEVEL_CODES, -1 = desconhecido)
+    sorted_ids: np.ndarray    # int64 [n] node_ids ordenados (busca por searchsorted)
+    sorted_pos: np.ndarray    # int64 [n] posição densa de cada sorted_ids
+    critical_ids: List[int]   # ids críticos na ordem da taxonomia
+
+    @classmethod
+    def build(cls, nodes: Iterable[TaxonomyNode]) -> "TaxonomyArrays":
+        nodes = list(nodes)
+        node_ids = np.array([n.id for n in nodes], dtype=np.int64)
+        critical = np.array([bool(n.critico) for n in nodes], dtype=bool)
+        level = np.array([LEVEL_CODES.get(n.nivel, LEVEL_UNKNOWN) for n in nodes], dtype=np.int8)
+        order = np.argsort(node_ids, kind="stable")
+        return cls(
+            node_ids=node_ids,
+            critical=critical,
+            level=level,
+            sorted_ids=node_ids[order],
+            sorted_pos=order.astype(np.int64),
+            critical_ids=[n.id for n in nodes if n.critico],
+        )
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def positions(self, ids: np.ndarray) -> np.ndarray:
+        """Posição densa de cada id (-1 se o id não existe nesta versão)."""
+        n = len(self.sorted_ids)
+        if n == 0 or len(ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        pos = np.searchsorted(self.sorted_ids, ids)
+        clipped = np.minimum(pos, n - 1)
+        found = self.sorted_ids[clipped] == ids
+        return np.where(found, self.sorted_pos[clipped], -1)
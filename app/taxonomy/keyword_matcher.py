@@ -0,0 +1,129 @@
+from __future__ import annotations
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+import unicodedata
+
+from .models import TaxonomyNode
+
+
+def normalize_keyword_text(s: str) -> str:
+    """Normaliza o texto: NFD, remove acentos, lowercase."""
+    if s is None:
+        return ""
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return s.lower()
+
+
+def _is_word(ch: str) -> bool:
+    # mesma definição de \w do `re` para str
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """
+    Autômato Aho-Corasick com todas as palavras-chave de uma versão da taxonomia.
+
+    Uma passada no texto normalizado encontra todas as keywords; cada ocorrência
+    é validada com a mesma regra de re.search(rf"\\b{kw}\\b"). Montado uma vez por
+    versão (TaxonomyStore.load_version) em vez de compilar um regex por keyword a cada map().
+    """
+
+    def __init__(self, nodes: Iterable[TaxonomyNode]):
+        # postings[pid] = [(posição do nó, posição da keyword no nó)]
+        self._node_ids: List[int] = []
+        self._keywords: List[List[str]] = []
+        self._patterns: List[str] = []
+        self._postings: List[List[Tuple[int, int]]] = []
+        self._empty_pid = -1  # keyword vazia: r"\b\b" casa se o texto tiver algum \w
+        pid_of: Dict[str, int] = {}
+
+        for npos, node in enumerate(nodes):
+            self._node_ids.append(node.id)
+            self._keywords.append(list(node.palavras_chave))
+            for kpos, kw in enumerate(node.palavras_chave):
+                p = normalize_keyword_text(kw)
+                pid = pid_of.get(p)
+                if pid is None:
+                    pid = pid_of[p] = len(self._patterns)
+                    self._patterns.append(p)
+                    self._postings.append([])
+                    if not p:
+                        self._empty_pid = pid
+                self._postings[pid].append((npos, kpos))
+
+        self._build()
+
+    def _build(self) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for pid, p in enumerate(self._patterns):
+            if not p:
+                continue
+            state = 0
+            for ch in p:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(pid)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                # saídas herdadas pelo link de falha (sufixos que também são keywords)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def matched_patterns(self, t_norm: str) -> Set[int]:
+        """Ids das keywords (normalizadas) com ao menos uma ocorrência em fronteira de palavra."""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        found: Set[int] = set()
+        n = len(t_norm)
+        state = 0
+        for i, ch in enumerate(t_norm):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in out[state]:
+                if pid in found:
+                    continue
+                p = patterns[pid]
+                start = i - len(p) + 1
+                before = _is_word(t_norm[start - 1]) if start > 0 else False
+                after = _is_word(t_norm[i + 1]) if i + 1 < n else False
+                if before != _is_word(p[0]) and after != _is_word(p[-1]):
+                    found.add(pid)
+        if self._empty_pid >= 0 and any(_is_word(ch) for ch in t_norm):
+            found.add(self._empty_pid)
+        return found
+
+    def match(self, t_norm: str) -> List[Tuple[int, int, List[str]]]:
+        """
+        [(node_id, hits, evidências)] na ordem dos nós da taxonomia; hits conta
+        keywords do nó (com repetição) que casaram, evidências = até 3 keywords originais.
+        """
+        per_node: Dict[int, List[int]] = {}
+        for pid in self.matched_patterns(t_norm):
+            for npos, kpos in self._postings[pid]:
+                per_node.setdefault(npos, []).append(kpos)
+
+        result = []
+        for npos in sorted(per_node):
+            kposes = sorted(per_node[npos])
+            kws = self._keywords[npos]
+            result.append((self._node_ids[npos], len(kposes), [kws[k] for k in kposes[:3]]))
+        return result
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from typing import Dict, List
 from .models import TaxonomyNode
+from .keyword_matcher import KeywordMatcher
+from .arrays import TaxonomyArrays
 
 class TaxonomyStore:
     """
@@ -10,15 +12,33 @@ class TaxonomyStore:
 
     def __init__(self):
         self._by_version: Dict[str, Dict[int, TaxonomyNode]] = {}
+        self._matchers: Dict[str, KeywordMatcher] = {}
+        self._arrays: Dict[str, TaxonomyArrays] = {}
 
     def load_version(self, taxonomy_version: str, nodes: List[TaxonomyNode]) -> None:
-        self._by_version[taxonomy_version] = {n.id: n for n in nodes}
+        by_id = {n.id: n for n in nodes}
+        self._by_version[taxonomy_version] = by_id
+        # automaton de palavras-chave montado uma vez por versão (StubKeywordMapper)
+        self._matchers[taxonomy_version] = KeywordMatcher(by_id.values())
+        # atributos em arrays densos (crítico, nível) para o scoring vetorizado
+        self._arrays[taxonomy_version] = TaxonomyArrays.build(by_id.values())
 
     def get_nodes(self, taxonomy_version: str) -> Dict[int, TaxonomyNode]:
         if taxonomy_version not in self._by_version:
             raise ValueError(f"Taxonomia não carregada para version={taxonomy_version}")
         return self._by_version[taxonomy_version]
 
+    def keyword_matcher(self, taxonomy_version: str) -> KeywordMatcher:
+        matcher = self._matchers.get(taxonomy_version)
+        if matcher is None:
+            matcher = self._matchers[taxonomy_version] = KeywordMatcher(self.get_nodes(taxonomy_version).values())
+        return matcher
+
+    def arrays(self, taxonomy_version: str) -> TaxonomyArrays:
+        arrays = self._arrays.get(taxonomy_version)
+        if arrays is None:
+            arrays = self._arrays[taxonomy_version] = TaxonomyArrays.build(self.get_nodes(taxonomy_version).values())
+        return arrays
+
     def critical_ids(self, taxonomy_version: str) -> List[int]:
-        nodes = self.get_nodes(taxonomy_version)
-        return [nid for nid, n in nodes.items() if n.critico]
+        return list(self.arrays(taxonomy_version).critical_ids)
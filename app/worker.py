@@ -1,17 +1,64 @@
+import logging
+import time
 import uuid
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.db import SessionLocal
+from app.queue import queue
 from app.repos import JobRepo
 from app import db, models
 from app.engine.service import EquivalenceEngine
 from app.engine.utils import sha256_text
-from app.locks import acquire_lock, release_lock, lock_key
+from app.locks import acquire_lock, acquire_locks, release_lock, release_locks, lock_key
+from app.metrics import observe_decision, observe_error, observe_worker_items
 from app.repos_idempotency import get_existing_result
+from app.rq_hooks import on_job_failure
 
 # TODO: aqui você constrói seu engine com repos/mapper real.
 # Para MVP: reaproveite seu get_engine() e importe dentro.
 from app.api.routes import get_engine
 
+logger = logging.getLogger("equivalence")
+
+# itens que ainda podem ser processados (retry/duplicata de fatia não reprocessa failed nem done)
+PENDING_STATUSES = ("queued", "running")
+
+def _result_values(result_id: str, tenant_id: str, request_id: str, payload: dict, resp) -> dict:
+    """Colunas de EquivalenceResult para um item avaliado (insert unitário ou em lote)."""
+    origem_nome = payload.get("origem", {}).get("nome")
+    origem_carga = payload.get("origem", {}).get("carga_horaria")
+    destino_nome = payload.get("destino", {}).get("nome")
+    destino_carga = payload.get("destino", {}).get("carga_horaria")
+
+    return dict(
+        id=result_id,
+        request_id=request_id,
+        tenant_id=tenant_id,
+        course_id=None,
+        origem_nome=origem_nome or "",
+        origem_carga=origem_carga or 0,
+        origem_hash=sha256_text(payload.get("origem", {}).get("ementa", "")),
+        destino_nome=destino_nome or "",
+        destino_carga=destino_carga or 0,
+        destino_hash=sha256_text(payload.get("destino", {}).get("ementa", "")),
+        decision=(resp.decisao if hasattr(resp, 'decisao') else getattr(resp, 'decision', None) or ""),
+        score=(resp.score if hasattr(resp, 'score') else 0),
+        breakdown=(resp.breakdown.model_dump() if hasattr(resp, 'breakdown') and hasattr(resp.breakdown, 'model_dump') else (resp.breakdown if hasattr(resp, 'breakdown') else {})),
+        missing=(resp.faltantes if hasattr(resp, 'faltantes') else (resp.missing if hasattr(resp, 'missing') else [])),
+        missing_critical=(resp.criticos_faltantes if hasattr(resp, 'criticos_faltantes') else (resp.missing_critical if hasattr(resp, 'missing_critical') else [])),
+        justificativa_curta=(resp.justificativa_curta if hasattr(resp, 'justificativa_curta') else (resp.short_justification if hasattr(resp, 'short_justification') else "")),
+        justificativa_detalhada=(resp.justificativa_detalhada if hasattr(resp, 'justificativa_detalhada') else (resp.long_justification if hasattr(resp, 'long_justification') else "")),
+        degraded_mode=(resp.degraded_mode if hasattr(resp, 'degraded_mode') else False),
+        model_version=(resp.model_version if hasattr(resp, 'model_version') else ""),
+        policy_version=(resp.policy_version if hasattr(resp, 'policy_version') else ""),
+        taxonomy_version=(resp.taxonomy_version if hasattr(resp, 'taxonomy_version') else ""),
+        timings_ms=(resp.timings_ms.model_dump() if hasattr(resp, 'timings_ms') and hasattr(resp.timings_ms, 'model_dump') else (resp.timings_ms if hasattr(resp, 'timings_ms') else {})),
+    )
+
 def process_job_item(job_id: str, item_id: str):
     db: Session = SessionLocal()
     repo = JobRepo()
@@ -59,50 +106,16 @@ def process_job_item(job_id: str, item_id: str):
             from app.repos import ResultRepo
 
             result_id = str(_uuid.uuid4())
-            origem_nome = payload.get("origem", {}).get("nome")
-            origem_carga = payload.get("origem", {}).get("carga_horaria")
-            destino_nome = payload.get("destino", {}).get("nome")
-            destino_carga = payload.get("destino", {}).get("carga_horaria")
-
             # cria modelo de EquivalenceResult compatível com app.models.EquivalenceResult
-            r = models.EquivalenceResult(
-                id=result_id,
-                request_id=request_id,
-                tenant_id=tenant_id,
-                course_id=None,
-                origem_nome=origem_nome or "",
-                origem_carga=origem_carga or 0,
-                origem_hash=sha256_text(payload.get("origem", {}).get("ementa", "")),
-                destino_nome=destino_nome or "",
-                destino_carga=destino_carga or 0,
-                destino_hash=sha256_text(payload.get("destino", {}).get("ementa", "")),
-                decision=(resp.decisao if hasattr(resp, 'decisao') else getattr(resp, 'decision', None) or ""),
-                score=(resp.score if hasattr(resp, 'score') else 0),
-                breakdown=(resp.breakdown.model_dump() if hasattr(resp, 'breakdown') and hasattr(resp.breakdown, 'model_dump') else (resp.breakdown if hasattr(resp, 'breakdown') else {})),
-                missing=(resp.faltantes if hasattr(resp, 'faltantes') else (resp.missing if hasattr(resp, 'missing') else [])),
-                missing_critical=(resp.criticos_faltantes if hasattr(resp, 'criticos_faltantes') else (resp.missing_critical if hasattr(resp, 'missing_critical') else [])),
-                justificativa_curta=(resp.justificativa_curta if hasattr(resp, 'justificativa_curta') else (resp.short_justification if hasattr(resp, 'short_justification') else "")),
-                justificativa_detalhada=(resp.justificativa_detalhada if hasattr(resp, 'justificativa_detalhada') else (resp.long_justification if hasattr(resp, 'long_justification') else "")),
-                degraded_mode=(resp.degraded_mode if hasattr(resp, 'degraded_mode') else False),
-                model_version=(resp.model_version if hasattr(resp, 'model_version') else ""),
-                policy_version=(resp.policy_version if hasattr(resp, 'policy_version') else ""),
-                taxonomy_version=(resp.taxonomy_version if hasattr(resp, 'taxonomy_version') else ""),
-                timings_ms=(resp.timings_ms.model_dump() if hasattr(resp, 'timings_ms') and hasattr(resp.timings_ms, 'model_dump') else (resp.timings_ms if hasattr(resp, 'timings_ms') else {})),
-            )
+            r = models.EquivalenceResult(**_result_values(result_id, tenant_id, request_id, payload, resp))
 
             # salva no DB
             ResultRepo().save_result(db, r)
 
-            # marca item com result_id e atualiza contadores
+            # marca item com result_id e atualiza contadores (conclui o job ao atingir total)
             repo.mark_item(db, item_id, "done", result_id=result_id)
             repo.update_counts(db, job_id, done_inc=1)
 
-            # se job completo, marca status
-            job_obj = db.get(models.Job, job_id)
-            if job_obj and (job_obj.done + job_obj.failed) >= (job_obj.total or 0):
-                job_obj.status = "done"
-                db.commit()
-
         except Exception as e:
             # em caso de erro ao salvar resultado, marca item como failed
             repo.mark_item(db, item_id, "failed", error=str(e))
@@ -131,6 +144,171 @@ def process_job_item(job_id: str, item_id: str):
             release_lock(lock)
         db.close()
 
+def process_job_chunk(job_id: str, item_ids: list[str], lock_retries: int = 0):
+    """
+    Modo em lote (BATCH_CHUNK_SIZE): um job RQ processa uma fatia de itens.
+    Payloads e resultados já existentes saem em uma query cada, locks num pipeline,
+    mapeamentos num map_many por taxonomia, resultados num insert em lote e
+    status/contadores numa única transação. Falha de um item só marca ele como failed.
+    Itens sem lock voltam à fila numa fatia própria (BATCH_LOCK_RETRY_DELAY); esgotadas
+    as BATCH_LOCK_RETRIES tentativas (lock_retries), viram failed.
+    """
+    from app.api.schemas import EvaluateRequest
+
+    started = time.perf_counter()
+    db: Session = SessionLocal()
+    repo = JobRepo()
+    locks: list[str] = []
+    try:
+        job = db.get(models.Job, job_id)
+        tenant_id = job.tenant_id
+        items = db.execute(
+            select(models.JobItem).where(models.JobItem.id.in_(item_ids), models.JobItem.status.in_(PENDING_STATUSES))
+        ).scalars().all()
+
+        status: dict[str, dict] = {}  # item_id -> {status, result_id, error}
+        reqs: dict[str, EvaluateRequest] = {}
+        payloads: dict[str, dict] = {}
+        for it in items:
+            payload = dict(it.payload)
+            if not payload.get("request_id"):
+                payload["request_id"] = str(uuid.uuid4())
+                it.payload = payload
+            try:
+                reqs[it.id] = EvaluateRequest(**payload)
+                payloads[it.id] = payload
+            except Exception as e:
+                status[it.id] = {"status": "failed", "result_id": None, "error": str(e)}
+
+        # 1) idempotência: resultados já gravados, numa query
+        existing = dict(db.execute(
+            select(models.EquivalenceResult.request_id, models.EquivalenceResult.id).where(
+                models.EquivalenceResult.tenant_id == tenant_id,
+                models.EquivalenceResult.request_id.in_([r.request_id for r in reqs.values()]),
+            )
+        ).all())
+        # request_id repetido dentro da fatia: avalia uma vez, os demais reaproveitam
+        owner: dict[str, str] = {}
+        dupes: dict[str, str] = {}
+        for item_id, req in list(reqs.items()):
+            if req.request_id in existing:
+                status[item_id] = {"status": "done", "result_id": existing[req.request_id], "error": None}
+                del reqs[item_id]
+            elif req.request_id in owner:
+                dupes[item_id] = owner[req.request_id]
+                del reqs[item_id]
+            else:
+                owner[req.request_id] = item_id
+
+        # 2) locks anti-dupla execução (um round trip); sem lock o item (e suas duplicatas) é adiado
+        keys = {item_id: lock_key(tenant_id, req.request_id) for item_id, req in reqs.items()}
+        deferred: list[str] = []
+        for (item_id, key), ok in zip(keys.items(), acquire_locks(list(keys.values()), ttl_seconds=360)):
+            if ok:
+                locks.append(key)
+            else:
+                deferred.append(item_id)
+                del reqs[item_id]
+
+        # 3) mapeamento em lote: um map_many por taxonomia para todas as ementas da fatia
+        engine: EquivalenceEngine = get_engine()
+        by_version: dict[str, list] = defaultdict(list)
+        for req in reqs.values():
+            by_version[req.taxonomy_version] += [("origem", req.origem.ementa), ("destino", req.destino.ementa)]
+        for version, ementas in by_version.items():
+            try:
+                engine.prefetch_mappings(tenant_id, version, ementas)
+            except Exception as e:
+                # sem prefetch cada evaluate mapeia o seu par
+                logger.warning("prefetch do lote falhou (job=%s): %s", job_id, e)
+
+        # 4) avaliação item a item (erro isolado por item)
+        rows: dict[str, dict] = {}
+        for item_id, req in reqs.items():
+            try:
+                resp = engine.evaluate(req, tenant_id)
+                rows[item_id] = _result_values(str(uuid.uuid4()), tenant_id, req.request_id, payloads[item_id], resp)
+                observe_decision(tenant_id, rows[item_id]["decision"], rows[item_id]["degraded_mode"])
+            except Exception as e:
+                status[item_id] = {"status": "failed", "result_id": None, "error": str(e)}
+                observe_error("worker.evaluate", type(e).__name__)
+
+        # 5) resultados em lote
+        _insert_results(db, rows, status)
+        for item_id, owner_id in dupes.items():
+            if owner_id in status:
+                status[item_id] = dict(status[owner_id])
+            else:
+                deferred.append(item_id)
+
+        # 6) status dos itens + contadores + conclusão: uma transação
+        if status:
+            db.execute(update(models.JobItem), [{"id": item_id, **st} for item_id, st in status.items()])
+        done_inc = sum(1 for st in status.values() if st["status"] == "done")
+        failed_inc = sum(1 for st in status.values() if st["status"] == "failed")
+        repo.update_counts(db, job_id, done_inc=done_inc, failed_inc=failed_inc)  # commit
+
+        # 7) adiados: quando o dono do lock terminar, a nova fatia cai na idempotência (done)
+        if deferred and lock_retries < settings.BATCH_LOCK_RETRIES:
+            queue.enqueue_in(
+                timedelta(seconds=settings.BATCH_LOCK_RETRY_DELAY), "app.worker.process_job_chunk",
+                job_id, deferred, lock_retries + 1,
+                job_timeout=settings.BATCH_CHUNK_TIMEOUT, on_failure=on_job_failure,
+            )
+        elif deferred:
+            error = f"request_id em processamento por outro item (lock ocupado) após {lock_retries} tentativas"
+            failed_inc += len(fail_pending_items(db, job_id, deferred, error))
+        observe_worker_items(done_inc, failed_inc, time.perf_counter() - started)
+        return {"ok": True, "done": done_inc, "failed": failed_inc}
+    except Exception as e:
+        # falha fora do try por item (engine, DB, Redis, commit final): nada da fatia foi gravado;
+        # os itens pendentes viram failed para o job ainda chegar a done + failed == total
+        logger.exception("fatia do job %s falhou", job_id)
+        db.rollback()
+        observe_error("worker.chunk", type(e).__name__)
+        failed_inc = len(fail_pending_items(db, job_id, item_ids, str(e)))
+        observe_worker_items(0, failed_inc, time.perf_counter() - started)
+        return {"ok": False, "done": 0, "failed": failed_inc, "error": str(e)}
+    finally:
+        release_locks(locks)
+        db.close()
+
+def fail_pending_items(db: Session, job_id: str, item_ids: list[str], error: str) -> list[str]:
+    """queued/running -> failed num UPDATE condicional: só conta (e retorna) quem esta chamada de fato mudou."""
+    failed = db.execute(
+        update(models.JobItem)
+        .where(models.JobItem.id.in_(item_ids), models.JobItem.status.in_(PENDING_STATUSES))
+        .values(status="failed", error=error)
+        .returning(models.JobItem.id)
+    ).scalars().all()
+    JobRepo().update_counts(db, job_id, failed_inc=len(failed))  # commit
+    return list(failed)
+
+def _insert_results(db: Session, rows: dict[str, dict], status: dict[str, dict]):
+    """Insert em lote; conflito (outro worker gravou o mesmo request_id) cai para item a item."""
+    if not rows:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(models.EquivalenceResult), list(rows.values()))
+        for item_id, r in rows.items():
+            status[item_id] = {"status": "done", "result_id": r["id"], "error": None}
+        return
+    except IntegrityError:
+        pass
+
+    for item_id, r in rows.items():
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.EquivalenceResult), [r])
+            status[item_id] = {"status": "done", "result_id": r["id"], "error": None}
+        except Exception as e:
+            existing = get_existing_result(db, r["tenant_id"], r["request_id"])
+            if existing:
+                status[item_id] = {"status": "done", "result_id": existing.id, "error": None}
+            else:
+                status[item_id] = {"status": "failed", "result_id": None, "error": str(e)}
+
 def reprocess_dead_item(job_id: str, item_id: str, reason: str, failed_job_id: str, retries_left):
     """
     Função chamada pela DLQ. Não reprocessa automaticamente.
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Benchmark do índice IVF contra a busca exata (recall@k e latência por query).
+
+Uso: python scripts/bench_ann.py [n_nodes] [dim] [k]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.mapper.ann_index import IVFConfig, IVFIndex, recall_at_k  # noqa: E402
+from app.mapper.taxonomy_index import normalize_rows  # noqa: E402
+
+
+def exact_top_k(matrix, queries, k):
+    scores = queries @ matrix.T
+    top = np.argpartition(scores, -k, axis=1)[:, -k:]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    n_queries = 200
+
+    rng = np.random.default_rng(0)
+    # dados com estrutura de clusters (taxonomias reais não são uniformes)
+    centers = rng.normal(size=(max(1, n // 500), dim))
+    matrix = normalize_rows(centers[rng.integers(0, len(centers), n)] + 0.35 * rng.normal(size=(n, dim)))
+    queries = normalize_rows(centers[rng.integers(0, len(centers), n_queries)] + 0.35 * rng.normal(size=(n_queries, dim)))
+
+    exact_lists = [list(r) for r in exact_top_k(matrix, queries, k)]
+    # latência exata medida query a query (como top_k_concepts faz por request)
+    t0 = time.perf_counter()
+    for q in queries:
+        exact_top_k(matrix, q[None, :], k)
+    exact_ms = (time.perf_counter() - t0) * 1000 / n_queries
+
+    t0 = time.perf_counter()
+    ivf = IVFIndex.build(matrix, IVFConfig())
+    build_s = time.perf_counter() - t0
+
+    print(f"n={n} dim={dim} k={k} nlist={ivf.nlist} build={build_s:.1f}s")
+    print(f"exact (brute force): {exact_ms:.2f} ms/query")
+    for nprobe in (1, 2, 4, 8, 16, 32, 64):
+        if nprobe > ivf.nlist:
+            break
+        t0 = time.perf_counter()
+        approx = [list(ivf.search(matrix, q, k, nprobe=nprobe)[0]) for q in queries]
+        ms = (time.perf_counter() - t0) * 1000 / n_queries
+        print(f"nprobe={nprobe:3d}  recall@{k}={recall_at_k(exact_lists, approx, k):.3f}  {ms:.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
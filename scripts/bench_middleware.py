@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Overhead por request da pilha de middlewares: ASGI puro (1x) vs BaseHTTPMiddleware registrado 2x (antigo).
+
+Mede /health e /v1/equivalences/evaluate com handlers stub (sem DB/engine), API key já no cache
+de auth e rate limit em memória (sem Redis): o que sobra é o custo das camadas.
+
+Uso: python scripts/bench_middleware.py [n_requests]
+"""
+import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi import FastAPI  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+import app.middlewares_obs as obs  # noqa: E402
+import app.middlewares_rate as rate  # noqa: E402
+from app.auth import AUTH_CACHE, ResolvedKey  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.middlewares import ApiKeyAuthMiddleware, _is_public  # noqa: E402
+from app.rate_limiter import RateLimitResult  # noqa: E402
+from app.security import hash_api_key  # noqa: E402
+
+API_KEY = "bench-key"
+PAYLOAD = {"request_id": "req-bench-0001"}
+
+
+# --- pilha antiga: mesma lógica, em BaseHTTPMiddleware -------------------------------------------
+
+class LegacyAuth(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if _is_public(request.url.path):
+            return await call_next(request)
+        hit, rec = AUTH_CACHE.get(hash_api_key(request.headers.get("X-API-Key", "")))
+        if not rec:
+            return JSONResponse({"detail": "Invalid API key"}, status_code=401)
+        request.state.tenant_id, request.state.api_key_id, request.state.role = rec.tenant_id, rec.key_id, rec.role
+        return await call_next(request)
+
+
+class LegacyRate(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        path = request.url.path
+        role = getattr(request.state, "role", None)
+        if rate._is_public(path) or not role:
+            return await call_next(request)
+        lim = rate._match_limit(path, role)
+        result = rate.check_rate_limits(rate._buckets(request.state.tenant_id, role, path, lim))
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(lim.capacity)
+        response.headers["X-RateLimit-Remaining"] = str(result.tokens_left)
+        return response
+
+
+class LegacyObs(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start = time.time()
+        rid = request.headers.get("Idempotency-Key") or str(uuid.uuid4())
+        trace_id = request.headers.get("X-Trace-Id") or str(uuid.uuid4())
+        response = await call_next(request)
+        latency_ms = int((time.time() - start) * 1000)
+        obs.logger.info("access", extra={"event": "access", "request_id": rid, "path": request.url.path})
+        obs.observe_request(request.url.path, request.method, response.status_code, latency_ms)
+        response.headers["X-Request-Id"] = rid
+        response.headers["X-Trace-Id"] = trace_id
+        response.headers["X-Response-Time-ms"] = str(latency_ms)
+        return response
+
+
+def build(stack: str) -> FastAPI:
+    # regrava a chave a cada cenário (TTL do cache de auth)
+    AUTH_CACHE.put(hash_api_key(API_KEY), ResolvedKey("bench", "bench-tenant", "api-client"))
+    api = FastAPI()
+
+    @api.get("/health")
+    def health():
+        return {"status": "alive"}
+
+    @api.post("/v1/equivalences/evaluate")
+    async def evaluate(payload: dict):
+        return {"request_id": payload.get("request_id"), "decisao": "ANALISE_HUMANA"}
+
+    if stack == "asgi":
+        api.add_middleware(obs.ObservabilityMiddleware)
+        api.add_middleware(rate.RateLimitMiddleware)
+        api.add_middleware(ApiKeyAuthMiddleware)
+    elif stack == "base_http_x2":
+        for _ in range(2):
+            api.add_middleware(LegacyObs)
+            api.add_middleware(LegacyRate)
+            api.add_middleware(LegacyAuth)
+    return api
+
+
+async def run(api: FastAPI, method: str, path: str, n: int) -> float:
+    transport = httpx.ASGITransport(app=api)
+    headers = {"X-API-Key": API_KEY}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(min(200, n)):  # aquecimento
+            await client.request(method, path, headers=headers, json=PAYLOAD if method == "POST" else None)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            r = await client.request(method, path, headers=headers, json=PAYLOAD if method == "POST" else None)
+        elapsed = time.perf_counter() - t0
+    assert r.status_code == 200, r.text
+    return elapsed * 1e6 / n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    settings.AUTH_CACHE_PUBSUB = False
+    rate._leased = None
+    rate.check_rate_limits = lambda buckets, requested=1: RateLimitResult(allowed=True, tokens_left=100, retry_after=0)
+    obs.observe_request = lambda *a: None
+
+    print(f"n={n} requests por cenário (µs/request; overhead = pilha - sem middleware)")
+    for method, path in (("GET", "/health"), ("POST", "/v1/equivalences/evaluate")):
+        base = asyncio.run(run(build("none"), method, path, n))
+        print(f"{method} {path}: sem middleware {base:.0f} µs")
+        for stack in ("base_http_x2", "asgi"):
+            us = asyncio.run(run(build(stack), method, path, n))
+            print(f"  {stack:13s} {us:7.0f} µs  overhead {us - base:6.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Benchmark do StubKeywordMapper: regex por keyword (anterior) vs automaton Aho-Corasick.
+
+Mostra como a latência por map() escala com o tamanho da taxonomia.
+Uso: python scripts/bench_stub_mapper.py [keywords_por_no]
+"""
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.mapper.stub_mapper import StubKeywordMapper  # noqa: E402
+from app.taxonomy.keyword_matcher import normalize_keyword_text  # noqa: E402
+from app.taxonomy.models import TaxonomyNode  # noqa: E402
+from app.taxonomy.store import TaxonomyStore  # noqa: E402
+
+
+def legacy_map(nodes, text):
+    t_norm = normalize_keyword_text(text)
+    hits_total = 0
+    for node in nodes.values():
+        for kw in node.palavras_chave:
+            if re.search(rf"\b{re.escape(normalize_keyword_text(kw))}\b", t_norm):
+                hits_total += 1
+    return hits_total
+
+
+def make_nodes(n, kw_per_node, vocab, rng):
+    return [
+        TaxonomyNode(
+            id=i, area="a", subarea="s", conceito=f"c{i}", descricao="d",
+            palavras_chave=[" ".join(rng.sample(vocab, rng.randint(1, 2))) for _ in range(kw_per_node)],
+            nivel="basico", critico=False,
+        )
+        for i in range(n)
+    ]
+
+
+def time_ms(fn, texts, budget_s=2.0):
+    t0 = time.perf_counter()
+    runs = 0
+    while True:
+        for t in texts:
+            fn(t)
+        runs += len(texts)
+        if time.perf_counter() - t0 > budget_s:
+            break
+    return (time.perf_counter() - t0) * 1000 / runs
+
+
+def main():
+    kw_per_node = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rng = random.Random(0)
+    vocab = [f"termo{i}" for i in range(20000)] + ["análise", "swot", "missão", "visão", "taylor", "fayol"]
+    # ementa típica (~120 palavras)
+    texts = [" ".join(rng.choice(vocab) for _ in range(120)) for _ in range(20)]
+
+    print(f"keywords/nó={kw_per_node}  ementa≈120 palavras")
+    print(f"{'nós':>8} {'build ms':>10} {'regex ms/map':>14} {'automaton ms/map':>18} {'speedup':>8}")
+    for n in (100, 1_000, 10_000, 50_000):
+        nodes = make_nodes(n, kw_per_node, vocab, rng)
+        store = TaxonomyStore()
+        t0 = time.perf_counter()
+        store.load_version("v", nodes)
+        build_ms = (time.perf_counter() - t0) * 1000
+        mapper = StubKeywordMapper(store)
+
+        auto_ms = time_ms(lambda t: mapper.map("t", "v", t), texts)
+        by_id = store.get_nodes("v")
+        # a versão anterior fica lenta demais em taxonomias grandes: mede só uma ementa
+        legacy_ms = time_ms(lambda t: legacy_map(by_id, t), texts[:1], budget_s=1.0)
+        print(f"{n:>8} {build_ms:>10.1f} {legacy_ms:>14.2f} {auto_ms:>18.3f} {legacy_ms / auto_ms:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import itertools
+
+import numpy as np
+
+from app.engine.assignment import best_assignment
+
+
+def _brute_force(score, allowed):
+    m, n = score.shape
+    best = 0.0
+    if m <= n:
+        for perm in itertools.permutations(range(n), m):
+            best = max(best, sum(score[i, j] for i, j in enumerate(perm) if allowed[i, j]))
+    else:
+        for perm in itertools.permutations(range(m), n):
+            best = max(best, sum(score[i, j] for j, i in enumerate(perm) if allowed[i, j]))
+    return best
+
+
+def test_matches_brute_force_on_rectangular_matrices():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        m, n = int(rng.integers(1, 6)), int(rng.integers(1, 6))
+        score = rng.integers(0, 100, (m, n)).astype(float)
+        allowed = rng.random((m, n)) < 0.7
+        pairs = best_assignment(score, allowed)
+        assert len({i for i, _ in pairs}) == len(pairs) == len({j for _, j in pairs})
+        assert all(allowed[i, j] for i, j in pairs)
+        assert sum(score[i, j] for i, j in pairs) == _brute_force(score, allowed)
+
+
+def test_forbidden_pairs_never_assigned():
+    score = np.array([[90.0, 20.0], [80.0, 0.0]])
+    allowed = np.array([[True, True], [True, False]])
+    assert best_assignment(score, allowed) == [(0, 1), (1, 0)]
+    assert best_assignment(score, np.zeros_like(allowed)) == []
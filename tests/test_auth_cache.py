@@ -0,0 +1,103 @@
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import app.auth
+import app.db
+from app import models
+from app.admin_routes import router as admin_router
+from app.auth import AUTH_CACHE, publish_auth_invalidation
+from app.db import get_db
+from app.middlewares import ApiKeyAuthMiddleware
+from app.security import hash_api_key
+
+
+def _setup(tmp_path, monkeypatch):
+    db = create_engine(f"sqlite:///{tmp_path / 'auth.db'}")
+    for m in (models.Tenant, models.ApiKey):
+        m.__table__.create(db)
+    Session = sessionmaker(bind=db)
+    with Session() as s:
+        s.add(models.Tenant(id="t1", name="T1", api_key_hash="x", status="active"))
+        s.add(models.ApiKey(id="k1", tenant_id="t1", name="prod", key_hash=hash_api_key("good"), role="admin"))
+        s.commit()
+
+    monkeypatch.setattr(app.db, "SessionLocal", Session)
+    monkeypatch.setattr(app.auth.settings, "AUTH_CACHE_PUBSUB", False)
+    AUTH_CACHE.clear()
+
+    statements = []
+    event.listen(db, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+    api = FastAPI()
+    api.add_middleware(ApiKeyAuthMiddleware)
+    api.include_router(admin_router)
+
+    def _get_db():
+        with Session() as s:
+            yield s
+
+    api.dependency_overrides[get_db] = _get_db
+
+    @api.get("/whoami")
+    def whoami(request: Request):
+        return {"tenant_id": request.state.tenant_id, "role": request.state.role}
+
+    return TestClient(api), Session, statements
+
+
+def test_hot_keys_and_invalid_keys_are_served_from_memory(tmp_path, monkeypatch):
+    client, _, statements = _setup(tmp_path, monkeypatch)
+
+    assert client.get("/whoami", headers={"X-API-Key": "good"}).json() == {"tenant_id": "t1", "role": "admin"}
+    n = len(statements)
+    for _ in range(5):
+        assert client.get("/whoami", headers={"X-API-Key": "good"}).status_code == 200
+    assert len(statements) == n
+
+    assert client.get("/whoami", headers={"X-API-Key": "bad"}).status_code == 401
+    n = len(statements)
+    assert client.get("/whoami", headers={"X-API-Key": "bad"}).status_code == 401
+    assert len(statements) == n  # cache negativo
+
+
+def test_revocation_and_tenant_disable_invalidate_cache(tmp_path, monkeypatch):
+    client, Session, _ = _setup(tmp_path, monkeypatch)
+    published = []
+
+    class FakeRedis:
+        def publish(self, channel, data):
+            published.append(data)
+
+    import app.redis_client
+    monkeypatch.setattr(app.redis_client, "redis_conn", FakeRedis())
+
+    assert client.get("/whoami", headers={"X-API-Key": "good"}).status_code == 200
+    with Session() as s:
+        s.get(models.ApiKey, "k1").status = "revoked"
+        s.commit()
+    assert client.get("/whoami", headers={"X-API-Key": "good"}).status_code == 200  # ainda no TTL
+
+    publish_auth_invalidation(key_hash=hash_api_key("good"))
+    assert client.get("/whoami", headers={"X-API-Key": "good"}).status_code == 401
+    assert json.loads(published[-1]) == {"key_hash": hash_api_key("good"), "tenant_id": None}
+
+    # tenant desativado pelo admin: invalida local e publica para os demais processos
+    with Session() as s:
+        s.get(models.ApiKey, "k1").status = "active"
+        s.commit()
+    AUTH_CACHE.clear()
+    assert client.get("/whoami", headers={"X-API-Key": "good"}).status_code == 200
+    r = client.post("/admin/tenant/disable", headers={"X-API-Key": "good"})
+    assert r.json() == {"tenant_id": "t1", "status": "disabled"}
+    assert json.loads(published[-1]) == {"key_hash": None, "tenant_id": "t1"}
+    assert client.get("/whoami", headers={"X-API-Key": "good"}).status_code == 401
+
+    # mensagem vinda de outro processo: tenant desativado
+    AUTH_CACHE.clear()
+    AUTH_CACHE.put(hash_api_key("good"), app.auth.ResolvedKey("k1", "t1", "admin"))
+    app.auth._apply_invalidation(published[-1])
+    assert client.get("/whoami", headers={"X-API-Key": "good"}).status_code == 401
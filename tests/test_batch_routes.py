@@ -0,0 +1,167 @@
+import gzip
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+import app.api.batch_routes
+import app.batch_ingest
+from app import models
+from app.api.batch_routes import router
+from app.db import get_db
+from tests.test_worker import _payload
+
+
+def _client(tmp_path, monkeypatch):
+    db = create_engine(f"sqlite:///{tmp_path / 'batch.db'}")
+    for m in (models.EquivalenceResult, models.Job, models.JobItem, models.JobUpload):
+        m.__table__.create(db)
+    Session = sessionmaker(bind=db)
+
+    def _get_db():
+        with Session() as s:
+            yield s
+
+    api = FastAPI()
+    api.include_router(router)
+    api.dependency_overrides[get_db] = _get_db
+
+    @api.middleware("http")
+    async def tenant(request, call_next):
+        request.state.tenant_id = "t1"
+        return await call_next(request)
+
+    monkeypatch.setattr(app.api.batch_routes, "SessionLocal", Session)
+    enqueued = []
+    monkeypatch.setattr(app.batch_ingest, "enqueue_many", lambda func, args_list, **kw: enqueued.extend(args_list))
+    monkeypatch.setattr(app.batch_ingest.settings, "BATCH_CHUNK_SIZE", 10)
+    monkeypatch.setattr(app.batch_ingest.settings, "BATCH_STREAM_FLUSH", 25)
+    return TestClient(api), Session, enqueued, db
+
+
+def _ndjson(n, bad_lines=()):
+    lines = []
+    for i in range(n):
+        lines.append("{not json" if i in bad_lines else json.dumps({**_payload(f"req-{i:08d}"), "tenant_id": "evil"}))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def test_ndjson_upload_streams_items_in_chunks(tmp_path, monkeypatch):
+    client, Session, enqueued, _ = _client(tmp_path, monkeypatch)
+    body = _ndjson(60, bad_lines={7})
+
+    def chunks():
+        for i in range(0, len(body), 1000):  # chega em pedaços que cortam linhas no meio
+            yield body[i:i + 1000]
+
+    resp = client.post("/v1/equivalences/batch/ndjson", content=chunks())
+    data = resp.json()
+    assert resp.status_code == 200
+    assert (data["total"], data["rejected"], data["errors"][0]["line"]) == (59, 1, 8)
+    # fatias de 25 linhas válidas gravadas/enfileiradas durante o upload (chunks de 10 itens)
+    assert [len(ids) for _job_id, ids in enqueued] == [10, 10, 5, 10, 10, 5, 9]
+
+    with Session() as db:
+        job = db.get(models.Job, data["job_id"])
+        assert (job.status, job.total) == ("queued", 59)
+        payloads = db.execute(select(models.JobItem.payload)).scalars().all()
+        assert len(payloads) == 59 and all("tenant_id" not in p for p in payloads)
+
+
+def test_large_batch_is_staged_in_db_not_in_the_rq_job(tmp_path, monkeypatch):
+    client, Session, _, _ = _client(tmp_path, monkeypatch)
+    monkeypatch.setattr(app.api.batch_routes.settings, "BATCH_INGEST_THRESHOLD", 5)
+    calls = []
+    monkeypatch.setattr(app.api.batch_routes.queue, "enqueue", lambda func, *args, **kw: calls.append((func, args)))
+
+    items = [{**_payload(f"req-{i:08d}"), "tenant_id": "evil"} for i in range(8)]
+    data = client.post("/v1/equivalences/batch", json={"items": items}).json()
+    assert data["status"] == "INGESTING"
+    assert calls == [("app.batch_ingest.ingest_batch", (data["job_id"],))]  # só a referência vai ao Redis
+    with Session() as db:
+        staged = db.get(models.JobUpload, data["job_id"]).payload
+        assert len(staged) == 8 and all("tenant_id" not in p for p in staged)
+
+
+def test_ndjson_upload_accepts_gzip_and_rejects_huge_lines(tmp_path, monkeypatch):
+    client, Session, _, _ = _client(tmp_path, monkeypatch)
+    resp = client.post(
+        "/v1/equivalences/batch/ndjson", content=gzip.compress(_ndjson(30)), headers={"Content-Encoding": "gzip"},
+    )
+    assert resp.json()["total"] == 30
+
+    monkeypatch.setattr(app.batch_ingest.settings, "BATCH_STREAM_MAX_LINE", 100)
+    resp = client.post("/v1/equivalences/batch/ndjson", content=_ndjson(3))
+    assert resp.status_code == 413
+    with Session() as db:
+        assert db.get(models.Job, resp.json()["detail"]["job_id"]).status == "failed"
+
+
+def test_ndjson_upload_fails_job_on_unexpected_errors(tmp_path, monkeypatch):
+    client, Session, enqueued, _ = _client(tmp_path, monkeypatch)
+
+    def redis_down_on_second_flush(func, args_list, **kw):
+        if enqueued:
+            raise ConnectionError("redis down")
+        enqueued.extend(args_list)
+
+    monkeypatch.setattr(app.batch_ingest, "enqueue_many", redis_down_on_second_flush)
+    client = type(client)(client.app, raise_server_exceptions=False)
+    assert client.post("/v1/equivalences/batch/ndjson", content=_ndjson(60)).status_code == 500
+
+    with Session() as db:
+        job = db.execute(select(models.Job)).scalar_one()
+        assert job.status == "failed"  # não fica "ingesting" para sempre
+
+
+def _job_with_results(Session, n):
+    with Session() as db:
+        db.add(models.Job(id="job-1", tenant_id="t1", status="done", total=n, done=0, failed=0))
+        for i in range(n):
+            result_id = None
+            if i % 3:
+                result_id = f"res-{i:03d}"
+                db.add(models.EquivalenceResult(
+                    id=result_id, request_id=f"req-{i:08d}", tenant_id="t1", origem_nome="o", origem_carga=60,
+                    origem_hash="h", destino_nome="d", destino_carga=60, destino_hash="h", decision="DEFERIDO",
+                    score=90, breakdown={}, missing=[], missing_critical=[], justificativa_curta="",
+                    justificativa_detalhada="", model_version="m", policy_version="p", taxonomy_version="t", timings_ms={},
+                ))
+            db.add(models.JobItem(
+                id=f"it-{i:03d}", job_id="job-1", status="done" if result_id else "failed", payload={},
+                result_id=result_id, error=None if result_id else "boom",
+            ))
+        db.commit()
+
+
+def test_results_keyset_pages_in_one_query_each(tmp_path, monkeypatch):
+    client, Session, _, engine = _client(tmp_path, monkeypatch)
+    _job_with_results(Session, 25)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    seen, cursor = [], None
+    while True:
+        resp = client.get("/v1/jobs/job-1/results", params={"limit": 10, **({"after": cursor} if cursor else {})})
+        seen += resp.json()
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert [it["item_id"] for it in seen] == [f"it-{i:03d}" for i in range(25)]
+    assert len(statements) == 3  # uma query por página, sem N+1
+    assert seen[1]["result"]["id"] == "res-001" and seen[0]["result"] is None
+
+    failed = client.get("/v1/jobs/job-1/results", params={"status": "failed"}).json()
+    assert [it["item_id"] for it in failed] == [f"it-{i:03d}" for i in range(0, 25, 3)]
+
+
+def test_results_ndjson_stream(tmp_path, monkeypatch):
+    client, Session, _, _ = _client(tmp_path, monkeypatch)
+    _job_with_results(Session, 12)
+    resp = client.get("/v1/jobs/job-1/results", params={"format": "ndjson", "status": "done", "after": "it-004"})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in resp.text.splitlines()]
+    assert [it["item_id"] for it in items] == ["it-005", "it-007", "it-008", "it-010", "it-011"]
+    assert all(it["result"]["decision"] == "DEFERIDO" for it in items)
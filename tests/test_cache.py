@@ -0,0 +1,82 @@
+import threading
+import time
+
+from app.cache.cache import SimpleTTLCache
+from app.metrics import render_prometheus
+
+
+def test_lru_evicts_least_recently_used():
+    c = SimpleTTLCache(ttl_seconds=60, max_items=2, sweep_interval_seconds=0)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1  # "a" passa a ser o mais recente
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    st = c.stats()
+    assert st.evictions == 1 and st.items == 2
+    assert st.hits == 3 and st.misses == 1
+
+
+def test_ttl_expires_on_get_and_sweep():
+    c = SimpleTTLCache(ttl_seconds=0.05, max_items=10, sweep_interval_seconds=0)
+    c.set("a", 1)
+    c.set("b", 2)
+    time.sleep(0.08)
+    c.set("c", 3)
+    assert c.get("a") is None
+    assert c.sweep() == 1  # só "b"; "c" ainda vale
+    assert len(c) == 1 and c.get("c") == 3
+    assert c.stats().expirations == 2
+
+
+def test_background_sweeper_removes_expired():
+    c = SimpleTTLCache(ttl_seconds=0.02, max_items=10, sweep_interval_seconds=0.02)
+    c.set("a", 1)
+    deadline = time.time() + 2
+    while len(c) and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(c) == 0
+
+
+def test_byte_bound():
+    c = SimpleTTLCache(ttl_seconds=60, max_items=100, max_bytes=100, sizeof=len, sweep_interval_seconds=0)
+    c.set("a", "x" * 40)
+    c.set("b", "y" * 40)
+    c.set("c", "z" * 40)  # passa de 100 bytes: sai "a"
+    assert c.get("a") is None
+    assert c.stats().bytes == 80
+    c.set("big", "w" * 200)  # maior que o cache inteiro: não admitido
+    assert c.get("big") is None and c.get("b") is not None
+    c.set("b", "y")  # sobrescrita ajusta os bytes
+    assert c.stats().bytes == 41
+
+
+def test_thread_safe_under_contention():
+    c = SimpleTTLCache(ttl_seconds=60, max_items=50, sweep_interval_seconds=0)
+
+    def work(i):
+        for j in range(500):
+            key = f"k{(i * 7 + j) % 80}"
+            if c.get(key) is None:
+                c.set(key, j)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    st = c.stats()
+    assert st.items == len(c) <= 50
+    assert st.hits + st.misses == 8 * 500
+
+
+def test_stats_exported_to_metrics():
+    c = SimpleTTLCache(name="test-metrics", sweep_interval_seconds=0)
+    c.set("a", 1)
+    c.get("a")
+    c.get("missing")
+    out = render_prometheus()
+    assert 'equivalence_cache_hits_total{cache="test-metrics"} 1' in out
+    assert 'equivalence_cache_misses_total{cache="test-metrics"} 1' in out
+    assert 'equivalence_cache_items{cache="test-metrics"} 1' in out
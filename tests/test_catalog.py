@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.api.routes
+import app.catalog_builder
+from app import models
+from app.catalog_repo import CatalogStore, pending_catalog_rows, upsert_catalog
+from tests.test_engine import _comparable, make_request
+from tests.test_mapping_store import _engine
+
+DESTINO = "SWOT, missão, Taylor e governança"
+
+
+def _db(tmp_path):
+    db = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    for m in (models.TaxonomyVersion, models.PolicyVersion, models.CourseBinding, models.CatalogDiscipline):
+        m.__table__.create(db)
+    return sessionmaker(bind=db)
+
+
+def _bind(Session, version, year=2026):
+    with Session() as db:
+        db.add(models.TaxonomyVersion(id=f"tv-{version}", tenant_id="t1", version=version))
+        db.merge(models.PolicyVersion(id="pv", tenant_id="t1", version="p1", config={}))
+        db.add(models.CourseBinding(
+            id=f"b-{version}", tenant_id="t1", course_id="adm", taxonomy_version_id=f"tv-{version}", policy_version_id="pv",
+            active_from=datetime(year, 1, 1, tzinfo=timezone.utc),
+        ))
+        db.commit()
+
+
+def _catalog(ementa=DESTINO):
+    return [{"disciplina_id": 7, "nome": "TGA", "carga_horaria": 60, "ementa": ementa}]
+
+
+def _map_job(monkeypatch, Session, engine):
+    monkeypatch.setattr(app.catalog_builder, "SessionLocal", Session)
+    monkeypatch.setattr(app.api.routes, "get_engine", lambda: engine)
+    return app.catalog_builder.map_course_catalog("t1", "adm")
+
+
+def test_upsert_marks_only_changed_ementas_pending(tmp_path, monkeypatch):
+    Session = _db(tmp_path)
+    _bind(Session, "2026.01")
+    engine, _ = _engine(None)
+    with Session() as db:
+        assert upsert_catalog(db, "t1", "adm", _catalog()) == {"created": 1, "changed": 0, "unchanged": 0}
+    assert _map_job(monkeypatch, Session, engine)["mapped"] == 1
+
+    with Session() as db:
+        # só o nome muda: continua mapeada; ementa (normalizada) igual também
+        assert upsert_catalog(db, "t1", "adm", [{**_catalog()[0], "nome": "TGA I", "ementa": f"  {DESTINO.upper()} "}])["changed"] == 0
+        assert pending_catalog_rows(db, "t1", "adm", "2026.01", engine.mapper.model_version) == []
+        assert upsert_catalog(db, "t1", "adm", _catalog("Fayol e compliance"))["changed"] == 1
+        assert len(pending_catalog_rows(db, "t1", "adm", "2026.01", engine.mapper.model_version)) == 1
+
+
+def test_evaluate_uses_catalog_and_skips_destino_mapping(tmp_path, monkeypatch):
+    Session = _db(tmp_path)
+    _bind(Session, "2026.01")
+    with Session() as db:
+        upsert_catalog(db, "t1", "adm", _catalog())
+    job_engine, _ = _engine(None)
+    _map_job(monkeypatch, Session, job_engine)
+
+    expected = _engine(None)[0].evaluate(make_request(destino=DESTINO), "t1")
+
+    engine, mapper = _engine(None)
+    engine.catalog = CatalogStore(Session)
+    req = make_request(destino=DESTINO, course_id="adm")
+    req.destino.disciplina_id = 7
+    resp = engine.evaluate(req, "t1")
+    assert mapper.calls == [req.origem.ementa]
+    assert _comparable(resp) == _comparable(expected)
+
+    resp_async = asyncio.run(engine.aevaluate(req, "t1"))
+    assert _comparable(resp_async) == _comparable(expected)
+
+    # sem course_id (ou disciplina fora do catálogo) o destino é mapeado normalmente
+    engine.evaluate(make_request(destino=DESTINO), "t1")
+    assert DESTINO in mapper.calls
+
+
+def test_new_binding_remaps_catalog(tmp_path, monkeypatch):
+    Session = _db(tmp_path)
+    _bind(Session, "2026.01")
+    with Session() as db:
+        upsert_catalog(db, "t1", "adm", _catalog())
+    engine, _ = _engine(None)
+    engine.taxonomy_store.load_version("2027.01", list(engine.taxonomy_store.get_nodes("2026.01").values()))
+    _map_job(monkeypatch, Session, engine)
+
+    store = CatalogStore(Session)
+    mv = engine.mapper.model_version
+    assert list(store.course_nodes("t1", "adm", "2026.01", mv)) == [7]
+
+    _bind(Session, "2027.01", year=2027)
+    assert _map_job(monkeypatch, Session, engine) == {"ok": True, "course_id": "adm", "taxonomy_version": "2027.01", "mapped": 1}
+    assert list(CatalogStore(Session).course_nodes("t1", "adm", "2027.01", mv)) == [7]
+    assert CatalogStore(Session).course_nodes("t1", "adm", "2026.01", mv) == {}
+
+
+def test_catalog_changes_invalidate_cached_course(tmp_path, monkeypatch):
+    import json
+
+    import app.auth
+    import app.redis_client
+
+    published = []
+
+    class FakeRedis:
+        def publish(self, channel, data):
+            published.append(json.loads(data))
+
+    monkeypatch.setattr(app.redis_client, "redis_conn", FakeRedis())
+    Session = _db(tmp_path)
+    _bind(Session, "2026.01")
+    engine, _ = _engine(None)
+    mv = engine.mapper.model_version
+    store = CatalogStore(Session)
+
+    # curso sem catálogo mapeado não fica em cache: o primeiro mapeamento vale na hora
+    assert store.course_nodes("t1", "adm", "2026.01", mv) == {}
+    with Session() as db:
+        upsert_catalog(db, "t1", "adm", _catalog())
+    _map_job(monkeypatch, Session, engine)
+    first = store.course_nodes("t1", "adm", "2026.01", mv)[7]
+    assert published[-1] == {"catalog": {"tenant_id": "t1", "course_id": "adm"}}
+
+    # ementa alterada e re-mapeada: o job invalida o curso e o store relê
+    with Session() as db:
+        upsert_catalog(db, "t1", "adm", _catalog("Fayol, Weber e compliance"))
+    _map_job(monkeypatch, Session, engine)
+    assert store.course_nodes("t1", "adm", "2026.01", mv)[7] != first
+
+    # mensagem vinda de outro processo (listener do canal de auth)
+    cached = store.course_nodes("t1", "adm", "2026.01", mv)
+    app.auth._apply_invalidation(json.dumps(published[-1]))
+    assert store.course_nodes("t1", "adm", "2026.01", mv) is not cached
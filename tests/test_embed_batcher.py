@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from app.mapper.embed_batcher import MicroBatchingEmbeddingClient
+
+
+class SlowEmbedder:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def embed(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        time.sleep(0.02)
+        if self.fail:
+            raise RuntimeError("boom")
+        return [[float(len(t))] for t in texts]
+
+
+def _run_concurrently(client, texts):
+    results = [None] * len(texts)
+    barrier = threading.Barrier(len(texts))
+
+    def work(i):
+        barrier.wait()
+        results[i] = client.embed([texts[i]])[0]
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_calls_are_coalesced_and_deduplicated():
+    inner = SlowEmbedder()
+    client = MicroBatchingEmbeddingClient(inner, max_batch=64, max_wait_ms=50)
+    texts = [f"ementa {i % 5}" + "x" * i for i in range(10)] + ["igual"] * 10
+
+    results = _run_concurrently(client, texts)
+
+    assert results == [[float(len(t))] for t in texts]
+    sent = [t for call in inner.calls for t in call]
+    assert len(sent) == len(set(sent)) == 11
+    assert len(inner.calls) < len(texts)
+
+
+def test_max_batch_splits_requests():
+    inner = SlowEmbedder()
+    client = MicroBatchingEmbeddingClient(inner, max_batch=4, max_wait_ms=50)
+    client.embed([f"t{i}" for i in range(10)])
+    assert all(len(call) <= 4 for call in inner.calls)
+
+
+def test_errors_propagate_to_all_waiters():
+    client = MicroBatchingEmbeddingClient(SlowEmbedder(fail=True), max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        client.embed(["a", "b"])
+    # nada fica preso como "em voo" depois do erro
+    assert client._inflight == {}
@@ -0,0 +1,149 @@
+import random
+
+from app.mapper.embedding_llm_mapper import EmbeddingLLMMapper, EmbeddingLLMMapperConfig
+from app.mapper.taxonomy_index import TaxonomyEmbeddingIndex
+from app.taxonomy.models import TaxonomyNode
+
+DIM = 8
+
+
+def _vec(text):
+    rnd = random.Random(text)
+    return [rnd.uniform(-1, 1) for _ in range(DIM)]
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return [_vec(t) for t in texts]
+
+
+def _mapper(embedder):
+    nodes = {
+        nid: TaxonomyNode(
+            id=nid, area="A", subarea="S", conceito=f"C{nid}", descricao="d",
+            palavras_chave=["k"], nivel="basico", critico=False,
+        )
+        for nid in range(1, 41)
+    }
+    vectors = {nid: _vec(f"node-{nid}") for nid in nodes}
+    index = TaxonomyEmbeddingIndex.from_vectors("v1", vectors, nodes)
+    cfg = EmbeddingLLMMapperConfig(top_k=5, min_similarity=0.0, use_llm_refine=False)
+    return EmbeddingLLMMapper(embedder=embedder, index=index, cfg=cfg)
+
+
+def test_map_many_matches_map_with_single_embed_call():
+    texts = ["gestão estratégica", "teoria geral da administração", "cálculo diferencial"]
+
+    single = _mapper(CountingEmbedder())
+    expected = [single.map("t", "v1", t) for t in texts]
+
+    embedder = CountingEmbedder()
+    got = _mapper(embedder).map_many("t", "v1", texts)
+
+    assert embedder.calls == [texts]
+    assert [[m.node_id for m in ms] for ms in got] == [[m.node_id for m in ms] for ms in expected]
+    for ms_got, ms_exp in zip(got, expected):
+        for a, b in zip(ms_got, ms_exp):
+            assert abs(a.weight - b.weight) < 1e-6
+
+
+def test_engine_prefetch_fills_cache_once():
+    from app.audit.repository import AuditRepository
+    from app.cache.cache import SimpleTTLCache
+    from app.engine.service import EquivalenceEngine
+    from app.taxonomy.store import TaxonomyStore
+
+    embedder = CountingEmbedder()
+    engine = EquivalenceEngine(TaxonomyStore(), _mapper(embedder), None, SimpleTTLCache(), AuditRepository())
+
+    items = [("origem", "ementa a"), ("destino", "ementa b"), ("origem", "ementa a")]
+    assert engine.prefetch_mappings("t", "v1", items) == 2
+    assert engine.prefetch_mappings("t", "v1", items) == 0
+    assert len(embedder.calls) == 1
+
+
+def test_amap_uses_async_clients_and_matches_map():
+    import asyncio
+
+    class AsyncEmbedder:
+        async def embed(self, texts):
+            return [_vec(t) for t in texts]
+
+    class AsyncLLM:
+        async def complete_json(self, system, user, json_schema):
+            return {"mapped": []}
+
+    mapper = _mapper(CountingEmbedder())
+    expected = mapper.map("t", "v1", "gestão estratégica")
+
+    mapper.async_embedder = AsyncEmbedder()
+    got = asyncio.run(mapper.amap("t", "v1", "gestão estratégica"))
+    assert [m.node_id for m in got] == [m.node_id for m in expected]
+
+    mapper.cfg.use_llm_refine = True
+    mapper.async_llm = AsyncLLM()
+    assert asyncio.run(mapper.amap("t", "v1", "gestão estratégica")) == []
+
+
+def test_llm_failure_is_cached_but_not_stored(tmp_path):
+    import asyncio
+
+    from app.audit.repository import AuditRepository
+    from app.cache.cache import SimpleTTLCache
+    from app.engine.service import EquivalenceEngine
+    from app.taxonomy.store import TaxonomyStore
+    from tests.test_mapping_store import _store
+
+    class DownLLM:
+        def complete_json(self, system, user, json_schema):
+            raise TimeoutError("llm down")
+
+    mapper = _mapper(CountingEmbedder())
+    mapper.cfg.use_llm_refine = True
+    mapper.llm = DownLLM()
+    assert getattr(mapper.map("t", "v1", "gestão estratégica"), "unrefined", False)
+    assert getattr(asyncio.run(mapper.amap("t", "v1", "gestão estratégica")), "unrefined", False)
+
+    store = _store(tmp_path)
+    engine = EquivalenceEngine(TaxonomyStore(), mapper, None, SimpleTTLCache(), AuditRepository(), mapping_store=store)
+    first = engine.map_ementas("t", "v1", ["ementa a"])
+    assert first[0]
+    h = engine._text_hash("ementa a")
+    assert store.get_many("t", "v1", mapper.model_version, [h]) == {}  # LLM fora: não persiste
+    assert engine.map_ementas("t", "v1", ["ementa a"]) == first  # mas o cache segue servindo
+
+    mapper.llm = None  # sem refinamento configurado: resultado base é o definitivo
+    engine.map_ementas("t", "v1", ["ementa b"])
+    assert store.get_many("t", "v1", mapper.model_version, [engine._text_hash("ementa b")])
+
+
+def test_amap_runs_top_k_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+
+    import app.mapper.embedding_llm_mapper as mod
+
+    class AsyncEmbedder:
+        async def embed(self, texts):
+            return [_vec(t) for t in texts]
+
+    threads = []
+    real = mod.top_k_concepts
+
+    def recording(*a, **kw):
+        threads.append(threading.current_thread())
+        return real(*a, **kw)
+
+    monkeypatch.setattr(mod, "top_k_concepts", recording)
+    mapper = _mapper(CountingEmbedder())
+    mapper.async_embedder = AsyncEmbedder()
+
+    async def run():
+        return threading.current_thread(), await mapper.amap("t", "v1", "gestão estratégica")
+
+    loop_thread, got = asyncio.run(run())
+    assert got and threads and threads[0] is not loop_thread
@@ -0,0 +1,188 @@
+import asyncio
+
+from app.api.schemas import EvaluateRequest
+from app.audit.repository import AuditRepository
+from app.cache.cache import SimpleTTLCache
+from app.engine.service import EquivalenceEngine
+from app.mapper.stub_mapper import StubKeywordMapper
+from app.taxonomy.models import TaxonomyNode
+from app.taxonomy.store import TaxonomyStore
+
+NODES = [
+    TaxonomyNode(
+        id=1012, area="Administração", subarea="Gestão", conceito="Planejamento Estratégico",
+        descricao="d", palavras_chave=["swot", "missão", "visão", "objetivos"],
+        nivel="intermediario", critico=True,
+    ),
+    TaxonomyNode(
+        id=1001, area="Administração", subarea="Fundamentos", conceito="Teorias Administrativas",
+        descricao="d", palavras_chave=["taylor", "fayol", "weber"],
+        nivel="basico", critico=False,
+    ),
+    TaxonomyNode(
+        id=1020, area="Administração", subarea="Gestão", conceito="Governança",
+        descricao="d", palavras_chave=["governança", "compliance"],
+        nivel="avancado", critico=False,
+    ),
+]
+
+
+def make_engine(mapper=None, cache=None):
+    store = TaxonomyStore()
+    store.load_version("2026.01", NODES)
+    return EquivalenceEngine(
+        store, mapper or StubKeywordMapper(store), None, cache or SimpleTTLCache(), AuditRepository()
+    )
+
+
+def make_request(origem="Taylor, Fayol, análise SWOT, missão e visão", destino="SWOT, missão, Taylor e governança", **kw):
+    payload = {
+        "request_id": "req-00000001",
+        "origem": {"nome": "Adm I", "carga_horaria": 60, "ementa": origem, "aprovado": True},
+        "destino": {"nome": "TGA", "carga_horaria": 60, "ementa": destino},
+        "taxonomy_version": "2026.01",
+        "policy_version": "p1",
+    }
+    payload.update(kw)
+    return EvaluateRequest(**payload)
+
+
+def _comparable(resp):
+    data = resp.model_dump()
+    data.pop("timings_ms")
+    return data
+
+
+def test_evaluate_scores_stub_mapping():
+    resp = make_engine().evaluate(make_request(), "t1")
+    assert resp.faltantes == [1020]
+    assert resp.criticos_faltantes == []
+    assert resp.meta["mapper_used"] == "primary"
+
+
+def test_blocked_by_hard_rules():
+    req = make_request()
+    req.origem.aprovado = False
+    resp = make_engine().evaluate(req, "t1")
+    assert resp.decisao == "INDEFERIDO"
+    assert resp.meta == {"blocked_by_hard_rules": True}
+
+
+def test_aevaluate_matches_evaluate():
+    req = make_request()
+    sync_resp = make_engine().evaluate(req, "t1")
+    async_resp = asyncio.run(make_engine().aevaluate(req, "t1"))
+    assert _comparable(async_resp) == _comparable(sync_resp)
+
+
+def test_evaluate_maps_sides_concurrently_and_records_per_side_timings():
+    import time
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    class SlowMapper:
+        model_version = "slow"
+
+        def __init__(self, inner):
+            self.inner = inner
+
+        def map(self, tenant_id, taxonomy_version, text):
+            time.sleep(0.1)
+            return self.inner.map(tenant_id, taxonomy_version, text)
+
+    engine = make_engine()
+    engine.mapper = SlowMapper(engine.mapper)
+    engine.executor = ThreadPoolExecutor(max_workers=2)
+
+    resp = engine.evaluate(make_request(), "t1")
+
+    assert resp.timings_ms.map_origem >= 100
+    assert resp.timings_ms.map_destino >= 100
+    assert resp.timings_ms.map < 190
+
+
+def test_evaluate_against_many_matches_pairwise_and_ranks():
+    from app.api.schemas import EvaluateManyRequest
+
+    destinos = [
+        {"nome": "D0", "carga_horaria": 60, "ementa": "governança e compliance"},
+        {"nome": "D1", "carga_horaria": 60, "ementa": "SWOT, missão, Taylor e governança", "disciplina_id": 7},
+        {"nome": "D2", "carga_horaria": 200, "ementa": "Taylor e Fayol"},  # bloqueado por carga
+        {"nome": "D3", "carga_horaria": 60, "ementa": "Taylor e Fayol"},
+    ]
+    base = make_request()
+    many = EvaluateManyRequest(
+        request_id=base.request_id, origem=base.origem.model_dump(), destinos=destinos,
+        taxonomy_version=base.taxonomy_version, policy_version=base.policy_version,
+    )
+    engine = make_engine()
+    resp = engine.evaluate_against_many(many, "t1")
+
+    assert resp.total == 4
+    scores = [r.result.score for r in resp.results]
+    assert scores == sorted(scores, reverse=True)
+    by_index = {r.index: r for r in resp.results}
+    assert by_index[1].disciplina_id == 7
+    assert by_index[2].result.meta == {"blocked_by_hard_rules": True}
+    for i in range(len(destinos)):
+        single = make_engine().evaluate(make_request().model_copy(update={"destino": many.destinos[i]}), "t1")
+        assert _comparable(by_index[i].result) == _comparable(single)
+
+    top = engine.evaluate_against_many(many.model_copy(update={"top_n": 2}), "t1")
+    assert [r.index for r in top.results] == [r.index for r in resp.results][:2]
+
+
+def test_evaluate_matrix_matches_pairwise_evaluate():
+    from app.api.schemas import EvaluateMatrixRequest
+
+    ementas = [
+        "Taylor, Fayol, análise SWOT, missão e visão",
+        "SWOT, missão, Taylor e governança",
+        "governança e compliance",
+        "Taylor e Fayol",
+        "tópicos sem conceitos mapeáveis",
+    ]
+    origens = [
+        {"nome": f"O{i}", "carga_horaria": c, "ementa": e, "aprovado": a}
+        for i, (e, c, a) in enumerate(zip(ementas, [60, 50, 80, 60, 60], [True, True, True, False, True]))
+    ]
+    destinos = [
+        {"nome": f"D{j}", "carga_horaria": c, "ementa": e}
+        for j, (e, c) in enumerate(zip(ementas, [60, 60, 60, 40, 200]))
+    ]
+    base = make_request()
+    policy = {"tolerancia_carga": 0.8}
+    req = EvaluateMatrixRequest(
+        request_id=base.request_id, origens=origens, destinos=destinos, policy=policy,
+        taxonomy_version=base.taxonomy_version, policy_version=base.policy_version,
+    )
+    resp = make_engine().evaluate_matrix(req, "t1")
+
+    for i, o in enumerate(req.origens):
+        for j, d in enumerate(req.destinos):
+            single = make_engine().evaluate(
+                make_request().model_copy(update={"origem": o, "destino": d, "policy": req.policy}), "t1"
+            )
+            assert (resp.scores[i][j], resp.decisoes[i][j]) == (single.score, single.decisao), (i, j)
+
+    used_o = [a.origem_index for a in resp.assignment]
+    used_d = [a.destino_index for a in resp.assignment]
+    assert len(set(used_o)) == len(used_o) and len(set(used_d)) == len(used_d)
+    assert all(a.decisao != "INDEFERIDO" for a in resp.assignment)
+
+    # persistência compacta (uint8/int8) faz round-trip exato
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.models import EquivalenceMatrix
+    from app.repos import MatrixRepo
+
+    db_engine = create_engine("sqlite://")
+    EquivalenceMatrix.__table__.create(db_engine)
+    with Session(db_engine) as db:
+        repo = MatrixRepo()
+        matrix_id = repo.save(db, "t1", req, resp).id
+        assert repo.get(db, "t2", matrix_id=matrix_id) is None
+        scores, codes = repo.decode(repo.get(db, "t1", matrix_id=matrix_id))
+        assert scores.tolist() == resp.scores
+        assert codes.shape == (len(origens), len(destinos))
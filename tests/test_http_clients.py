@@ -0,0 +1,101 @@
+import json
+import threading
+
+import httpx
+import pytest
+
+from app.mapper.clients import HttpClientConfig, SimpleHttpEmbeddingClient
+
+
+def _client(handler, **cfg):
+    config = HttpClientConfig(base_url="http://embed", backoff_seconds=0.0, **cfg)
+    transport = httpx.MockTransport(handler)
+    return SimpleHttpEmbeddingClient(config, client=httpx.Client(base_url="http://embed", transport=transport))
+
+
+def _vectors_for(request):
+    texts = json.loads(request.content)["texts"]
+    return {"vectors": [[float(t.split("-")[1])] for t in texts]}
+
+
+def test_embed_splits_in_batches_and_keeps_order():
+    seen = []
+    lock = threading.Lock()
+
+    def handler(request):
+        with lock:
+            seen.append(len(json.loads(request.content)["texts"]))
+        return httpx.Response(200, json=_vectors_for(request))
+
+    client = _client(handler, max_batch_size=10, max_in_flight=3)
+    texts = [f"t-{i}" for i in range(35)]
+    assert client.embed(texts) == [[float(i)] for i in range(35)]
+    assert sorted(seen) == [5, 10, 10, 10]
+
+
+def test_embed_retries_transient_errors():
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        if calls["n"] < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json=_vectors_for(request))
+
+    client = _client(handler, max_retries=3)
+    assert client.embed(["t-1"]) == [[1.0]]
+    assert calls["n"] == 3
+
+
+def test_embed_gives_up_after_max_retries():
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        return httpx.Response(503)
+
+    with pytest.raises(RuntimeError):
+        _client(handler, max_retries=2).embed(["t-1"])
+    assert calls["n"] == 3
+
+
+def test_embed_does_not_retry_client_errors():
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        return httpx.Response(400)
+
+    with pytest.raises(RuntimeError):
+        _client(handler, max_retries=2).embed(["t-1"])
+    assert calls["n"] == 1
+
+
+def test_async_clients_chunk_and_retry():
+    import asyncio
+
+    from app.mapper.clients import AsyncHttpEmbeddingClient, AsyncHttpLLMJsonClient
+
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        if request.url.path == "/llm/json":
+            if calls["n"] == 1:
+                return httpx.Response(502)
+            return httpx.Response(200, json={"json": {"mapped": []}})
+        return httpx.Response(200, json=_vectors_for(request))
+
+    config = HttpClientConfig(base_url="http://x", backoff_seconds=0.0, max_batch_size=3)
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        llm = AsyncHttpLLMJsonClient(config, client=httpx.AsyncClient(base_url="http://x", transport=transport))
+        out = await llm.complete_json("s", "u", {})
+        embed = AsyncHttpEmbeddingClient(config, client=httpx.AsyncClient(base_url="http://x", transport=transport))
+        vecs = await embed.embed([f"t-{i}" for i in range(7)])
+        return out, vecs
+
+    out, vecs = asyncio.run(run())
+    assert out == {"mapped": []}
+    assert vecs == [[float(i)] for i in range(7)]
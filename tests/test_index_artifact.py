@@ -0,0 +1,82 @@
+import random
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from app.mapper.index_artifact import artifact_dir, load_index_artifact, save_index_artifact
+from app.mapper.taxonomy_index import TaxonomyEmbeddingIndex, top_k_concepts
+from app.taxonomy.models import TaxonomyNode
+
+
+def _nodes(ids):
+    return {
+        nid: TaxonomyNode(
+            id=nid, area="A", subarea="S", conceito=f"C{nid}", descricao="d",
+            palavras_chave=["k"], nivel="basico", critico=False,
+        )
+        for nid in ids
+    }
+
+
+def _index(n=50, dim=8):
+    rnd = random.Random(11)
+    vectors = {100 + i: [rnd.uniform(-1, 1) for _ in range(dim)] for i in range(n)}
+    return TaxonomyEmbeddingIndex.from_vectors("2026.01", vectors, _nodes(vectors))
+
+
+def test_roundtrip_is_memory_mapped_and_equivalent(tmp_path):
+    index = _index()
+    meta = save_index_artifact(str(tmp_path), "arbe", index)
+    assert meta["count"] == 50 and meta["dim"] == 8
+
+    loaded = load_index_artifact(str(tmp_path), "arbe", "2026.01", index.nodes, verify_checksum=True)
+    assert loaded is not None
+    assert isinstance(loaded.matrix, np.memmap)
+
+    q = [0.3] * 8
+    assert top_k_concepts(loaded, q, k=5) == top_k_concepts(index, q, k=5)
+
+
+def test_rebuild_replaces_generation_and_keeps_the_previous_one(tmp_path):
+    index = _index()
+    first = save_index_artifact(str(tmp_path), "arbe", index)
+    second = save_index_artifact(str(tmp_path), "arbe", _index(dim=4))
+    gens = {p.name for p in artifact_dir(str(tmp_path), "arbe", "2026.01").iterdir() if p.is_dir()}
+    assert gens == {Path(first["path"]).name, Path(second["path"]).name}
+
+    save_index_artifact(str(tmp_path), "arbe", _index(dim=6))
+    save_index_artifact(str(tmp_path), "arbe", _index(dim=4))
+    gens = [p for p in artifact_dir(str(tmp_path), "arbe", "2026.01").iterdir() if p.is_dir()]
+    assert len(gens) == 2
+    loaded = load_index_artifact(str(tmp_path), "arbe", "2026.01", index.nodes)
+    assert loaded.matrix.shape == (50, 4)
+
+
+def test_missing_or_stale_artifact_returns_none(tmp_path):
+    index = _index()
+    assert load_index_artifact(str(tmp_path), "arbe", "2026.01", index.nodes) is None
+
+    save_index_artifact(str(tmp_path), "arbe", index)
+    assert load_index_artifact(str(tmp_path), "arbe", "2026.01", _nodes([1, 2, 3])) is None
+
+
+def test_checksum_mismatch_is_rejected(tmp_path):
+    index = _index()
+    meta = save_index_artifact(str(tmp_path), "arbe", index)
+    m = np.load(f"{meta['path']}/matrix.npy")
+    m[0, 0] += 1.0
+    np.save(f"{meta['path']}/matrix.npy", m)
+    assert load_index_artifact(str(tmp_path), "arbe", "2026.01", index.nodes, verify_checksum=True) is None
+
+
+def test_generation_removed_under_the_reader_returns_none(tmp_path):
+    index = _index()
+    meta = save_index_artifact(str(tmp_path), "arbe", index)
+    # leitor pegou o CURRENT, um build concorrente apagou a geração antes do np.load
+    for name in ("matrix.npy", "node_ids.npy"):
+        Path(meta["path"], name).unlink()
+    assert load_index_artifact(str(tmp_path), "arbe", "2026.01", index.nodes) is None
+
+    shutil.rmtree(meta["path"])
+    assert load_index_artifact(str(tmp_path), "arbe", "2026.01", index.nodes) is None
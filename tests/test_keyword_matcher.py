@@ -0,0 +1,60 @@
+import random
+import re
+
+from app.mapper.stub_mapper import StubKeywordMapper
+from app.taxonomy.keyword_matcher import KeywordMatcher, normalize_keyword_text
+from app.taxonomy.models import TaxonomyNode
+from app.taxonomy.store import TaxonomyStore
+
+
+def _legacy_match(nodes, text):
+    """Implementação anterior do StubKeywordMapper (um re.search por keyword)."""
+    t_norm = normalize_keyword_text(text)
+    out = []
+    for node in nodes:
+        hits, evid = 0, []
+        for kw in node.palavras_chave:
+            if re.search(rf"\b{re.escape(normalize_keyword_text(kw))}\b", t_norm):
+                hits += 1
+                if len(evid) < 3:
+                    evid.append(kw)
+        if hits:
+            out.append((node.id, hits, evid))
+    return out
+
+
+def _node(nid, kws):
+    return TaxonomyNode(
+        id=nid, area="a", subarea="s", conceito=f"c{nid}", descricao="d",
+        palavras_chave=kws, nivel="basico", critico=False,
+    )
+
+
+def test_overlapping_and_suffix_keywords():
+    nodes = [_node(1, ["he", "she", "his", "hers"]), _node(2, ["she sells", "sells"]), _node(3, ["c++", "c#", "_x"])]
+    m = KeywordMatcher(nodes)
+    for text in ["ushers", "she sells his hers", "C++ e C# e _x", "c++x", "a c++", "he"]:
+        assert m.match(normalize_keyword_text(text)) == _legacy_match(nodes, text), text
+
+
+def test_matches_legacy_regex_on_random_inputs():
+    rng = random.Random(7)
+    alphabet = "abcãé _-+.1"
+    words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4))) for _ in range(60)]
+    nodes = [_node(i, [rng.choice(words) for _ in range(rng.randint(1, 6))]) for i in range(40)]
+    m = KeywordMatcher(nodes)
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet + "ÃÉ") for _ in range(rng.randint(0, 30)))
+        assert m.match(normalize_keyword_text(text)) == _legacy_match(nodes, text), (text, nodes)
+
+
+def test_store_builds_matcher_and_mapper_uses_it():
+    store = TaxonomyStore()
+    nodes = [_node(1, ["Planejamento", "SWOT", "swot"]), _node(2, ["Análise"])]
+    store.load_version("v1", nodes)
+    matcher = store.keyword_matcher("v1")
+    assert store.keyword_matcher("v1") is matcher
+
+    mapped = StubKeywordMapper(store).map("t", "v1", "Planejamento e análise swot")
+    assert [(m.node_id, m.evidence) for m in mapped] == [(1, ["Planejamento", "SWOT", "swot"]), (2, ["Análise"])]
+    assert mapped[0].weight == min(1.0, 0.3 + 0.2 * 3)
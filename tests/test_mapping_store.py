@@ -0,0 +1,96 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.audit.repository import AuditRepository
+from app.cache.cache import SimpleTTLCache
+from app.engine.service import EquivalenceEngine
+from app.engine.utils import normalize_ementa
+from app.mapper.base import MappedNode
+from app.mapper.stub_mapper import StubKeywordMapper
+from app.mapping_repo import MappingStore
+from app.models import MappedEmenta
+from app.taxonomy.store import TaxonomyStore
+from tests.test_engine import NODES, _comparable, make_request
+
+
+def _store(tmp_path):
+    # arquivo (não :memory:): cada sessão tem sua conexão, como no Postgres
+    db = create_engine(f"sqlite:///{tmp_path / 'mapped.db'}")
+    MappedEmenta.__table__.create(db)
+    return MappingStore(sessionmaker(bind=db))
+
+
+class CountingMapper(StubKeywordMapper):
+    def __init__(self, store):
+        super().__init__(store)
+        self.calls = []
+
+    def map(self, tenant_id, taxonomy_version, text):
+        self.calls.append(text)
+        return super().map(tenant_id, taxonomy_version, text)
+
+
+def _engine(mapping_store):
+    tax = TaxonomyStore()
+    tax.load_version("2026.01", NODES)
+    mapper = CountingMapper(tax)
+    engine = EquivalenceEngine(
+        tax, mapper, None, SimpleTTLCache(sweep_interval_seconds=0), AuditRepository(), mapping_store=mapping_store
+    )
+    return engine, mapper
+
+
+def test_normalize_ementa():
+    assert normalize_ementa("  Análise\tSWOT \n e  Missão ") == normalize_ementa("análise swot e missão")
+    # NFD e NFC viram o mesmo texto
+    assert normalize_ementa("Missa\u0303o") == normalize_ementa("Miss\u00e3o")
+
+
+def test_store_roundtrip_and_conflict_keeps_first(tmp_path):
+    store = _store(tmp_path)
+    first = [MappedNode(node_id=1, weight=0.5, confidence=0.9, evidence=["a"])]
+    store.put_many("t1", "v1", "m1", {"h1": first})
+    store.put_many("t1", "v1", "m1", {"h1": [], "h2": []})
+    assert store.get_many("t1", "v1", "m1", ["h1", "h2", "h3"]) == {"h1": first, "h2": []}
+    assert store.get_many("t1", "v1", "m2", ["h1"]) == {}
+
+
+def test_restart_starts_warm_from_store(tmp_path):
+    store = _store(tmp_path)
+    engine, mapper = _engine(store)
+    resp = engine.evaluate(make_request(), "t1")
+    assert len(mapper.calls) == 2
+
+    # "novo processo": cache vazio, mesmo store
+    engine2, mapper2 = _engine(store)
+    resp2 = engine2.evaluate(make_request(), "t1")
+    assert mapper2.calls == []
+    assert _comparable(resp2) == _comparable(resp)
+
+    resp3 = asyncio.run(_engine(store)[0].aevaluate(make_request(), "t1"))
+    assert _comparable(resp3) == _comparable(resp)
+
+
+def test_same_ementa_mapped_once_across_sides(tmp_path):
+    engine, mapper = _engine(_store(tmp_path))
+    engine.evaluate(make_request(origem="Taylor e SWOT", destino="  taylor E swot "), "t1")
+    assert len(mapper.calls) == 1
+
+    n = engine.prefetch_mappings("t1", "2026.01", [("origem", "Fayol"), ("destino", "fayol"), ("origem", "Taylor e SWOT")])
+    assert n == 1
+
+
+def test_store_failure_degrades_to_mapper():
+    class BrokenStore:
+        def get_many(self, *a):
+            raise RuntimeError("db down")
+
+        def put_many(self, *a):
+            raise RuntimeError("db down")
+
+    engine, mapper = _engine(BrokenStore())
+    resp = engine.evaluate(make_request(), "t1")
+    assert resp.meta["mapper_used"] == "primary"
+    assert len(mapper.calls) == 2
@@ -0,0 +1,83 @@
+import glob
+import multiprocessing
+import os
+import threading
+
+import app.metrics as metrics
+
+
+def _reset(monkeypatch, directory=""):
+    monkeypatch.setattr(metrics.settings, "METRICS_MULTIPROC_DIR", directory)
+    metrics._after_fork()  # shards novos, sem o que outros testes gravaram
+
+
+def _line(text, prefix):
+    return next(line for line in text.splitlines() if line.startswith(prefix))
+
+
+def test_thread_shards_are_summed_at_scrape(monkeypatch):
+    _reset(monkeypatch)
+
+    def hit():
+        for _ in range(1000):
+            metrics.observe_request("/v1/x", "GET", 200, 120)
+
+    threads = [threading.Thread(target=hit) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    metrics.observe_decision("t1", "EQUIVALENTE", False)
+
+    text = metrics.render_prometheus()
+    assert _line(text, 'http_requests_total{path="/v1/x",method="GET",status="200"}').endswith(" 8000")
+    assert _line(text, 'http_request_latency_ms_bucket{path="/v1/x",method="GET",le="100"}').endswith(" 0")
+    assert _line(text, 'http_request_latency_ms_bucket{path="/v1/x",method="GET",le="200"}').endswith(" 8000")
+    assert _line(text, 'equivalence_decisions_total{tenant="t1",decision="EQUIVALENTE"}').endswith(" 1")
+
+
+def _child(n):
+    for _ in range(n):
+        metrics.observe_request("/health", "GET", 200, 10)
+    metrics.observe_worker_items(done=n, failed=1, seconds=0.5)
+    metrics.observe_error("worker.evaluate", "ValueError")
+
+
+def test_processes_write_mmap_files_aggregated_and_compacted(monkeypatch, tmp_path):
+    _reset(monkeypatch, str(tmp_path))
+    metrics.observe_request("/health", "GET", 200, 10)  # o próprio processo do scrape
+
+    ctx = multiprocessing.get_context("fork")
+    children = [ctx.Process(target=_child, args=(n,)) for n in (10, 20, 30)]
+    for p in children:
+        p.start()
+    for p in children:
+        p.join()
+        assert p.exitcode == 0
+
+    text = metrics.render_prometheus()
+    assert _line(text, 'http_requests_total{path="/health",method="GET",status="200"}').endswith(" 61")
+    assert _line(text, 'worker_items_total{status="done"}').endswith(" 60")
+    assert _line(text, 'worker_items_total{status="failed"}').endswith(" 3")
+    assert _line(text, "worker_busy_seconds_total").endswith(" 1.5")
+    assert _line(text, 'equivalence_errors_total{where="worker.evaluate",type="ValueError"}').endswith(" 3")
+
+    # arquivos dos processos mortos foram somados no {host}_archive.db: sobram ele e os do processo vivo
+    files = {os.path.basename(f) for f in glob.glob(str(tmp_path / "*.db"))}
+    assert f"{metrics._HOST}_archive.db" in files
+    assert all(f.endswith("archive.db") or f"_{os.getpid()}_" in f for f in files)
+    assert metrics.render_prometheus() == text  # contadores não mudam com a compactação
+
+
+def test_scrape_reads_files_under_the_compaction_lock(monkeypatch, tmp_path):
+    _reset(monkeypatch, str(tmp_path))
+    metrics.observe_request("/health", "GET", 200, 10)
+
+    out = []
+    with metrics._dir_lock(str(tmp_path)):  # outro processo compactando
+        scrape = threading.Thread(target=lambda: out.append(metrics.render_prometheus()))
+        scrape.start()
+        scrape.join(0.2)
+        assert scrape.is_alive() and not out
+    scrape.join()
+    assert _line(out[0], 'http_requests_total{path="/health",method="GET",status="200"}').endswith(" 1")
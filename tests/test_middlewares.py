@@ -0,0 +1,67 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import app.middlewares_obs
+import app.middlewares_rate
+from app.auth import AUTH_CACHE, ResolvedKey
+from app.middlewares import ApiKeyAuthMiddleware
+from app.middlewares_obs import ObservabilityMiddleware
+from app.middlewares_rate import RateLimitMiddleware
+from app.rate_limiter import RateLimitResult
+from app.security import hash_api_key
+
+
+def _client(monkeypatch, allowed=True):
+    AUTH_CACHE.clear()
+    AUTH_CACHE.put(hash_api_key("good"), ResolvedKey("k1", "t1", "api-client"))
+    monkeypatch.setattr(app.middlewares.settings, "AUTH_CACHE_PUBSUB", False)
+
+    checked, observed = [], []
+
+    def fake_check(buckets):
+        checked.append([b[0] for b in buckets])
+        return RateLimitResult(allowed=allowed, tokens_left=41, retry_after=0 if allowed else 7)
+
+    monkeypatch.setattr(app.middlewares_rate, "_leased", None)
+    monkeypatch.setattr(app.middlewares_rate, "check_rate_limits", fake_check)
+    monkeypatch.setattr(app.middlewares_obs, "observe_request", lambda *a: observed.append(a))
+
+    api = FastAPI()
+    api.add_middleware(ObservabilityMiddleware)
+    api.add_middleware(RateLimitMiddleware)
+    api.add_middleware(ApiKeyAuthMiddleware)
+
+    @api.get("/health")
+    def health():
+        return {"status": "alive"}
+
+    @api.get("/v1/jobs/{job_id}/results")
+    def stream(job_id: str, request: Request):
+        tenant = request.state.tenant_id
+        return StreamingResponse((f"{tenant}:{i}\n" for i in range(3)), media_type="application/x-ndjson")
+
+    return TestClient(api), checked, observed
+
+
+def test_pipeline_sets_state_headers_and_streams(monkeypatch):
+    client, checked, observed = _client(monkeypatch)
+
+    assert client.get("/health").status_code == 200
+    assert checked == []  # público: nem auth nem rate limit
+
+    r = client.get("/v1/jobs/j1/results", headers={"X-API-Key": "good", "X-Trace-Id": "tr-1"})
+    assert r.text.splitlines() == ["t1:0", "t1:1", "t1:2"]
+    assert r.headers["X-RateLimit-Remaining"] == "41" and r.headers["X-Trace-Id"] == "tr-1"
+    assert "X-Request-Id" in r.headers and "X-Response-Time-ms" in r.headers
+    assert checked[-1] == ["rl:t1:api-client:/v1/jobs/*", "rl:t1:*"]
+    assert observed[-1][:3] == ("/v1/jobs/j1/results", "GET", 200)
+
+    assert client.get("/v1/jobs/j1/results").status_code == 401
+
+
+def test_rate_limited_requests_get_429(monkeypatch):
+    client, _, _ = _client(monkeypatch, allowed=False)
+    r = client.get("/v1/jobs/j1/results", headers={"X-API-Key": "good"})
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "7"
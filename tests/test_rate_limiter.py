@@ -0,0 +1,87 @@
+import math
+import os
+
+import pytest
+
+from app.rate_limiter import LeasedRateLimiter
+
+
+class FakeBuckets:
+    """Mesma semântica do LUA_MULTI_BUCKET, em memória e com relógio manual."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.state = {}
+        self.calls = 0
+
+    def take(self, buckets, want=1, minimum=1):
+        self.calls += 1
+        tokens = {}
+        for key, capacity, refill in buckets:
+            t, ts = self.state.get(key, (capacity, self.now))
+            tokens[key] = min(capacity, t + (self.now - ts) * refill)
+        available = min([want] + [math.floor(t) for t in tokens.values()])
+        granted = available if available >= minimum else 0
+        retry_after = max(
+            [math.ceil((minimum - tokens[k]) / r) for k, _c, r in buckets if tokens[k] < minimum] or [0]
+        )
+        for key in tokens:
+            self.state[key] = (tokens[key] - granted, self.now)
+        return granted, int(min(tokens.values()) - granted), retry_after
+
+
+def _limiter(buckets, lease=50, ttl=1.0):
+    clock = {"t": 0.0}
+    limiter = LeasedRateLimiter(lease, ttl, take=buckets.take, clock=lambda: clock["t"])
+    return limiter, clock
+
+
+def test_lease_spends_locally_and_never_exceeds_limit():
+    fake = FakeBuckets()
+    limiter, _ = _limiter(fake, lease=20)
+    buckets = [("rl:t1:api-client:/v1", 1000, 0.0001), ("rl:t1:*", 200, 0.0001)]
+
+    allowed = sum(limiter.check(buckets).allowed for _ in range(300))
+    limiter._executor.submit(lambda: None).result()  # espera o refill em background
+    # limitado pelo bucket do tenant (na mesma chamada); erro de no máximo um lease reservado e não gasto
+    assert 200 - 20 <= allowed <= 200
+
+    assert fake.calls <= 200 // 20 + 3  # ~1 round trip por lease, não por request; negação fica em cache
+    assert fake.state["rl:t1:*"][0] >= 0
+
+
+def test_small_buckets_stay_exact_and_leases_expire():
+    fake = FakeBuckets()
+    limiter, clock = _limiter(fake, lease=50, ttl=1.0)
+    buckets = [("rl:t1:admin:/admin", 10, 10 / 60)]
+
+    # capacity // 10 = 1: lease de um token, sem reservar o bucket inteiro
+    results = [limiter.check(buckets) for _ in range(11)]
+    limiter._executor.submit(lambda: None).result()  # espera o refill em background
+    assert [r.allowed for r in results] == [True] * 10 + [False]
+    assert results[-1].retry_after == 6
+
+    fake2 = FakeBuckets()
+    limiter, clock = _limiter(fake2, lease=10, ttl=1.0)
+    buckets = [("rl:t1:api-client:/v1", 1000, 100.0)]
+    limiter.check(buckets)
+    limiter._executor.submit(lambda: None).result()  # espera o refill em background
+    calls = fake2.calls
+    clock["t"] = 5.0  # lease vencido: tokens locais descartados, volta ao Redis
+    assert limiter.check(buckets).allowed
+    assert fake2.calls == calls + 1
+
+
+@pytest.mark.skipif(not os.getenv("RUN_INTEGRATION"), reason="Set RUN_INTEGRATION=1 to run integration tests")
+def test_multi_bucket_script_against_redis():
+    from app.rate_limiter import take_tokens
+    from app.redis_client import redis_conn
+
+    keys = ["rl:test:route", "rl:test:*"]
+    redis_conn.delete(*keys)
+    buckets = [(keys[0], 10, 0.001), (keys[1], 5, 0.001)]
+    assert take_tokens(buckets, want=3, minimum=1)[0] == 3
+    assert take_tokens(buckets, want=3, minimum=1)[0] == 2
+    granted, _left, retry_after = take_tokens(buckets)
+    assert granted == 0 and retry_after > 0
+    redis_conn.delete(*keys)
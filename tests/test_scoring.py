@@ -0,0 +1,98 @@
+import random
+
+from app.engine.scoring import (
+    coverage, critical_coverage, level_penalty, score_matrix, vectorized_scores, vectorized_scores_many,
+)
+from app.taxonomy.models import TaxonomyNode
+from app.taxonomy.store import TaxonomyStore
+
+
+def _nodes(rng, n):
+    return [
+        TaxonomyNode(
+            id=1000 + 3 * i, area="a", subarea="s", conceito=f"c{i}", descricao="d", palavras_chave=[],
+            nivel=rng.choice(["basico", "intermediario", "avancado"]), critico=rng.random() < 0.3,
+        )
+        for i in range(n)
+    ]
+
+
+def _vec(rng, ids, k):
+    # ids fora da taxonomia e pesos zero também aparecem
+    pool = ids + [5, 7, 999999]
+    return {nid: rng.choice([0.0, rng.random(), 1.0]) for nid in rng.sample(pool, min(k, len(pool)))}
+
+
+def _reference(vo, vd, nodes):
+    cov, missing = coverage(vo, vd)
+    cov_crit, missing_crit = critical_coverage(vo, vd, nodes)
+    return cov, missing, cov_crit, missing_crit, level_penalty(vo, vd, nodes)
+
+
+def _bits(result):
+    return tuple(x.hex() if isinstance(x, float) else x for x in result)
+
+
+def test_vectorized_scores_bit_identical():
+    rng = random.Random(11)
+    store = TaxonomyStore()
+    nodes = _nodes(rng, 200)
+    store.load_version("v", nodes)
+    by_id = store.get_nodes("v")
+    arrays = store.arrays("v")
+    ids = list(by_id)
+    for _ in range(2000):
+        vo = _vec(rng, ids, rng.randint(0, 40))
+        vd = _vec(rng, ids, rng.randint(0, 40))
+        got = vectorized_scores(vo, vd, arrays)
+        assert _bits(got) == _bits(_reference(vo, vd, by_id))
+
+
+def test_empty_and_zero_weight_destination():
+    store = TaxonomyStore()
+    store.load_version("v", _nodes(random.Random(1), 5))
+    arrays = store.arrays("v")
+    assert vectorized_scores({}, {}, arrays) == (0.0, [], 1.0, [], 0.0)
+    vd = {1000: 0.0, 1003: 0.0}
+    assert vectorized_scores({1000: 1.0}, vd, arrays) == _reference({1000: 1.0}, vd, store.get_nodes("v"))
+
+
+def test_critical_ids_precomputed_in_taxonomy_order():
+    store = TaxonomyStore()
+    nodes = _nodes(random.Random(3), 50)
+    store.load_version("v", nodes)
+    assert store.critical_ids("v") == [n.id for n in nodes if n.critico]
+    store.critical_ids("v").append(-1)  # cópia: não altera o pré-computado
+    assert -1 not in store.critical_ids("v")
+
+
+def test_vectorized_scores_many_matches_single():
+    rng = random.Random(5)
+    store = TaxonomyStore()
+    store.load_version("v", _nodes(rng, 120))
+    by_id = store.get_nodes("v")
+    arrays = store.arrays("v")
+    ids = list(by_id)
+    for _ in range(100):
+        vo = _vec(rng, ids, rng.randint(0, 40))
+        vds = [_vec(rng, ids, rng.randint(0, 30)) for _ in range(rng.randint(1, 12))]
+        got = vectorized_scores_many(vo, vds, arrays)
+        assert [_bits(g) for g in got] == [_bits(_reference(vo, vd, by_id)) for vd in vds]
+
+
+def test_score_matrix_matches_pairwise():
+    rng = random.Random(9)
+    store = TaxonomyStore()
+    store.load_version("v", _nodes(rng, 80))
+    by_id = store.get_nodes("v")
+    arrays = store.arrays("v")
+    ids = list(by_id)
+    for _ in range(30):
+        vos = [_vec(rng, ids, rng.randint(0, 30)) for _ in range(rng.randint(1, 8))]
+        vds = [_vec(rng, ids, rng.randint(0, 30)) for _ in range(rng.randint(1, 8))]
+        cov, cov_crit, pen = score_matrix(vos, vds, arrays)
+        for i, vo in enumerate(vos):
+            for j, vd in enumerate(vds):
+                ref = _reference(vo, vd, by_id)
+                got = (float(cov[i, j]), float(cov_crit[i, j]), float(pen[i, j]))
+                assert _bits(got) == _bits((ref[0], ref[2], ref[4]))
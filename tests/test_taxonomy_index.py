@@ -0,0 +1,98 @@
+import random
+
+from app.mapper.taxonomy_index import TaxonomyEmbeddingIndex, build_index, cosine, top_k_concepts
+from app.taxonomy.models import TaxonomyNode
+
+
+def _node(nid):
+    return TaxonomyNode(
+        id=nid, area="A", subarea="S", conceito=f"C{nid}", descricao="d",
+        palavras_chave=["k"], nivel="basico", critico=False,
+    )
+
+
+def _random_index(n=200, dim=16, seed=7):
+    rnd = random.Random(seed)
+    vectors = {1000 + i: [rnd.uniform(-1, 1) for _ in range(dim)] for i in range(n)}
+    nodes = {nid: _node(nid) for nid in vectors}
+    return TaxonomyEmbeddingIndex.from_vectors("v1", vectors, nodes), vectors
+
+
+def test_matrix_is_normalized_float32():
+    index, _ = _random_index()
+    assert index.matrix.dtype.name == "float32"
+    assert index.matrix.flags["C_CONTIGUOUS"]
+    norms = (index.matrix ** 2).sum(axis=1)
+    assert all(abs(x - 1.0) < 1e-5 for x in norms)
+
+
+def test_top_k_matches_bruteforce_cosine():
+    index, vectors = _random_index()
+    rnd = random.Random(1)
+    q = [rnd.uniform(-1, 1) for _ in range(16)]
+
+    expected = sorted(((nid, cosine(q, v)) for nid, v in vectors.items()), key=lambda x: x[1], reverse=True)[:10]
+    got = top_k_concepts(index, q, k=10)
+
+    assert [nid for nid, _ in got] == [nid for nid, _ in expected]
+    for (_, s_got), (_, s_exp) in zip(got, expected):
+        assert abs(s_got - s_exp) < 1e-5
+
+
+def test_top_k_larger_than_index_and_zero_query():
+    index, _ = _random_index(n=5)
+    assert len(top_k_concepts(index, [1.0] * 16, k=30)) == 5
+    assert top_k_concepts(index, [0.0] * 16, k=3) == []
+
+
+def test_build_index_uses_embedder():
+    class Embedder:
+        def embed(self, texts):
+            return [[float(i + 1), 1.0] for i in range(len(texts))]
+
+    nodes = {1: _node(1), 2: _node(2)}
+    index = build_index("v1", nodes, Embedder())
+    assert list(index.node_ids) == [1, 2]
+    assert index.matrix.shape == (2, 2)
+
+
+def test_top_k_many_matches_single_queries():
+    from app.mapper.taxonomy_index import top_k_concepts_many
+
+    index, _ = _random_index()
+    rnd = random.Random(3)
+    queries = [[rnd.uniform(-1, 1) for _ in range(16)] for _ in range(5)] + [[0.0] * 16]
+
+    many = top_k_concepts_many(index, queries, k=7)
+    assert len(many) == len(queries)
+    for q, got in zip(queries, many):
+        single = top_k_concepts(index, q, k=7)
+        assert [nid for nid, _ in got] == [nid for nid, _ in single]
+
+
+def test_ivf_full_probe_equals_exact_and_recall_knob():
+    from app.mapper.ann_index import IVFConfig, recall_at_k
+
+    index, _ = _random_index(n=400)
+    rnd = random.Random(5)
+    queries = [[rnd.uniform(-1, 1) for _ in range(16)] for _ in range(10)]
+    exact = [[nid for nid, _ in top_k_concepts(index, q, k=10)] for q in queries]
+
+    index.enable_ann(IVFConfig(nlist=8, nprobe=8))
+    full = [[nid for nid, _ in top_k_concepts(index, q, k=10)] for q in queries]
+    assert full == exact
+
+    index.ann.nprobe = 1
+    approx = [[nid for nid, _ in top_k_concepts(index, q, k=10)] for q in queries]
+    assert 0.0 < recall_at_k(exact, approx, 10) <= 1.0
+
+
+def test_build_index_enables_ann_above_threshold():
+    class Embedder:
+        def embed(self, texts):
+            rnd = random.Random(len(texts))
+            return [[rnd.uniform(-1, 1) for _ in range(4)] for _ in texts]
+
+    nodes = {i: _node(i) for i in range(30)}
+    assert build_index("v1", nodes, Embedder()).ann is None
+    assert build_index("v1", nodes, Embedder(), ann_min_nodes=10).ann is not None
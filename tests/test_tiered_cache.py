@@ -0,0 +1,113 @@
+import pytest
+
+from app.cache.cache import SimpleTTLCache
+from app.cache.codec import decode_mapped_nodes, encode_mapped_nodes
+from app.cache.tiered import TieredCache
+from app.mapper.base import MappedNode
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.down = False
+        self.mget_calls = 0
+
+    def mget(self, keys):
+        self._check()
+        self.mget_calls += 1
+        return [self.data.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return _Pipe(self)
+
+    def delete(self, key):
+        self._check()
+        self.data.pop(key, None)
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("redis down")
+
+
+class _Pipe:
+    def __init__(self, r):
+        self.r = r
+        self.ops = []
+
+    def set(self, key, value, ex=None):
+        self.ops.append((key, value))
+
+    def execute(self):
+        self.r._check()
+        self.r.data.update(self.ops)
+
+
+NODES = [
+    MappedNode(node_id=1012, weight=0.1 + 0.2, confidence=2 / 3, evidence=["swot", "missão e visão"]),
+    MappedNode(node_id=1001, weight=1.0, confidence=0.4, evidence=[]),
+]
+
+
+def _tiered(redis, **kw):
+    l1 = SimpleTTLCache(ttl_seconds=60, sweep_interval_seconds=0)
+    return TieredCache(l1, redis, encode_mapped_nodes, decode_mapped_nodes, ttl_seconds=60, **kw)
+
+
+def test_codec_roundtrip_is_exact():
+    data = encode_mapped_nodes(NODES)
+    assert decode_mapped_nodes(data) == NODES
+    assert decode_mapped_nodes(encode_mapped_nodes([])) == []
+    with pytest.raises(Exception):
+        decode_mapped_nodes(data + b"x")
+
+
+def test_l2_shared_between_processes():
+    redis = FakeRedis()
+    a, b = _tiered(redis), _tiered(redis)
+    a.set("k", NODES)
+    assert b.get("k") == NODES  # outro "processo": hit no L2
+    assert b.l1.get("k") == NODES  # e promovido para o L1
+    assert b.l2_hits == 1
+
+
+def test_get_many_uses_single_mget():
+    redis = FakeRedis()
+    c = _tiered(redis)
+    _tiered(redis).set_many({"a": NODES, "b": NODES[:1]})
+    out = c.get_many(["a", "b", "c"])
+    assert out == {"a": NODES, "b": NODES[:1], "c": None}
+    assert redis.mget_calls == 1
+
+
+def test_redis_down_degrades_to_l1():
+    redis = FakeRedis()
+    c = _tiered(redis, retry_after_seconds=60)
+    redis.down = True
+    c.set("k", NODES)
+    assert c.get("k") == NODES
+    assert c.get("other") is None
+    assert c.l2_errors == 1  # depois da falha, nem tenta o Redis até retry_after
+
+
+def test_aevaluate_runs_l2_round_trips_off_the_event_loop():
+    import asyncio
+    import threading
+
+    from tests.test_engine import make_engine, make_request
+
+    class ThreadRecordingRedis(FakeRedis):
+        threads = set()
+
+        def mget(self, keys):
+            self.threads.add(threading.get_ident())
+            return super().mget(keys)
+
+    redis = ThreadRecordingRedis()
+    engine = make_engine(cache=_tiered(redis))
+
+    async def run():
+        await engine.aevaluate(make_request(), "t1")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert redis.threads and loop_thread not in redis.threads
@@ -0,0 +1,267 @@
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import app.worker
+from app import models
+from tests.test_engine import make_request
+from tests.test_mapping_store import _engine
+
+
+def _db(tmp_path):
+    db = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    for m in (models.EquivalenceResult, models.Job, models.JobItem, models.JobUpload):
+        m.__table__.create(db)
+    return sessionmaker(bind=db)
+
+
+def _job(Session, payloads):
+    with Session() as db:
+        db.add(models.Job(id="job-1", tenant_id="t1", status="queued", total=len(payloads), done=0, failed=0))
+        for i, p in enumerate(payloads):
+            db.add(models.JobItem(id=f"it-{i}", job_id="job-1", status="queued", payload=p))
+        db.commit()
+    return [f"it-{i}" for i in range(len(payloads))]
+
+
+class FakeQueue:
+    def __init__(self):
+        self.scheduled = []
+
+    def enqueue_in(self, delay, func, *args, **kw):
+        self.scheduled.append((func, args))
+
+
+def _patch(monkeypatch, Session, engine, locked=()):
+    monkeypatch.setattr(app.worker, "SessionLocal", Session)
+    monkeypatch.setattr(app.worker, "get_engine", lambda: engine)
+    monkeypatch.setattr(app.worker, "acquire_locks", lambda keys, ttl_seconds: [k not in locked for k in keys])
+    monkeypatch.setattr(app.worker, "release_locks", lambda keys: None)
+    fake = FakeQueue()
+    monkeypatch.setattr(app.worker, "queue", fake)
+    return fake
+
+
+def _payload(request_id, **kw):
+    return make_request(request_id=request_id, **kw).model_dump(mode="json")
+
+
+def test_chunk_processes_items_in_one_pass_with_isolated_failures(tmp_path, monkeypatch):
+    Session = _db(tmp_path)
+    payloads = [
+        _payload("req-00000001"),
+        _payload("req-00000002", origem="Fayol e Weber", destino="Taylor e Fayol"),
+        {"request_id": "req-00000003", "origem": {"nome": "x"}},  # payload inválido
+        _payload("req-00000001"),                                   # request_id repetido na fatia
+        _payload("req-00000004", taxonomy_version="9999.99"),      # taxonomia inexistente: erro no engine
+    ]
+    item_ids = _job(Session, payloads)
+    engine, mapper = _engine(None)
+    _patch(monkeypatch, Session, engine)
+
+    assert app.worker.process_job_chunk("job-1", item_ids) == {"ok": True, "done": 3, "failed": 2}
+    # 4 ementas distintas mapeadas uma vez cada (prefetch), + a tentativa na taxonomia inexistente
+    assert len(mapper.calls) == 5 and len(set(mapper.calls[:4])) == 4
+
+    with Session() as db:
+        items = {it.id: it for it in db.execute(select(models.JobItem)).scalars()}
+        assert [items[i].status for i in item_ids] == ["done", "done", "failed", "done", "failed"]
+        assert items["it-0"].result_id == items["it-3"].result_id
+        results = db.execute(select(models.EquivalenceResult)).scalars().all()
+        assert sorted(r.request_id for r in results) == ["req-00000001", "req-00000002"]
+        job = db.get(models.Job, "job-1")
+        assert (job.done, job.failed, job.status) == (3, 2, "done")
+
+    # retry da mesma fatia: nada é reprocessado nem contado de novo
+    app.worker.process_job_chunk("job-1", item_ids[:2])
+    with Session() as db:
+        assert (db.get(models.Job, "job-1").done, len(db.execute(select(models.EquivalenceResult)).all())) == (3, 2)
+
+
+def test_chunk_reuses_results_written_by_another_worker(tmp_path, monkeypatch):
+    Session = _db(tmp_path)
+    item_ids = _job(Session, [_payload("req-00000001"), _payload("req-00000002"), _payload("req-00000002")])
+    engine, _ = _engine(None)
+    fake = _patch(monkeypatch, Session, engine, locked={app.worker.lock_key("t1", "req-00000002")})
+
+    app.worker.process_job_chunk("job-1", item_ids)
+    with Session() as db:
+        statuses = [db.get(models.JobItem, i).status for i in item_ids]
+        job = db.get(models.Job, "job-1")
+        assert statuses == ["done", "queued", "queued"]  # sem lock: fica para quem está processando
+        assert (job.done, job.status) == (1, "queued")
+    # ... e volta à fila numa fatia própria (com a duplicata), sem ficar preso em queued
+    assert fake.scheduled == [("app.worker.process_job_chunk", ("job-1", ["it-1", "it-2"], 1))]
+
+    # corrida no insert: o resultado já gravado por outro worker é associado ao item
+    real_evaluate = engine.evaluate
+
+    def evaluate_and_race(req, tenant_id):
+        resp = real_evaluate(req, tenant_id)
+        with Session() as db:
+            db.add(models.EquivalenceResult(**app.worker._result_values("other", tenant_id, req.request_id, {}, resp)))
+            db.commit()
+        return resp
+
+    engine.evaluate = evaluate_and_race
+    _patch(monkeypatch, Session, engine)
+    app.worker.process_job_chunk("job-1", ["it-1", "it-2"], 1)
+    with Session() as db:
+        assert db.get(models.JobItem, "it-1").result_id == "other"
+        assert db.get(models.JobItem, "it-2").result_id == "other"
+        assert db.get(models.Job, "job-1").status == "done"
+
+
+def test_chunk_fails_items_whose_lock_never_frees(tmp_path, monkeypatch):
+    Session = _db(tmp_path)
+    item_ids = _job(Session, [_payload("req-00000001"), _payload("req-00000002")])
+    engine, _ = _engine(None)
+    fake = _patch(monkeypatch, Session, engine, locked={app.worker.lock_key("t1", "req-00000002")})
+    monkeypatch.setattr(app.worker.settings, "BATCH_LOCK_RETRIES", 2)
+
+    assert app.worker.process_job_chunk("job-1", ["it-1"], 2) == {"ok": True, "done": 0, "failed": 1}
+    assert fake.scheduled == []
+    with Session() as db:
+        item = db.get(models.JobItem, "it-1")
+        assert item.status == "failed" and "lock ocupado" in item.error
+        assert db.get(models.Job, "job-1").failed == 1
+
+
+def test_chunk_level_failure_fails_pending_items_and_finishes_job(tmp_path, monkeypatch):
+    Session = _db(tmp_path)
+    item_ids = _job(Session, [_payload("req-00000001"), _payload("req-00000002")])
+    engine, _ = _engine(None)
+    _patch(monkeypatch, Session, engine)
+
+    def redis_down(keys, ttl_seconds):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(app.worker, "acquire_locks", redis_down)
+    assert app.worker.process_job_chunk("job-1", item_ids)["failed"] == 2
+    with Session() as db:
+        assert [db.get(models.JobItem, i).status for i in item_ids] == ["failed", "failed"]
+        job = db.get(models.Job, "job-1")
+        assert (job.done, job.failed, job.status) == (0, 2, "done")
+
+    # chunk duplicado/retry depois da falha: itens failed não são reavaliados nem recontados
+    _patch(monkeypatch, Session, engine)
+    assert app.worker.process_job_chunk("job-1", item_ids) == {"ok": True, "done": 0, "failed": 0}
+    with Session() as db:
+        assert db.get(models.Job, "job-1").failed == 2
+
+
+def test_concurrent_counters_finish_job_exactly_once(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.repos import JobRepo
+
+    Session = _db(tmp_path)
+    _job(Session, [{}] * 40)
+
+    def bump(i):
+        with Session() as db:
+            return JobRepo().update_counts(db, "job-1", done_inc=i % 2, failed_inc=1 - i % 2)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        finished = list(pool.map(bump, range(40)))
+
+    assert finished.count(True) == 1
+    with Session() as db:
+        job = db.get(models.Job, "job-1")
+        assert (job.done, job.failed, job.status) == (20, 20, "done")
+        assert job.finished_at is not None
+
+
+def test_ingest_batch_inserts_once_and_enqueues_chunks(tmp_path, monkeypatch):
+    import app.batch_ingest
+
+    Session = _db(tmp_path)
+    enqueued = []
+    monkeypatch.setattr(app.batch_ingest, "SessionLocal", Session)
+    monkeypatch.setattr(app.batch_ingest, "enqueue_many", lambda func, args_list, **kw: enqueued.append((func, args_list)))
+    monkeypatch.setattr(app.batch_ingest.settings, "BATCH_CHUNK_SIZE", 100)
+
+    items = app.batch_ingest.sanitize_items([{**_payload(f"req-{i:08d}"), "tenant_id": "evil"} for i in range(250)])
+    with Session() as db:
+        db.add(models.Job(id="job-1", tenant_id="t1", status="ingesting", total=len(items), done=0, failed=0))
+        db.flush()
+        db.add(models.JobUpload(job_id="job-1", payload=items))
+        db.commit()
+
+    assert app.batch_ingest.ingest_batch("job-1")["total"] == 250
+    func, args_list = enqueued[-1]
+    assert func == "app.worker.process_job_chunk"
+    assert [len(ids) for _job_id, ids in args_list] == [100, 100, 50]
+    with Session() as db:
+        assert db.get(models.Job, "job-1").status == "queued"
+        stored = db.execute(select(models.JobItem.payload)).scalars().all()
+        assert len(stored) == 250 and all("tenant_id" not in p for p in stored)
+        assert db.get(models.JobUpload, "job-1") is None  # staging removido com os itens gravados
+
+    # retry depois de enfileirado (ex.: caiu antes de fechar a ingestão): nada re-enfileirado, só fecha
+    calls = len(enqueued)
+    with Session() as db:
+        db.execute(models.Job.__table__.update().values(status="ingesting"))
+        db.commit()
+    assert app.batch_ingest.ingest_batch("job-1")["skipped"]
+    assert len(enqueued) == calls
+    with Session() as db:
+        assert db.get(models.Job, "job-1").status == "queued"
+    with Session() as db:
+        assert len(db.execute(select(models.JobItem.id)).all()) == 250
+
+
+def test_ingest_batch_retries_failed_enqueue_and_fails_job_when_exhausted(tmp_path, monkeypatch):
+    import app.batch_ingest
+    import app.rq_hooks
+
+    Session = _db(tmp_path)
+    monkeypatch.setattr(app.batch_ingest, "SessionLocal", Session)
+    monkeypatch.setattr(app.rq_hooks, "SessionLocal", Session)
+    # um pipeline = 10 itens (fatias de 5, 2 jobs RQ por pipeline)
+    monkeypatch.setattr(app.batch_ingest.settings, "BATCH_CHUNK_SIZE", 5)
+    monkeypatch.setattr(app.batch_ingest, "PIPELINE_JOBS", 2)
+    with Session() as db:
+        db.add(models.Job(id="job-1", tenant_id="t1", status="ingesting", total=25, done=0, failed=0))
+        db.commit()
+    items = [_payload(f"req-{i:08d}") for i in range(25)]
+
+    enqueued = []
+
+    def redis_down_on_second_pipeline(func, args_list, **kw):
+        if enqueued:
+            raise ConnectionError("redis down")
+        enqueued.extend(args_list)
+
+    monkeypatch.setattr(app.batch_ingest, "enqueue_many", redis_down_on_second_pipeline)
+    try:
+        app.batch_ingest.ingest_batch("job-1", items)
+    except ConnectionError:
+        pass
+    with Session() as db:
+        assert db.get(models.Job, "job-1").enqueued_items == 10
+
+    class RQJob:
+        args = ("job-1", items)
+        retries_left = 2
+
+    app.rq_hooks.on_ingest_failure(RQJob(), None, ConnectionError, None, None)
+    with Session() as db:
+        assert db.get(models.Job, "job-1").status == "ingesting"  # ainda vai haver retry
+
+    # retry retoma do segundo pipeline: cada item enfileirado exatamente uma vez
+    monkeypatch.setattr(app.batch_ingest, "enqueue_many", lambda func, args_list, **kw: enqueued.extend(args_list))
+    assert app.batch_ingest.ingest_batch("job-1", items)["total"] == 15
+    sent = [item_id for _job_id, ids in enqueued for item_id in ids]
+    with Session() as db:
+        assert sorted(sent) == sorted(db.execute(select(models.JobItem.id)).scalars().all())
+        assert len(sent) == 25
+        assert db.get(models.Job, "job-1").status == "queued"
+
+    # tentativas esgotadas num job ainda em ingestão: failed (não fica "ingesting" para sempre)
+    with Session() as db:
+        db.add(models.Job(id="job-2", tenant_id="t1", status="ingesting", total=1, done=0, failed=0))
+        db.commit()
+    RQJob.args, RQJob.retries_left = ("job-2", []), 0
+    app.rq_hooks.on_ingest_failure(RQJob(), None, TimeoutError, None, None)
+    with Session() as db:
+        assert db.get(models.Job, "job-2").status == "failed"